@@ -1,21 +1,66 @@
 """HTTP agent entrypoint for the Case Closed Tron-style competition."""
 
+import atexit
+import multiprocessing
 import os
-import random
-from collections import deque
-from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from flask import Flask, jsonify, request
+from flask import Flask, abort, jsonify, request
+
+from game.bitboard import BitBoard
+from game.endgame import EndgameMemo, EndgameSolver
+from game.eval_cache import EvalCache
+from game.metrics import Decision, Metrics, SamplingProfiler, Scores, folded_stacks
+from game.opening_book import OpeningBook
+from game.policy import PolicyRuntime, encode_board
+from game.regions import RegionTracker
+from game.search import AlphaBetaSearch, DIRECTION_NAMES, DIRECTION_VECTORS, OPPOSITE, SearchResult
+from game.voronoi import VoronoiEvaluator
 
 
 PARTICIPANT = "Peyton"
 AGENT_NAME = "a1k0n-Stolen-94%"
 
+# Wall-clock budget for the move search on each /send-move; 0 disables search.
+SEARCH_BUDGET_MS = float(os.getenv("SEARCH_BUDGET_MS", 150))
+# Exported policy network (see finalize_model.py); used instead of the greedy
+# evaluator when the search is disabled. A missing file just disables it.
+POLICY_PATH = os.getenv("POLICY_PATH", "models/policy.onnx")
+# Opening book from build_opening_book.py, memory-mapped once per process.
+# Early positions found in it skip the search; a missing file disables it.
+BOOK_PATH = os.getenv("BOOK_PATH", "models/opening_book.bin")
+# Live matches kept per server process; the least recently used one is dropped first.
+MAX_MATCHES = int(os.getenv("MAX_MATCHES", 64))
+# Processes that compute moves in parallel, each owning the matches hashed to
+# it; "auto" is one per CPU (the gunicorn/Docker default). 0 computes moves in
+# background threads of the server process.
+_search_processes = os.getenv("SEARCH_PROCESSES", "0")
+SEARCH_PROCESSES = (os.cpu_count() or 1) if _search_processes == "auto" else int(_search_processes)
+# Territory evaluations cached per process under board symmetries; 0 disables.
+EVAL_CACHE_SIZE = int(os.getenv("EVAL_CACHE_SIZE", 100_000))
+# Preload the cache from this file at startup and save it back at exit.
+EVAL_CACHE_PATH = os.getenv("EVAL_CACHE_PATH", "")
+# Endgame path results and bounds kept per process, shared by every match.
+ENDGAME_CACHE_SIZE = int(os.getenv("ENDGAME_CACHE_SIZE", 500_000))
+# Payloads without an id (the original single-game harness) share this match.
+DEFAULT_MATCH = "default"
+# Recent decisions kept for /metrics/decisions.
+DECISION_BUFFER = int(os.getenv("DECISION_BUFFER", 512))
+# Append every decision to this JSONL file (switched off and on again via /debug/trace).
+TRACE_PATH = os.getenv("TRACE_PATH", "")
+# Serve /debug/trace and /debug/profile; they are unauthenticated, so off by default.
+DEBUG_ROUTES = os.getenv("DEBUG_ROUTES", "") == "1"
+
 
 Coord = Tuple[int, int]
 
 app = Flask(__name__)
-game_state: Dict[str, object] = {}
 
 
 class Tron:
@@ -28,34 +73,65 @@ class Tron:
         "RIGHT": (1, 0),
     }
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        search_budget_ms: float = SEARCH_BUDGET_MS,
+        policy: Optional[PolicyRuntime] = None,
+        book: Optional[OpeningBook] = None,
+        eval_cache: Optional[EvalCache] = None,
+        endgame_memo: Optional[EndgameMemo] = None,
+    ) -> None:
         self.width = 20
         self.height = 18
         self.me = 1
         self.them = 2
+        self.search_budget = search_budget_ms / 1000.0
+        self.eval_cache = eval_cache
+        self.endgame_memo = endgame_memo
         self.board: List[List[int]] = [[0 for _ in range(self.width)] for _ in range(self.height)]
+        self._reset_geometry()
+        self.occupied = 0
+        self.occupied_key = 0
+        # Agent 1's trail cells: agent 1 moves first, and a crashed first mover's trail can be crossed.
+        self.first_trail = 0
+        self._walls: Optional[List] = None
+        self._trail_marks: Dict[int, Tuple[int, object, object]] = {}
         self.my_pos: Optional[Coord] = None
         self.their_pos: Optional[Coord] = None
         self.my_dir: Optional[Coord] = None
+        self.their_dir: Optional[Coord] = None
+        self.my_boosts = 0
+        self.their_boosts = 0
+        self.turn = 0
+        self.policy = policy
+        self.book = book
+        self.ingest_ms = 0.0
+        # Instrumentation of the most recent decide() (see game.metrics).
+        self.last_decision: Optional[Decision] = None
+        # Engine decide() is currently running, read by best_so_far() from other threads.
+        self._running: Optional[object] = None
 
     def update_state(self, state: Dict) -> None:
-        """Refresh the cached board representation from the game server payload."""
+        """Refresh the cached board representation from the game server payload.
 
+        Consecutive states of one match only append to the trails, so just the
+        new cells are marked; anything else falls back to a full rebuild.
+        """
+
+        start = time.perf_counter()
         width = state.get("width", self.width)
         height = state.get("height", self.height)
-        if width != self.width or height != self.height:
+        resized = width != self.width or height != self.height
+        if resized:
             self.width = width
             self.height = height
             self.board = [[0 for _ in range(self.width)] for _ in range(self.height)]
+            self._reset_geometry()
 
-        self._clear_board()
-
-        for wall in state.get("walls", []):
-            self._mark_cell(wall, -1)
-
-        for idx in (1, 2):
-            for cell in state.get(f"agent{idx}_trail", []):
-                self._mark_cell(cell, idx)
+        walls = state.get("walls", [])
+        trails = {idx: state.get(f"agent{idx}_trail", []) for idx in (1, 2)}
+        if resized or not self._extend_trails(walls, trails):
+            self._rebuild(walls, trails)
 
         player = state.get("player_number", 1)
         self.me = player
@@ -69,40 +145,230 @@ class Tron:
 
         if len(my_trail) > 1:
             prev = my_trail[-2]
-            self.my_dir = (self.my_pos[0] - prev[0], self.my_pos[1] - prev[1])  # type: ignore[index]
+            self.my_dir = self._wrap_delta(prev, self.my_pos)  # type: ignore[arg-type]
         else:
             self.my_dir = None
 
+        if len(their_trail) > 1:
+            self.their_dir = self._wrap_delta(their_trail[-2], self.their_pos)  # type: ignore[arg-type]
+        else:
+            self.their_dir = None
+
+        self.my_boosts = int(state.get(f"agent{player}_boosts", 0) or 0)
+        self.their_boosts = int(state.get(f"agent{self.them}_boosts", 0) or 0)
+        # Older harness payloads omit turn_count; the trail length is a close proxy.
+        self.turn = int(state.get("turn_count", max(len(my_trail) - 1, 0)) or 0)
+        self.ingest_ms = (time.perf_counter() - start) * 1000.0
+
     def get_move(self) -> str:
-        """Choose the direction that maximizes our reachable area advantage."""
+        """Choose the direction for the next turn (without the boost flag)."""
+
+        return self.decide()[0]
+
+    def decide(self, cancel: Optional[threading.Event] = None) -> Tuple[str, bool]:
+        """Pick a direction and whether to boost, searching within the time budget.
+
+        Setting ``cancel`` cuts the search short after its first completed depth.
+        The choice and its timings are left in ``last_decision``.
+        """
+
+        phases = {"ingest": self.ingest_ms}
+        fills = self.voronoi.evaluations
+        start = time.perf_counter()
+        source, move, boost, depth, nodes, scores = self._choose(cancel, phases)
+        phases["decide"] = (time.perf_counter() - start) * 1000.0
+        self.last_decision = Decision(
+            source=source,
+            move=move,
+            boost=boost,
+            turn=self.turn,
+            depth=depth,
+            nodes=nodes,
+            flood_fills=self.voronoi.evaluations - fills,
+            scores=scores,
+            phases=phases,
+        )
+        return move, boost
+
+    def _choose(
+        self, cancel: Optional[threading.Event], phases: Dict[str, float]
+    ) -> Tuple[str, str, bool, int, int, Scores]:
+        """``(source, move, boost, depth, nodes, scores)``; ``phases`` collects timings in ms."""
 
         if not self.my_pos:
-            return "UP"
+            return "none", "UP", False, 0, 0, (None, None, None, None)
+
+        clock = time.perf_counter()
+        booked = self._book_move()
+        if self.book is not None:
+            phases["book"] = (time.perf_counter() - clock) * 1000.0
+        if booked is not None:
+            move, boost, score = booked
+            scores = tuple(score if name == move else None for name in DIRECTION_NAMES)
+            return "book", move, boost, 0, 0, scores  # type: ignore[return-value]
+
+        if self.search_budget <= 0:
+            clock = time.perf_counter()
+            if self.policy is not None:
+                move, boost, scores = self._policy_move()
+                phases["policy"] = (time.perf_counter() - clock) * 1000.0
+                return "policy", move, boost, 0, 0, scores
+            scores = self._greedy_scores()
+            phases["evaluate"] = (time.perf_counter() - clock) * 1000.0
+            return "greedy", self._best_scored(scores), False, 1, 0, scores
+
+        clock = time.perf_counter()
+        separated = self.is_separated()
+        phases["evaluate"] = (time.perf_counter() - clock) * 1000.0
+        clock = time.perf_counter()
+        if separated:
+            # Nothing left to contest: fill our own region as long as possible.
+            # Boosting would only spend two cells per turn, so never boost.
+            self.endgame.root_scores = {}
+            self._running = self.endgame
+            try:
+                filled = self.endgame.solve(self.occupied, self.my_pos, self.search_budget, cancel=cancel)
+            finally:
+                self._running = None
+            phases["endgame"] = (time.perf_counter() - clock) * 1000.0
+            scores = _direction_scores(self.endgame.root_scores)
+            return "endgame", filled.direction, False, filled.depth, filled.nodes, scores
+
+        self.search.best = None
+        self._running = self.search
+        try:
+            result = self.analyse(self.search_budget, cancel=cancel)
+        finally:
+            self._running = None
+        phases["search"] = (time.perf_counter() - clock) * 1000.0
+        scores = _direction_scores(self.search.root_scores)
+        return "search", result.direction, result.boost and self.my_boosts > 0, result.depth, result.nodes, scores
+
+    def best_so_far(self) -> Optional[Decision]:
+        """Move of the last finished depth while ``decide`` is still searching in another thread."""
 
-        scored_moves: List[Tuple[float, str]] = []
-        fallback_moves: List[str] = []
+        phases = {"ingest": self.ingest_ms}
+        engine = self._running
+        if engine is self.search:
+            best = self.search.best
+            if best is None:
+                return None
+            scores = _direction_scores(self.search.root_scores)
+            boost = best.boost and self.my_boosts > 0
+            return Decision("search-partial", best.direction, boost, self.turn, best.depth, best.nodes, 0, scores, phases)
+        if engine is self.endgame:
+            lengths = self.endgame.root_scores
+            if not lengths:
+                return None
+            action = max(lengths, key=lengths.__getitem__)
+            scores = _direction_scores(lengths)
+            return Decision("endgame-partial", DIRECTION_NAMES[action], False, self.turn, 0, 0, 0, scores, phases)
+        return None
 
-        for name, vector in self._DIRS.items():
-            nx = self.my_pos[0] + vector[0]
-            ny = self.my_pos[1] + vector[1]
+    def analyse(self, budget: float, cancel: Optional[threading.Event] = None) -> SearchResult:
+        """Alpha-beta search of the current position for ``budget`` seconds (book not consulted)."""
 
-            if not self._in_bounds(nx, ny):
+        return self.search.search(
+            self.occupied,
+            self.my_pos,  # type: ignore[arg-type]
+            self.their_pos,
+            self._direction_index(self.my_dir),
+            self._direction_index(self.their_dir),
+            self.my_boosts,
+            self.their_boosts,
+            budget,
+            me_first=self.me == 1,
+            occupied_key=self.occupied_key,
+            cancel=cancel,
+            first_trail=self.first_trail,
+        )
+
+    def _book_move(self) -> Optional[Tuple[str, bool, float]]:
+        """The opening book's move for an early position, if it has a safe one."""
+
+        book = self.book
+        if (
+            book is None
+            or self.turn > book.turns
+            or self.their_pos is None
+            or (book.width, book.height) != (self.width, self.height)
+        ):
+            return None
+        hit = book.probe(
+            self.occupied,
+            self.my_pos,  # type: ignore[arg-type]
+            self.their_pos,
+            self._direction_index(self.my_dir),
+            self._direction_index(self.their_dir),
+            self.my_boosts,
+            self.their_boosts,
+            self.me == 1,
+        )
+        if hit is None or (hit.boost and self.my_boosts <= 0):
+            return None
+        dx, dy = DIRECTION_VECTORS[hit.action & 3]
+        x, y = self.my_pos  # type: ignore[misc]
+        for k in range(1, 3 if hit.boost else 2):
+            if self.occupied & self.bits.bit(x + dx * k, y + dy * k):
+                return None
+        return hit.direction, hit.boost, hit.score
+
+    def _policy_move(self) -> Tuple[str, bool, Scores]:
+        """Most probable network action that does not run into a wall or trail."""
+
+        obs = encode_board(self.board, self.me, self.my_pos, self.their_pos, self.my_boosts, self.turn)
+        probs = self.policy.action_probs(obs)  # type: ignore[union-attr]
+        scores = _direction_scores({a: float(p) for a, p in enumerate(probs)})
+        reverse = self._direction_index(self.my_dir)
+        x, y = self.my_pos  # type: ignore[misc]
+        for action in probs.argsort()[::-1]:
+            direction = int(action) & 3
+            boost = action >= 4
+            if boost and self.my_boosts <= 0:
+                continue
+            if reverse is not None and direction == OPPOSITE[reverse]:
                 continue
+            dx, dy = DIRECTION_VECTORS[direction]
+            steps = 2 if boost else 1
+            if all(
+                not self.occupied & self.bits.bit(x + dx * k, y + dy * k) for k in range(1, steps + 1)
+            ):
+                return DIRECTION_NAMES[direction], bool(boost), scores
+        return self._greedy_move(), False, scores
+
+    def _greedy_move(self) -> str:
+        """One-ply choice of the direction that maximizes our reachable area advantage."""
 
-            fallback_moves.append(name)
+        return self._best_scored(self._greedy_scores())
 
-            if self.board[ny][nx] != 0:
+    def _greedy_scores(self) -> Scores:
+        """``_evaluate_move`` of every direction, ``None`` where the next cell is taken."""
+
+        if not self.my_pos:
+            return (None, None, None, None)
+
+        scores: List[Optional[float]] = []
+        for name in DIRECTION_NAMES:
+            vector = self._DIRS[name]
+            nx = (self.my_pos[0] + vector[0]) % self.width
+            ny = (self.my_pos[1] + vector[1]) % self.height
+
+            if self.occupied & self.bits.bit(nx, ny):
+                scores.append(None)
                 continue
 
-            score = self._evaluate_move((nx, ny))
-            scored_moves.append((score, name))
+            scores.append(self._evaluate_move((nx, ny)))
+        return tuple(scores)  # type: ignore[return-value]
 
+    @staticmethod
+    def _best_scored(scores: Scores) -> str:
+        scored_moves = [(score, name) for score, name in zip(scores, DIRECTION_NAMES) if score is not None]
         if scored_moves:
             scored_moves.sort(reverse=True)
             return scored_moves[0][1]
 
         # If every option is blocked we still need to return *something* predictable.
-        return fallback_moves[0] if fallback_moves else "UP"
+        return DIRECTION_NAMES[0]
 
     def flood_fill(
         self,
@@ -111,88 +377,684 @@ class Tron:
         board: Optional[List[List[int]]] = None,
         allow: Optional[Iterable[Coord]] = None,
     ) -> int:
-        """Count accessible cells from a starting point with simple BFS."""
+        """Count accessible cells from a starting point with bit-parallel flood fill."""
 
         if not self._in_bounds(start_x, start_y):
             return 0
 
-        board_view = board if board is not None else self.board
-        allowed: Set[Coord] = set(allow or [])
-        allowed.add((start_x, start_y))
+        if board is None and not allow:
+            # The region tracker already knows the answer for the live board.
+            return self.regions.reachable(self.bits.index(start_x, start_y))
 
-        visited = [[False for _ in range(self.width)] for _ in range(self.height)]
-        queue: deque[Coord] = deque([(start_x, start_y)])
-        visited[start_y][start_x] = True
-        reachable = 0
+        occupied = self.bits.from_grid(board) if board is not None else self.occupied
+        if allow:
+            occupied &= ~self.bits.from_cells(allow)
 
-        while queue:
-            cx, cy = queue.popleft()
-            reachable += 1
+        free = self.bits.full & ~occupied
+        return self.bits.flood_count(self.bits.bit(start_x, start_y), free)
 
-            for dx, dy in self._DIRS.values():
-                nx = cx + dx
-                ny = cy + dy
+    def is_separated(self) -> bool:
+        """True once no free cell is reachable by both agents (pure survival)."""
 
-                if not self._in_bounds(nx, ny) or visited[ny][nx]:
-                    continue
-
-                if board_view[ny][nx] != 0 and (nx, ny) not in allowed:
-                    continue
-
-                visited[ny][nx] = True
-                queue.append((nx, ny))
-
-        return reachable
+        if not self.my_pos or not self.their_pos:
+            return False
+        return self.regions.separated(self.bits.index(*self.my_pos), self.bits.index(*self.their_pos))
 
     def _evaluate_move(self, next_pos: Coord) -> float:
-        """Score a move by comparing reachable area to our opponent."""
+        """Score a move by the chamber-weighted territory it leaves each side."""
 
-        board_after_move = self._copy_board()
         nx, ny = next_pos
-        board_after_move[ny][nx] = self.me
-
-        my_area = self.flood_fill(nx, ny, board_after_move)
-
-        opponent_area = 0
-        if self.their_pos:
-            opp_board = self._copy_specific_board(board_after_move)
-            tx, ty = self.their_pos
-            opp_board[ty][tx] = 0
-            opponent_area = self.flood_fill(tx, ty, opp_board)
+        occupied = self.bits.occupy(self.occupied, nx, ny)
+        if self.cache is not None:
+            territory = self.cache.score(occupied, next_pos, self.their_pos, evaluator=self.voronoi)
+        else:
+            territory = self.voronoi.evaluate(occupied, next_pos, self.their_pos)
 
         # Prefer continuing straight slightly when tied to reduce oscillations.
         direction_bonus = 0.0
         if self.my_dir:
-            intended = (nx - self.my_pos[0], ny - self.my_pos[1])  # type: ignore[index]
+            intended = self._wrap_delta(self.my_pos, next_pos)  # type: ignore[arg-type]
             if intended == self.my_dir:
                 direction_bonus = 0.1
 
-        return my_area - opponent_area + direction_bonus
+        return territory.my_space - territory.their_space + direction_bonus
+
+    def reset(self) -> None:
+        """Forget the cached arena so the next state triggers a full rebuild."""
+
+        self._walls = None
+        self._trail_marks = {}
+
+    def _rebuild(self, walls: List, trails: Dict[int, List]) -> None:
+        self._clear_board()
+
+        for wall in walls:
+            self._mark_cell(wall, -1, track=False)
+
+        for idx, trail in trails.items():
+            for cell in trail:
+                self._mark_cell(cell, idx, track=False)
+        # One labelling pass is cheaper than splitting regions cell by cell.
+        self.regions.reset(self.occupied)
+
+        self._walls = list(walls)
+        self._trail_marks = {idx: self._trail_mark(trail) for idx, trail in trails.items()}
+
+    def _extend_trails(self, walls: List, trails: Dict[int, List]) -> bool:
+        """Apply only the cells appended since the last state.
+
+        Returns False without touching the board when the payload does not
+        extend the previous one (new game, changed walls, rewritten trail);
+        the caller then rebuilds from scratch.
+        """
+
+        if self._walls is None or walls != self._walls:
+            return False
+
+        deltas = []
+        for idx, trail in trails.items():
+            mark = self._trail_marks.get(idx)
+            if mark is None:
+                return False
+            length, first, last = mark
+            if len(trail) < length:
+                return False
+            if length and (list(trail[0]) != first or list(trail[length - 1]) != last):
+                return False
+            deltas.append((idx, trail[length:]))
+
+        pending = 0
+        for _, cells in deltas:
+            for cell in cells:
+                if len(cell) != 2 or not self._in_bounds(*cell):
+                    return False
+                bit = self.bits.bit(*cell)
+                if self.occupied & bit or pending & bit:
+                    return False
+                pending |= bit
+
+        for idx, cells in deltas:
+            for cell in cells:
+                self._mark_cell(cell, idx)
+            self._trail_marks[idx] = self._trail_mark(trails[idx])
+        return True
+
+    @staticmethod
+    def _trail_mark(trail: List) -> Tuple[int, object, object]:
+        if not trail:
+            return 0, None, None
+        return len(trail), list(trail[0]), list(trail[-1])
+
+    def _reset_geometry(self) -> None:
+        self.bits = BitBoard(self.width, self.height)
+        self.voronoi = VoronoiEvaluator(self.bits)
+        cache = self.eval_cache
+        # The shared cache is bound to one board size.
+        if cache is not None and (cache.bits.width, cache.bits.height) != (self.width, self.height):
+            cache = None
+        self.cache = cache
+        self.search = AlphaBetaSearch(self.bits, self.voronoi, cache=self.cache)
+        self.regions = RegionTracker(self.bits)
+        # A memo of another board size is ignored by the solver.
+        self.endgame = EndgameSolver(self.bits, self.voronoi, memo=self.endgame_memo)
+
+    @staticmethod
+    def _direction_index(vector: Optional[Coord]) -> Optional[int]:
+        if vector is None or vector not in DIRECTION_VECTORS:
+            return None
+        return DIRECTION_VECTORS.index(vector)
 
     def _clear_board(self) -> None:
         for y in range(self.height):
             for x in range(self.width):
                 self.board[y][x] = 0
+        self.occupied = 0
+        self.occupied_key = 0
+        self.first_trail = 0
 
-    def _copy_board(self) -> List[List[int]]:
-        return [row[:] for row in self.board]
+    def _wrap_delta(self, src: Coord, dst: Coord) -> Coord:
+        """Unit step from ``src`` to ``dst``, treating edge crossings as wraps."""
 
-    @staticmethod
-    def _copy_specific_board(board: Sequence[Sequence[int]]) -> List[List[int]]:
-        return [list(row) for row in board]
+        dx = (dst[0] - src[0]) % self.width
+        dy = (dst[1] - src[1]) % self.height
+        if dx == self.width - 1:
+            dx = -1
+        if dy == self.height - 1:
+            dy = -1
+        return dx, dy
 
-    def _mark_cell(self, coord: Sequence[int], value: int) -> None:
+    def _mark_cell(self, coord: Sequence[int], value: int, track: bool = True) -> None:
         if len(coord) != 2:
             return
         x, y = coord
         if self._in_bounds(x, y):
             self.board[y][x] = value
+            bit = self.bits.bit(x, y)
+            if value == 1:
+                self.first_trail |= bit
+            else:
+                self.first_trail &= ~bit
+            if not self.occupied & bit:
+                index = self.bits.index(x, y)
+                self.occupied |= bit
+                self.occupied_key ^= self.search.zobrist.cell[index]
+                if track:
+                    self.regions.occupy(index)
 
     def _in_bounds(self, x: int, y: int) -> bool:
         return 0 <= x < self.width and 0 <= y < self.height
 
 
-tron = Tron()
+def _direction_scores(by_action: Dict[int, float]) -> Scores:
+    """Best score per direction (boosted or not) from an ``action -> score`` map."""
+
+    scores: List[Optional[float]] = [None, None, None, None]
+    for action, score in by_action.items():
+        direction = action & 3
+        if scores[direction] is None or score > scores[direction]:  # type: ignore[operator]
+            scores[direction] = score
+    return tuple(scores)  # type: ignore[return-value]
+
+
+class SpeculativeMover:
+    """Starts the move search as soon as a state lands and hands it to /send-move.
+
+    Every ``submit`` cancels the search for the previous state before the new
+    state is applied, so the worker never reads a board that is being
+    rewritten. The search budget therefore starts counting at /send-state and
+    /send-move only waits for whatever is left of it; a search still running
+    after that is cancelled and its last finished depth is played.
+    """
+
+    def __init__(self, tron: Tron) -> None:
+        self.tron = tron
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+        self._result: Optional[Tuple[str, bool]] = None
+        self._deadline = 0.0
+        self._partial = False
+        self.last_decision: Optional[Decision] = None
+
+    def submit(self, state: Dict) -> None:
+        with self._lock:
+            self._stop_worker()
+            self.tron.update_state(state)
+            self._result = None
+            self._partial = False
+            self._deadline = time.perf_counter() + self.tron.search_budget
+            self._cancel = threading.Event()
+            self._worker = threading.Thread(target=self._run, args=(self._cancel,), daemon=True)
+            self._worker.start()
+
+    def result(self) -> Tuple[str, bool]:
+        """Return the speculative move, waiting at most for the remaining budget.
+
+        Only a search that has not finished its first depth yet is waited for
+        past the budget, since there is no move to play before that.
+        """
+
+        with self._lock:
+            if self._partial:
+                return self._result  # type: ignore[return-value]
+            if self._worker is not None:
+                self._worker.join(timeout=max(0.0, self._deadline - time.perf_counter()))
+                partial = self.tron.best_so_far() if self._worker.is_alive() else None
+                if partial is not None:
+                    # The worker is joined by the next submit()/cancel() once it sees the event.
+                    self._cancel.set()
+                    self._partial = True
+                    self._result = (partial.move, partial.boost)
+                    self.last_decision = partial
+                    return self._result
+                self._worker.join()
+                self._worker = None
+            if self._result is None:
+                self._result = self.tron.decide()
+            self.last_decision = self.tron.last_decision
+            return self._result
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._stop_worker()
+            self._result = None
+            self._partial = False
+
+    def _run(self, cancel: threading.Event) -> None:
+        try:
+            result = self.tron.decide(cancel)
+        except Exception:  # keep serving moves; result() recomputes synchronously
+            return
+        if not cancel.is_set():
+            self._result = result
+
+    def _stop_worker(self) -> None:
+        if self._worker is not None:
+            self._cancel.set()
+            self._worker.join()
+            self._worker = None
+
+
+class ShardMover:
+    """``SpeculativeMover`` counterpart that runs ``Tron.decide`` in a search process.
+
+    Each search process is a single-worker pool, so the states of one match
+    are handled in order by the process that keeps its ``Tron``. Every answer
+    also carries that process's evaluation-cache counters, stored in
+    ``cache_stats`` under ``index``.
+    """
+
+    def __init__(
+        self,
+        shard: ProcessPoolExecutor,
+        match_id: str,
+        budget: float,
+        index: int = 0,
+        cache_stats: Optional[Dict[int, Dict]] = None,
+    ) -> None:
+        self.shard = shard
+        self.match_id = match_id
+        self.budget = budget
+        self.index = index
+        self.cache_stats = cache_stats if cache_stats is not None else {}
+        self._future: Optional["Future[ShardAnswer]"] = None
+        self._state: Dict = {}
+        self.last_decision: Optional[Decision] = None
+
+    def submit(self, state: Dict) -> None:
+        self._state = dict(state)
+        self._future = self.shard.submit(_shard_decide, self.match_id, self._state)
+
+    def result(self) -> Tuple[str, bool]:
+        if self._future is not None:
+            try:
+                # Other matches may be queued ahead on the same process.
+                move, boost, self.last_decision, stats = self._future.result(timeout=max(0.5, 4 * self.budget))
+                if stats is not None:
+                    self.cache_stats[self.index] = stats
+                return move, boost
+            except Exception:  # keep serving moves; fall back to a local greedy answer
+                pass
+        fallback = Tron(search_budget_ms=0)
+        if self._state:
+            fallback.update_state(self._state)
+        result = fallback.decide()
+        decision = fallback.last_decision
+        self.last_decision = decision._replace(source="fallback") if decision is not None else None
+        return result
+
+    def cancel(self) -> None:
+        self._future = None
+        self._state = {}
+        self.shard.submit(_shard_end, self.match_id)
+
+
+class Match:
+    """Merged state payload, engine and mover of one live game."""
+
+    def __init__(self, match_id: str, tron: Optional[Tron], mover) -> None:
+        self.match_id = match_id
+        self.state: Dict[str, object] = {}
+        self.tron = tron
+        self.mover = mover
+        self.lock = threading.Lock()
+        # Set under ``lock`` once the match is ended or evicted; its Tron may be reused.
+        self.closed = False
+
+
+class MatchRegistry:
+    """Live matches keyed by game/session id, bounded as an LRU.
+
+    Ending or evicting a match cancels its search; its ``Tron`` is reset and
+    kept in a small idle pool so the next match skips the engine set-up.
+    With ``processes > 0`` moves are computed in that many search processes
+    (match ids hashed to a fixed process) instead of server threads.
+
+    GET /send-move has no body, so a client that only sends its match id in
+    the /send-state body is routed to the last such id it sent.
+
+    ``start`` loads the models and warms up the engines (or search
+    processes) up front; the server calls it before taking requests.
+    """
+
+    IDLE_TRONS = 4
+
+    def __init__(
+        self,
+        max_matches: int = MAX_MATCHES,
+        search_budget_ms: float = SEARCH_BUDGET_MS,
+        policy_path: str = POLICY_PATH,
+        processes: int = SEARCH_PROCESSES,
+        book_path: str = BOOK_PATH,
+    ) -> None:
+        self.max_matches = max(1, max_matches)
+        self.search_budget_ms = search_budget_ms
+        self.policy_path = policy_path
+        self.book_path = book_path
+        self.processes = processes
+        self._matches: "OrderedDict[str, Match]" = OrderedDict()
+        self._clients: "OrderedDict[str, str]" = OrderedDict()
+        self._idle: List[Tron] = []
+        self._lock = threading.Lock()
+        self._policy: Optional[PolicyRuntime] = None
+        self._policy_loaded = False
+        self._book: Optional[OpeningBook] = None
+        self._book_loaded = False
+        self._shards: List[ProcessPoolExecutor] = []
+        # Latest evaluation-cache counters reported by each search process.
+        self._shard_cache_stats: Dict[int, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._matches)
+
+    def start(self) -> None:
+        """Load the policy and book, then warm up one engine per search process (or an idle one)."""
+
+        if self.processes > 0:
+            for index, stats in enumerate(self.shard_call(_shard_warm_up, timeout=None)):
+                if stats is not None:
+                    self._shard_cache_stats[index] = stats
+            return
+        tron = self._new_tron()
+        _warm_up(tron)
+        with self._lock:
+            self._idle.append(tron)
+
+    def get(self, match_id: str) -> Match:
+        """The match for ``match_id``, created on first use."""
+
+        evicted: List[Match] = []
+        with self._lock:
+            match = self._matches.get(match_id)
+            if match is None:
+                match = self._create(match_id)
+                self._matches[match_id] = match
+                while len(self._matches) > self.max_matches:
+                    evicted.append(self._matches.popitem(last=False)[1])
+            else:
+                self._matches.move_to_end(match_id)
+        for old in evicted:
+            self._release(old)
+        return match
+
+    @contextmanager
+    def hold(self, match_id: str) -> Iterator[Match]:
+        """``get`` with the match lock held, retrying if the match was ended or evicted meanwhile."""
+
+        while True:
+            match = self.get(match_id)
+            with match.lock:
+                if not match.closed:
+                    yield match
+                    return
+
+    def remember_client(self, client: str, match_id: str) -> None:
+        """Record the body match id last sent by ``client``."""
+
+        with self._lock:
+            self._clients[client] = match_id
+            self._clients.move_to_end(client)
+            while len(self._clients) > 4 * self.max_matches:
+                self._clients.popitem(last=False)
+
+    def client_match(self, client: str) -> Optional[str]:
+        with self._lock:
+            return self._clients.get(client)
+
+    def end(self, match_id: str) -> bool:
+        with self._lock:
+            match = self._matches.pop(match_id, None)
+            for client in [c for c, m in self._clients.items() if m == match_id]:
+                del self._clients[client]
+        if match is None:
+            return False
+        self._release(match)
+        return True
+
+    def shard_call(self, fn, *args, timeout: Optional[float] = 10.0) -> List:
+        """``fn(*args)`` run once in every search process, in process order; empty without them.
+
+        The call queues behind moves already submitted to each process.
+        """
+
+        if self.processes <= 0:
+            return []
+        with self._lock:
+            shards = self._start_shards()
+        futures = [shard.submit(fn, *args) for shard in shards]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def eval_cache_stats(self) -> Optional[Dict]:
+        """Evaluation-cache counters of this process, or summed over the search processes."""
+
+        if self.processes <= 0:
+            return _eval_cache.stats() if _eval_cache is not None else None
+        reports = list(self._shard_cache_stats.values())
+        if not reports:
+            return None
+        stats = {key: sum(report[key] for report in reports) for key in ("entries", "max_entries", "hits", "misses")}
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else 0.0
+        return stats
+
+    def shutdown(self) -> None:
+        with self._lock:
+            matches = list(self._matches.values())
+            self._matches.clear()
+        for match in matches:
+            self._release(match)
+        for shard in self._shards:
+            shard.shutdown(cancel_futures=True)
+        self._shards = []
+        _save_eval_cache()
+
+    def _create(self, match_id: str) -> Match:
+        budget = self.search_budget_ms / 1000.0
+        if self.processes > 0:
+            shards = self._start_shards()
+            index = zlib.crc32(match_id.encode()) % len(shards)
+            mover = ShardMover(shards[index], match_id, budget, index, self._shard_cache_stats)
+            return Match(match_id, None, mover)
+        if self._idle:
+            tron = self._idle.pop()
+            tron.search_budget = budget
+        else:
+            tron = self._new_tron()
+        return Match(match_id, tron, SpeculativeMover(tron))
+
+    def _new_tron(self) -> Tron:
+        return Tron(
+            search_budget_ms=self.search_budget_ms,
+            policy=self._load_policy(),
+            book=self._load_book(),
+            eval_cache=shared_eval_cache(),
+            endgame_memo=shared_endgame_memo(),
+        )
+
+    def _release(self, match: Match) -> None:
+        # Requests still holding this Match see ``closed`` under the lock and
+        # retry, so nothing touches the Tron once it is back in the pool.
+        with match.lock:
+            match.closed = True
+            match.mover.cancel()
+            match.state.clear()
+            if match.tron is not None:
+                match.tron.reset()
+        if match.tron is not None:
+            with self._lock:
+                if len(self._idle) < self.IDLE_TRONS:
+                    self._idle.append(match.tron)
+
+    def _load_policy(self) -> Optional[PolicyRuntime]:
+        if not self._policy_loaded:
+            self._policy = PolicyRuntime.load(self.policy_path)
+            self._policy_loaded = True
+        return self._policy
+
+    def _load_book(self) -> Optional[OpeningBook]:
+        if not self._book_loaded:
+            self._book = OpeningBook.load(self.book_path)
+            self._book_loaded = True
+        return self._book
+
+    def _start_shards(self) -> List[ProcessPoolExecutor]:
+        if not self._shards:
+            # Spawned, not forked: the server process already runs threads.
+            context = multiprocessing.get_context("spawn")
+            config = (self.search_budget_ms, self.policy_path, self.max_matches, self.book_path)
+            self._shards = [
+                ProcessPoolExecutor(1, mp_context=context, initializer=_shard_init, initargs=config)
+                for _ in range(self.processes)
+            ]
+        return self._shards
+
+
+# Search-process side of ShardMover: every process keeps its own LRU of engines.
+_shard_trons: "OrderedDict[str, Tron]" = OrderedDict()
+_shard_config: Dict[str, object] = {}
+
+
+def _shard_init(search_budget_ms: float, policy_path: str, max_matches: int, book_path: str) -> None:
+    _shard_config["budget"] = search_budget_ms
+    _shard_config["max_matches"] = max_matches
+    _shard_config["policy"] = PolicyRuntime.load(policy_path)
+    # Every process maps the same file, so the pages are shared.
+    _shard_config["book"] = OpeningBook.load(book_path)
+
+
+# (move, boost, decision, evaluation-cache counters of the search process).
+ShardAnswer = Tuple[str, bool, Optional[Decision], Optional[Dict]]
+
+
+def _shard_decide(match_id: str, state: Dict) -> ShardAnswer:
+    tron = _shard_trons.get(match_id)
+    if tron is None:
+        tron = _shard_trons[match_id] = _shard_tron()
+        while len(_shard_trons) > _shard_config["max_matches"]:  # type: ignore[operator]
+            _shard_trons.popitem(last=False)
+    else:
+        _shard_trons.move_to_end(match_id)
+    tron.update_state(state)
+    move, boost = tron.decide()
+    return move, boost, tron.last_decision, _shard_cache_stats()
+
+
+def _shard_end(match_id: str) -> None:
+    _shard_trons.pop(match_id, None)
+
+
+def _shard_warm_up() -> Optional[Dict]:
+    _warm_up(_shard_tron())
+    return _shard_cache_stats()
+
+
+def _shard_cache_stats() -> Optional[Dict]:
+    return _eval_cache.stats() if _eval_cache is not None else None
+
+
+def _shard_profile(enabled: bool, interval_ms: float, reset: bool) -> Dict[str, object]:
+    if enabled:
+        profiler.start(interval_ms, reset=reset)
+    else:
+        profiler.stop()
+    return profiler.status()
+
+
+def _shard_profile_counts() -> Counter:
+    return profiler.counts()
+
+
+def _shard_tron() -> Tron:
+    return Tron(
+        search_budget_ms=_shard_config["budget"],  # type: ignore[arg-type]
+        policy=_shard_config["policy"],  # type: ignore[arg-type]
+        book=_shard_config["book"],  # type: ignore[arg-type]
+        eval_cache=shared_eval_cache(),
+        endgame_memo=shared_endgame_memo(),
+    )
+
+
+# Standard start position, decided once by each engine warmed up at startup.
+_WARM_UP_STATE = {
+    "agent1_trail": [[1, 2]],
+    "agent2_trail": [[17, 15]],
+    "agent1_boosts": 3,
+    "agent2_boosts": 3,
+    "player_number": 1,
+    "turn_count": 0,
+}
+
+
+def _warm_up(tron: Tron) -> None:
+    tron.update_state(_WARM_UP_STATE)
+    tron.decide()
+    tron.reset()
+
+
+_eval_cache: Optional[EvalCache] = None
+_eval_cache_lock = threading.Lock()
+
+
+def shared_eval_cache() -> Optional[EvalCache]:
+    """The process-wide evaluation cache, preloaded from ``EVAL_CACHE_PATH`` on first use.
+
+    With ``EVAL_CACHE_PATH`` set the cache is written back when the process
+    exits; search processes all save to the same file, the last one wins.
+    """
+
+    global _eval_cache
+    if EVAL_CACHE_SIZE <= 0:
+        return None
+    with _eval_cache_lock:
+        if _eval_cache is None:
+            _eval_cache = EvalCache(BitBoard(), max_entries=EVAL_CACHE_SIZE)
+            if EVAL_CACHE_PATH:
+                _eval_cache.preload(EVAL_CACHE_PATH)
+                atexit.register(_save_eval_cache)
+        return _eval_cache
+
+
+_endgame_memo: Optional[EndgameMemo] = None
+
+
+def shared_endgame_memo() -> EndgameMemo:
+    """The process-wide endgame memo, so pooled engines do not each hold ``ENDGAME_CACHE_SIZE`` keys."""
+
+    global _endgame_memo
+    with _eval_cache_lock:
+        if _endgame_memo is None:
+            _endgame_memo = EndgameMemo(BitBoard(), max_entries=ENDGAME_CACHE_SIZE)
+        return _endgame_memo
+
+
+def _save_eval_cache() -> None:
+    if _eval_cache is not None and EVAL_CACHE_PATH:
+        _eval_cache.save(EVAL_CACHE_PATH)
+
+
+def _match_id(data: Optional[Dict] = None) -> str:
+    """Match key from the ``X-Game-Id`` header, a ``game_id`` query arg or the payload.
+
+    Without any of them (always the case for GET /send-move unless the header
+    or query arg is used) the client's last payload id is used, then the
+    default match.
+    """
+
+    for value in (request.headers.get("X-Game-Id"), request.args.get("game_id")):
+        if value not in (None, ""):
+            return str(value)
+    client = request.remote_addr or ""
+    data = data or {}
+    for value in (data.get("game_id"), data.get("match_id"), data.get("session_id")):
+        if value not in (None, ""):
+            matches.remember_client(client, str(value))
+            return str(value)
+    return matches.client_match(client) or DEFAULT_MATCH
+
+
+matches = MatchRegistry()
+metrics = Metrics(buffer_size=DECISION_BUFFER, trace_path=TRACE_PATH or None)
+profiler = SamplingProfiler()
 
 @app.route("/", methods=["GET"])
 def info():
@@ -200,22 +1062,99 @@ def info():
 
 @app.route("/send-state", methods=["POST"])
 def receive_state():
-    global game_state
-    data = request.get_json()
+    start = time.perf_counter()
+    data = request.get_json(silent=True)
     if data:
-        game_state.update(data)
-        tron.update_state(game_state)
+        with matches.hold(_match_id(data)) as match:
+            match.state.update(data)
+            match.mover.submit(match.state)
+    metrics.observe("send_state", (time.perf_counter() - start) * 1000.0)
     return jsonify({"status": "ok"})
 
 @app.route("/send-move", methods=["GET"])
 def send_move():
-    move = tron.get_move()
-    boost = random.random() < 0.1 and game_state.get(f"agent{tron.me}_boosts", 0) > 0
+    start = time.perf_counter()
+    match_id = _match_id()
+    with matches.hold(match_id) as match:
+        move, boost = match.mover.result()
+        decision = match.mover.last_decision
+    metrics.record(match_id, decision, (time.perf_counter() - start) * 1000.0)
     return jsonify({"move": f"{move}:BOOST" if boost else move})
 
 @app.route("/end", methods=["POST"])
 def end_game():
+    matches.end(_match_id(request.get_json(silent=True)))
     return jsonify({"status": "ok"})
 
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Latency, depth, node and flood-fill histograms; Prometheus text unless ``?format=json``."""
+
+    cache_stats = matches.eval_cache_stats()
+    if request.args.get("format") == "json":
+        snapshot = metrics.snapshot()
+        snapshot["live_matches"] = len(matches)
+        snapshot["profiler"] = profiler.status()
+        if cache_stats is not None:
+            snapshot["eval_cache"] = cache_stats
+        return jsonify(snapshot)
+    body = metrics.prometheus() + f"# TYPE tron_live_matches gauge\ntron_live_matches {len(matches)}\n"
+    if cache_stats is not None:
+        body += (
+            f"# TYPE tron_eval_cache_hits_total counter\ntron_eval_cache_hits_total {cache_stats['hits']}\n"
+            f"# TYPE tron_eval_cache_misses_total counter\ntron_eval_cache_misses_total {cache_stats['misses']}\n"
+            f"# TYPE tron_eval_cache_entries gauge\ntron_eval_cache_entries {cache_stats['entries']}\n"
+        )
+    return app.response_class(body, mimetype="text/plain; version=0.0.4")
+
+@app.route("/metrics/decisions", methods=["GET"])
+def get_decisions():
+    """The most recent decisions with their candidate scores (``?limit=N``)."""
+
+    return jsonify(metrics.decisions(request.args.get("limit", type=int)))
+
+@app.route("/debug/trace", methods=["POST"])
+def set_trace():
+    """``{"enabled": true}`` appends decisions to the operator's ``TRACE_PATH`` as JSONL; ``false`` stops."""
+
+    if not DEBUG_ROUTES:
+        abort(404)
+    data = request.get_json(silent=True) or {}
+    enabled = bool(data.get("enabled", True))
+    if enabled and not TRACE_PATH:
+        return jsonify({"error": "TRACE_PATH is not set"}), 400
+    metrics.set_trace(TRACE_PATH if enabled else None)
+    return jsonify({"trace_path": metrics.trace_path})
+
+@app.route("/debug/profile", methods=["GET", "POST"])
+def profile():
+    """POST ``{"enabled": true, "interval_ms": 5}`` to start sampling, ``false`` to stop; GET the folded stacks.
+
+    Search processes run their own sampler, switched with the server's. Their
+    stacks are merged in under a ``search-process-N`` root frame.
+    """
+
+    if not DEBUG_ROUTES:
+        abort(404)
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        enabled = bool(data.get("enabled", True))
+        interval_ms = float(data.get("interval_ms", 5.0))
+        reset = bool(data.get("reset", True))
+        if enabled:
+            profiler.start(interval_ms, reset=reset)
+        else:
+            profiler.stop()
+        status = profiler.status()
+        shards = matches.shard_call(_shard_profile, enabled, interval_ms, reset)
+        if shards:
+            status["search_processes"] = shards
+        return jsonify(status)
+    samples = profiler.counts()
+    for index, counts in enumerate(matches.shard_call(_shard_profile_counts)):
+        samples.update({f"search-process-{index};{stack}": count for stack, count in counts.items()})
+    return app.response_class(folded_stacks(samples, request.args.get("limit", 0, type=int)), mimetype="text/plain")
+
 if __name__ == "__main__":
+    matches.start()
     app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5008)))
@@ -0,0 +1,144 @@
+# build_opening_book.py
+"""Build the opening book that ``agent.py`` memory-maps at startup.
+
+Both seats start from fixed positions, so the first turns of every match are
+drawn from a small tree. The tree is grown by self-play one turn at a time:
+each position is searched from both seats with a long budget, both book moves
+are played, and for the first ``--branch-turns`` turns every other safe
+reply of either seat is expanded as well, so the book also covers opponents
+that do not play like us. Positions are stored under the canonical keys of
+``game.opening_book`` and written as a compact binary hash table.
+
+    python build_opening_book.py --turns 8 --budget-ms 1000 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from agent import Tron
+from eval.tournament import encode_state
+from game.bitboard import BitBoard
+from game.case_closed_game import Direction, Game
+from game.opening_book import BookKeys, OpeningBook, write_book
+from game.search import DIRECTION_NAMES
+
+_tron = None
+_keys = None
+
+
+def _init_worker():
+    global _tron, _keys
+    _tron = Tron(search_budget_ms=0)
+    _keys = BookKeys(BitBoard(_tron.width, _tron.height))
+
+
+def position_key(tron, keys):
+    return keys.canonical(
+        tron.occupied,
+        tron.my_pos,
+        tron.their_pos,
+        tron._direction_index(tron.my_dir),
+        tron._direction_index(tron.their_dir),
+        tron.my_boosts,
+        tron.their_boosts,
+        tron.me == 1,
+    )
+
+
+def analyse(task):
+    """Deep search of one seat's position: (key, canonical action, real action, depth, score, turn)."""
+    state, budget_ms = task
+    _tron.reset()
+    _tron.update_state(state)
+    key, reflection = position_key(_tron, _keys)
+    result = _tron.analyse(budget_ms / 1000.0)
+    action = result.action if result.boost and _tron.my_boosts > 0 else result.action & 3
+    return key, BookKeys.reflect_action(action, reflection), action, result.depth, result.score, _tron.turn
+
+
+def safe_moves(game, player):
+    agent = game.agent1 if player == 1 else game.agent2
+    x, y = agent.trail[-1]
+    moves = []
+    for action, name in enumerate(DIRECTION_NAMES):
+        direction = Direction[name]
+        dx, dy = direction.value
+        if (dx, dy) == (-agent.direction.value[0], -agent.direction.value[1]):
+            continue
+        if game.board.get_cell_state((x + dx, y + dy)) == 0:
+            moves.append(action)
+    return moves
+
+
+def play(game, action1, action2):
+    """Child position after both actions, or None if the game ended."""
+    child = game.clone()
+    result = child.step(
+        Direction[DIRECTION_NAMES[action1 & 3]], Direction[DIRECTION_NAMES[action2 & 3]],
+        boost1=action1 >= 4, boost2=action2 >= 4,
+    )
+    return None if result is not None else child
+
+
+def build(turns, branch_turns, budget_ms, workers):
+    book = {}
+    max_turn = 0
+    frontier = [Game()]
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+        for turn in range(turns):
+            t0 = time.perf_counter()
+            states = [encode_state(game, seat) for game in frontier for seat in (1, 2)]
+            results = list(pool.map(analyse, [(state, budget_ms) for state in states], chunksize=1))
+            depths = []
+            for key, canonical, _, depth, score, seat_turn in results:
+                if key not in book or book[key][1] < depth:
+                    book[key] = (canonical, depth, score)
+                max_turn = max(max_turn, seat_turn)
+                depths.append(depth)
+
+            children = {}
+            for i, game in enumerate(frontier):
+                a1, a2 = results[2 * i][2], results[2 * i + 1][2]
+                pairs = [(a1, a2)]
+                if turn < branch_turns:
+                    pairs += [(a1, m) for m in safe_moves(game, 2) if m != a2 & 3]
+                    pairs += [(m, a2) for m in safe_moves(game, 1) if m != a1 & 3]
+                for pair in pairs:
+                    child = play(game, *pair)
+                    if child is not None:
+                        # Transpositions reached by different move orders are searched once.
+                        cells = bytes(child.board.cells)
+                        trails = (tuple(child.agent1.trail[-1]), tuple(child.agent2.trail[-1]))
+                        boosts = (child.agent1.boosts_remaining, child.agent2.boosts_remaining)
+                        children.setdefault((cells, trails, boosts), child)
+            print(f"turn {turn}: {len(frontier):4d} positions  depth {min(depths)}-{max(depths)}  "
+                  f"{len(book):5d} book entries  {time.perf_counter() - t0:6.1f}s")
+            frontier = list(children.values())
+            if not frontier:
+                break
+    return book, max_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the opening book for the agent.")
+    parser.add_argument("--out", default="models/opening_book.bin")
+    parser.add_argument("--turns", type=int, default=8, help="turns of play covered by the book")
+    parser.add_argument("--branch-turns", type=int, default=2,
+                        help="turns in which every safe reply of either seat is expanded")
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="search budget per position")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    book, max_turn = build(args.turns, args.branch_turns, args.budget_ms, args.workers)
+    board = Game().board
+    size = write_book(args.out, board.width, board.height, max_turn, book)
+    loaded = OpeningBook.load(args.out)
+    if loaded is None or any(loaded.get(key)[0] != entry[0] for key, entry in book.items()):
+        raise SystemExit("book failed to read back")
+    print(f"{len(book)} positions, turns <= {max_turn}, {size / 1024:.1f} KiB -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
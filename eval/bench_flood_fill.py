@@ -0,0 +1,107 @@
+"""Micro-benchmark: bitboard flood fill vs. the original list-of-lists BFS.
+
+Run from the repository root::
+
+    python -m eval.bench_flood_fill --boards 200 --repeat 5
+"""
+
+import argparse
+import random
+import time
+from collections import deque
+from typing import List, Tuple
+
+from game.bitboard import BitBoard
+
+WIDTH = 20
+HEIGHT = 18
+DIRS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+def legacy_flood_fill(board: List[List[int]], start_x: int, start_y: int) -> int:
+    """The BFS ``Tron.flood_fill`` used before the bitboard rewrite (torus-aware)."""
+
+    height = len(board)
+    width = len(board[0])
+    visited = [[False for _ in range(width)] for _ in range(height)]
+    queue: deque = deque([(start_x, start_y)])
+    visited[start_y][start_x] = True
+    reachable = 0
+
+    while queue:
+        cx, cy = queue.popleft()
+        reachable += 1
+        for dx, dy in DIRS:
+            nx = (cx + dx) % width
+            ny = (cy + dy) % height
+            if visited[ny][nx] or board[ny][nx] != 0:
+                continue
+            visited[ny][nx] = True
+            queue.append((nx, ny))
+
+    return reachable
+
+
+def legacy_evaluate(board: List[List[int]], start: Tuple[int, int], other: Tuple[int, int]) -> int:
+    """Two board copies plus two BFS passes, as the old ``_evaluate_move`` did."""
+
+    after = [row[:] for row in board]
+    after[start[1]][start[0]] = 1
+    mine = legacy_flood_fill(after, *start)
+    opp_board = [list(row) for row in after]
+    opp_board[other[1]][other[0]] = 0
+    return mine - legacy_flood_fill(opp_board, *other)
+
+
+def random_board(rng: random.Random, fill: float) -> Tuple[List[List[int]], Tuple[int, int], Tuple[int, int]]:
+    board = [[1 if rng.random() < fill else 0 for _ in range(WIDTH)] for _ in range(HEIGHT)]
+    empty = [(x, y) for y in range(HEIGHT) for x in range(WIDTH) if board[y][x] == 0]
+    if len(empty) < 2:
+        board[0][0] = board[0][1] = 0
+        empty = [(0, 0), (1, 0)]
+    start, other = rng.sample(empty, 2)
+    board[other[1]][other[0]] = 2
+    return board, start, other
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boards", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bits = BitBoard(WIDTH, HEIGHT)
+    cases = []
+    for i in range(args.boards):
+        board, start, other = random_board(rng, fill=(i % 10) / 20.0)
+        cases.append((board, start, other, bits.from_grid(board)))
+
+    # Sanity check before timing anything.
+    for board, start, other, occupied in cases:
+        free = bits.full & ~(occupied | bits.bit(*start))
+        fast = bits.flood_count(bits.bit(*start), free) - bits.flood_count(bits.bit(*other), free)
+        assert fast == legacy_evaluate(board, start, other), (start, other)
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for board, start, other, _occupied in cases:
+            legacy_evaluate(board, start, other)
+    legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(args.repeat):
+        for _board, start, other, occupied in cases:
+            free = bits.full & ~(occupied | bits.bit(*start))
+            bits.flood_count(bits.bit(*start), free) - bits.flood_count(bits.bit(*other), free)
+    fast = time.perf_counter() - t0
+
+    calls = args.boards * args.repeat
+    print(f"legacy BFS : {legacy / calls * 1e6:8.1f} us/eval")
+    print(f"bitboard   : {fast / calls * 1e6:8.1f} us/eval")
+    print(f"speedup    : {legacy / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Latency benchmark for ``Tron`` and the HTTP endpoints.
+
+Builds a deterministic corpus of boards in four phases (opening, contested,
+separated, nearly full), then times ``Tron.update_state`` (full rebuild and
+incremental), ``Tron.decide``, ``Tron.flood_fill`` and the Flask request path
+(``/send-state`` + ``/send-move`` through the test client). Results are
+percentiles per metric and phase; they can be saved as a JSON baseline and
+later compared against it.
+
+Run from the repository root::
+
+    python -m eval.bench_latency --save eval/baselines/latency.json
+    python -m eval.bench_latency --compare eval/baselines/latency.json --threshold 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from game.bitboard import BitBoard
+from game.case_closed_game import Direction, Game
+from game.voronoi import VoronoiEvaluator
+from eval.tournament import TronPlayer, encode_state, right_turn_player
+
+PHASES = ("opening", "contested", "separated", "nearly_full")
+PERCENTILES = (50, 95, 99)
+
+
+def classify(state: dict, turn: int, bits: BitBoard, voronoi: VoronoiEvaluator) -> str:
+    occupied = bits.from_cells(state["agent1_trail"]) | bits.from_cells(state["agent2_trail"])
+    occupied |= bits.from_cells(state["walls"])
+    fill = occupied.bit_count() / bits.size
+    if fill >= 0.7:
+        return "nearly_full"
+    head1 = tuple(state["agent1_trail"][-1])
+    head2 = tuple(state["agent2_trail"][-1])
+    if voronoi.evaluate(occupied, head1, head2, chambers=False).separated:
+        return "separated"
+    return "opening" if turn < 15 else "contested"
+
+
+def fill_with_walls(states: List[dict], rng: random.Random, target: float, bits: BitBoard) -> List[dict]:
+    """Pad consecutive states with one random wall set (away from the heads) until ``target`` fill.
+
+    The walls are drawn against the last state, whose trails contain the
+    earlier ones, and shared by every state so a later state still extends
+    the previous one.
+    """
+
+    last = states[-1]
+    occupied = bits.from_cells(last["agent1_trail"]) | bits.from_cells(last["agent2_trail"])
+    heads = bits.from_cells([last["agent1_trail"][-1], last["agent2_trail"][-1]])
+    keep_open = bits.neighbors(heads)
+    free = [c for c in bits.iter_cells(bits.full & ~occupied & ~keep_open)]
+    rng.shuffle(free)
+    need = max(0, int(target * bits.size) - occupied.bit_count())
+    walls = [list(c) for c in free[:need]]
+    return [dict(state, walls=walls) for state in states]
+
+
+def build_corpus(per_phase: int, seed: int) -> Dict[str, List[List[dict]]]:
+    """Sequences of consecutive states per phase (each sequence is one game excerpt)."""
+
+    rng = random.Random(seed)
+    bits = BitBoard()
+    voronoi = VoronoiEvaluator(bits)
+    corpus: Dict[str, List[List[dict]]] = {phase: [] for phase in PHASES}
+    players = (TronPlayer(0.0), right_turn_player)
+
+    attempts = 0
+    while any(len(corpus[p]) < per_phase for p in PHASES[:3]) and attempts < per_phase * 40:
+        attempts += 1
+        random.seed(rng.randrange(2 ** 32))
+        game = Game()
+        history: List[dict] = []
+        # A few random opening moves diversify otherwise deterministic games.
+        opening = rng.randrange(0, 6)
+        result = None
+        while result is None:
+            player_number = 1 + (attempts % 2)
+            state = encode_state(game, player_number)
+            history.append(state)
+            phase = classify(state, game.turns, bits, voronoi)
+            if len(corpus[phase]) < per_phase and len(history) >= 2 and rng.random() < 0.15:
+                corpus[phase].append(history[-2:])
+            if game.turns < opening:
+                moves = [(rng.choice([Direction.UP, Direction.DOWN]), False), right_turn_player(game, 2)]
+            else:
+                moves = [players[0](game, 1), players[1](game, 2)]
+            result = game.step(moves[0][0], moves[1][0], boost1=moves[0][1], boost2=moves[1][1])
+
+    # Real games rarely reach high fill; pad contested and separated boards with walls.
+    sources = corpus["contested"] + corpus["separated"]
+    while len(corpus["nearly_full"]) < per_phase and sources:
+        base = rng.choice(sources)
+        target = rng.uniform(0.72, 0.9)
+        corpus["nearly_full"].append(fill_with_walls(base, rng, target, bits))
+    return corpus
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    arr = np.array(samples) * 1000.0
+    stats = {f"p{p}": float(np.percentile(arr, p)) for p in PERCENTILES}
+    stats["max"] = float(arr.max())
+    stats["n"] = len(samples)
+    return stats
+
+
+def timed(fn: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def bench(corpus: Dict[str, List[List[dict]]], budget_ms: float, repeat: int) -> Dict[str, Dict[str, dict]]:
+    import agent
+
+    agent.matches.search_budget_ms = budget_ms
+    client = agent.app.test_client()
+    raw: Dict[str, Dict[str, List[float]]] = {}
+
+    def add(metric: str, phase: str, samples: List[float]) -> None:
+        raw.setdefault(metric, {}).setdefault(phase, []).extend(samples)
+        raw[metric].setdefault("all", []).extend(samples)
+
+    for phase, sequences in corpus.items():
+        for previous, state in sequences:
+            fresh = agent.Tron(search_budget_ms=budget_ms)
+            add("update_state_full", phase, timed(lambda: (fresh.reset(), fresh.update_state(state)), repeat))
+
+            def incremental() -> None:
+                fresh.reset()
+                fresh.update_state(previous)
+                t0 = time.perf_counter()
+                fresh.update_state(state)
+                samples.append(time.perf_counter() - t0)
+
+            samples: List[float] = []
+            for _ in range(repeat):
+                incremental()
+            add("update_state_incremental", phase, samples)
+
+            head = fresh.my_pos
+            if head is not None:
+                add("flood_fill", phase, timed(lambda: fresh.flood_fill(*head), repeat))
+            add("decide", phase, timed(fresh.decide, 1))
+
+            client.post("/end")
+            t0 = time.perf_counter()
+            client.post("/send-state", json=state)
+            t1 = time.perf_counter()
+            client.get("/send-move")
+            t2 = time.perf_counter()
+            add("http_send_state", phase, [t1 - t0])
+            add("http_send_move", phase, [t2 - t1])
+            add("http_round_trip", phase, [t2 - t0])
+
+    return {metric: {phase: percentiles(s) for phase, s in phases.items()} for metric, phases in raw.items()}
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for metric, phases in current["results"].items():
+        for phase, stats in phases.items():
+            base = baseline.get("results", {}).get(metric, {}).get(phase)
+            if not base:
+                continue
+            for key in ("p50", "p95"):
+                if base[key] > 0 and stats[key] > base[key] * (1.0 + threshold):
+                    regressions.append(
+                        f"{metric}/{phase} {key}: {stats[key]:.3f} ms vs baseline {base[key]:.3f} ms "
+                        f"(+{(stats[key] / base[key] - 1.0) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def render(results: Dict[str, Dict[str, dict]]) -> str:
+    lines = [f"{'metric':<26}{'phase':<13}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'n':>6}"]
+    for metric, phases in results.items():
+        for phase in PHASES + ("all",):
+            if phase not in phases:
+                continue
+            s = phases[phase]
+            lines.append(
+                f"{metric:<26}{phase:<13}{s['p50']:>9.3f}{s['p95']:>9.3f}{s['p99']:>9.3f}{s['max']:>9.3f}{s['n']:>6}"
+            )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--per-phase", type=int, default=20, help="boards per phase")
+    parser.add_argument("--repeat", type=int, default=20, help="repetitions for the cheap metrics")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="search budget used for decide/HTTP")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.per_phase, args.seed)
+    results = bench(corpus, args.budget_ms, args.repeat)
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "budget_ms": args.budget_ms,
+            "per_phase": args.per_phase,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "corpus": {phase: len(seqs) for phase, seqs in corpus.items()},
+        },
+        "results": results,
+    }
+    print(render(results))
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
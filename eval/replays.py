@@ -0,0 +1,141 @@
+"""Inspect a replay directory written by ``game.replay`` (e.g. ``tournament --replays``).
+
+Prints how many games each agent pairing played and how they ended, checks
+that records re-simulate to their recorded result, or shows the board of one
+game at a given turn. Run from the repository root::
+
+    python -m eval.replays eval/results/replays
+    python -m eval.replays eval/results/replays --agents tron:50 greedy --either-seat --min-steps 100
+    python -m eval.replays eval/results/replays --verify
+    python -m eval.replays eval/results/replays --show 12 --turn 40
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from collections import Counter
+from typing import Optional, Tuple
+
+import numpy as np
+
+from game.case_closed_game import Game, GameResult
+from game.replay import DIRECTIONS, RESULTS, Replay, ReplayStore, new_game
+
+
+def replay_outcome(replay: Replay) -> Tuple[Optional[GameResult], int]:
+    """``(result, turns)`` from re-running ``replay`` through the engine."""
+
+    game = new_game(replay.start)
+    result = None
+    # The engine's own log lines would drown the report.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for d1, d2, b1, b2 in replay.moves:
+            if result is not None:
+                break
+            result = game.step(DIRECTIONS[d1], DIRECTIONS[d2], boost1=b1, boost2=b2)
+        if result is None and game.turns >= 200:
+            # The turn limit is decided by the step after the last recorded one.
+            result = game.step(game.agent1.direction, game.agent2.direction)
+    return result, game.turns
+
+
+def render(game: Game) -> str:
+    """The board with trails as ``1``/``2`` and heads as ``A``/``B``."""
+
+    board = game.board
+    heads = {tuple(game.agent1.trail[-1]): "A", tuple(game.agent2.trail[-1]): "B"}
+    rows = []
+    for y in range(board.height):
+        row = []
+        for x in range(board.width):
+            owner = board.owners[y * board.width + x]
+            cell = heads.get((x, y)) if owner is not None else None
+            row.append(cell or ("." if owner is None else str(owner)))
+        rows.append(" ".join(row))
+    return "\n".join(rows)
+
+
+def summary(store: ReplayStore, rows: np.ndarray) -> str:
+    index = store.index[rows]
+    pairs: Counter = Counter()
+    for entry in index:
+        pairs[(int(entry["agent1"]), int(entry["agent2"]), int(entry["result"]))] += 1
+    lines = [f"{len(rows)} games, {len(store)} in store, {len(store.agents)} agents"]
+    if len(rows):
+        lines.append(f"steps: mean {index['steps'].mean():.1f}  min {index['steps'].min()}  max {index['steps'].max()}")
+        lines.append(f"record bytes: mean {index['size'].mean():.1f}  total {int(index['size'].sum())}")
+    lines.append(f"{'agent1':<24}{'agent2':<24}{'A1 win':>8}{'A2 win':>8}{'draw':>8}{'unfin.':>8}")
+    seen = sorted({(a1, a2) for a1, a2, _ in pairs})
+    for a1, a2 in seen:
+        counts = [pairs[(a1, a2, code)] for code in (1, 2, 3, 0)]
+        lines.append(f"{store.agents[a1]:<24}{store.agents[a2]:<24}" + "".join(f"{c:>8}" for c in counts))
+    return "\n".join(lines)
+
+
+def verify(store: ReplayStore, rows: np.ndarray) -> int:
+    """Re-simulate ``rows``; returns the number of mismatching records."""
+
+    bad = 0
+    for row, replay in zip(np.sort(rows), store.iter_replays(rows)):
+        if replay.result is None:
+            continue
+        result, steps = replay_outcome(replay)
+        if result != replay.result:
+            bad += 1
+            print(f"row {row}: recorded {replay.result.name}, replayed {result.name if result else None} at turn {steps}")
+    return bad
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--agents", nargs=2, default=None, metavar=("AGENT1", "AGENT2"),
+                        help="only games between these agents ('*' matches any)")
+    parser.add_argument("--either-seat", action="store_true", help="match --agents in either seat order")
+    parser.add_argument("--result", choices=[r.name for r in RESULTS.values()], default=None)
+    parser.add_argument("--min-steps", type=int, default=0)
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument("--unfinished", action="store_true", help="include unfinished games")
+    parser.add_argument("--verify", action="store_true", help="re-simulate the selected games and check their results")
+    parser.add_argument("--show", type=int, default=None, metavar="ROW", help="print the board of one game")
+    parser.add_argument("--turn", type=int, default=None, help="turn to show (default: the final position)")
+    args = parser.parse_args()
+
+    store = ReplayStore(args.directory)
+    try:
+        if args.show is not None:
+            replay = store.read(args.show)
+            turn = len(replay.moves) if args.turn is None else min(args.turn, len(replay.moves))
+            with contextlib.redirect_stdout(io.StringIO()):
+                game = store.game_at(args.show, turn)
+            result = replay.result.name if replay.result else "UNFINISHED"
+            print(f"{replay.agents[0]} vs {replay.agents[1]}  tag {replay.tag}  {result} ({replay.reason})  "
+                  f"turn {turn}/{len(replay.moves)}")
+            print(render(game))
+            return
+
+        agents = None
+        if args.agents:
+            agents = tuple(None if name == "*" else name for name in args.agents)
+        rows = store.select(
+            result=GameResult[args.result] if args.result else None,
+            min_steps=args.min_steps,
+            max_steps=args.max_steps,
+            agents=agents,
+            either_seat=args.either_seat,
+            unfinished=args.unfinished,
+        )
+        print(summary(store, rows))
+        if args.verify:
+            t0 = time.perf_counter()
+            bad = verify(store, rows)
+            print(f"verified {len(rows)} games in {time.perf_counter() - t0:.1f}s, {bad} mismatches")
+            if bad:
+                raise SystemExit(1)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""In-process tournament runner for Case Closed agents.
+
+Agents are plain callables ``player(game, player_number) -> (Direction, boost)``
+built from short spec strings, so matches run directly on ``Game`` without
+any HTTP round-trips. Games are spread over a process pool with a
+deterministic seed per game, every pairing is played from both seats, each
+finished game is appended to a JSONL file as soon as it completes, and the
+final report lists W/D/L, Elo with bootstrap confidence intervals and
+per-agent move latency percentiles. With ``--replays DIR`` every game is
+also recorded in the binary replay format of ``game.replay`` (see
+``python -m eval.replays``).
+
+Run from the repository root::
+
+    python -m eval.tournament tron:50 greedy right_turn --games 10 --workers 4
+    python -m eval.tournament tron:100 --gauntlet greedy right_turn --games 20
+
+Agent specs are ``name[:arg]`` for the built-ins in ``AGENT_FACTORIES`` (which
+include the ``training.opponents`` bots) or
+``package.module:factory[:arg]`` for anything importable; prefix with
+``label=`` to rename an entry in the report.
+"""
+
+import argparse
+import atexit
+import importlib
+import json
+import math
+import os
+import random
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from game.case_closed_game import Direction, Game, GameResult
+from game.replay import ReplayRecorder, ReplayWriter
+from training.opponents import OPPONENTS, make_opponent
+
+Player = Callable[[Game, int], Tuple[Direction, bool]]
+
+RIGHT_TURN = {
+    Direction.UP: Direction.RIGHT,
+    Direction.RIGHT: Direction.DOWN,
+    Direction.DOWN: Direction.LEFT,
+    Direction.LEFT: Direction.UP,
+}
+
+
+def encode_state(game: Game, player_number: int) -> dict:
+    """The ``/send-state`` payload the HTTP harness would send for ``game``."""
+
+    return {
+        "width": game.board.width,
+        "height": game.board.height,
+        "walls": [],
+        "agent1_trail": game.agent1.get_trail_positions(),
+        "agent2_trail": game.agent2.get_trail_positions(),
+        "agent1_boosts": game.agent1.boosts_remaining,
+        "agent2_boosts": game.agent2.boosts_remaining,
+        "player_number": player_number,
+        "turn_count": game.turns,
+    }
+
+
+class TronPlayer:
+    """Adapter running ``agent.Tron`` in-process; ``budget_ms`` 0 is the greedy mode."""
+
+    def __init__(self, budget_ms: float) -> None:
+        from agent import Tron, shared_eval_cache
+
+        # Games played by one worker share the evaluation cache.
+        self.tron = Tron(search_budget_ms=budget_ms, eval_cache=shared_eval_cache())
+
+    def reset(self) -> None:
+        self.tron.reset()
+
+    def __call__(self, game: Game, player_number: int) -> Tuple[Direction, bool]:
+        self.tron.update_state(encode_state(game, player_number))
+        move, boost = self.tron.decide()
+        return Direction[move], boost
+
+
+def right_turn_player(game: Game, player_number: int) -> Tuple[Direction, bool]:
+    """The README's scrimmage opponent, with O(1) board lookups."""
+
+    agent = game.agent1 if player_number == 1 else game.agent2
+    board = game.board
+    current = agent.direction
+    preferred = RIGHT_TURN[current]
+    head = agent.trail[-1]
+    for option in (preferred, current, RIGHT_TURN[preferred], RIGHT_TURN[RIGHT_TURN[current]]):
+        dx, dy = option.value
+        if board.get_cell_state((head[0] + dx, head[1] + dy)) == 0:
+            return option, False
+    return random.choice(list(Direction)), False
+
+
+AGENT_FACTORIES: Dict[str, Callable[[Optional[str]], Player]] = {
+    "tron": lambda arg: TronPlayer(float(arg) if arg else 150.0),
+    "greedy": lambda arg: TronPlayer(0.0),
+    "right_turn": lambda arg: right_turn_player,
+}
+# training.opponents: random_safe, wall_hugger, flood_fill, a1k0n, policy:<path>.
+AGENT_FACTORIES.update(
+    {name: (lambda arg, name=name: make_opponent(f"{name}:{arg}" if arg else name)) for name in OPPONENTS}
+)
+
+
+def parse_spec(spec: str) -> Tuple[str, str]:
+    """Split ``label=spec`` into (label, spec); the label defaults to the spec."""
+
+    if "=" in spec:
+        label, spec = spec.split("=", 1)
+        return label, spec
+    return spec, spec
+
+
+def build_player(spec: str) -> Player:
+    name, _, arg = spec.partition(":")
+    if name in AGENT_FACTORIES:
+        return AGENT_FACTORIES[name](arg or None)
+    module_name, _, rest = spec.partition(":")
+    attr, _, arg = rest.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown agent spec {spec!r}")
+    factory = getattr(importlib.import_module(module_name), attr)
+    return factory(arg) if arg else factory()
+
+
+class MatchTask(NamedTuple):
+    game_id: int
+    seat1: str  # label
+    spec1: str
+    seat2: str
+    spec2: str
+    seed: int
+    replays: Optional[str] = None  # replay directory
+
+
+_players: Dict[Tuple[str, int], Player] = {}
+_replay_writers: Dict[str, ReplayWriter] = {}
+
+
+def seat_player(spec: str, seat: int) -> Player:
+    """This process's player for ``spec`` in ``seat``, reset for a new game.
+
+    Players are built once per worker (a search player's tables and caches
+    stay warm); each seat gets its own so a mirror match does not share state.
+    """
+
+    player = _players.get((spec, seat))
+    if player is None:
+        player = _players[(spec, seat)] = build_player(spec)
+    else:
+        reset = getattr(player, "reset", None)
+        if reset is not None:
+            reset()
+    return player
+
+
+def replay_writer(directory: str) -> ReplayWriter:
+    """This process's writer for ``directory``, closed at exit."""
+
+    writer = _replay_writers.get(directory)
+    if writer is None:
+        if not _replay_writers:
+            atexit.register(_close_replay_writers)
+        writer = _replay_writers[directory] = ReplayWriter(directory)
+    return writer
+
+
+def _close_replay_writers() -> None:
+    for writer in _replay_writers.values():
+        writer.close()
+    _replay_writers.clear()
+
+
+def play_match(task: MatchTask) -> dict:
+    """Play one game in the current process and return its record."""
+
+    random.seed(task.seed)
+    np.random.seed(task.seed % (2 ** 32))
+    players = (seat_player(task.spec1, 1), seat_player(task.spec2, 2))
+    latencies: Tuple[List[float], List[float]] = ([], [])
+    errors = [0, 0]
+
+    recorder = None
+    if task.replays:
+        recorder = ReplayRecorder(replay_writer(task.replays), (task.seat1, task.seat2), tag=task.game_id)
+    game = Game(recorder=recorder)
+    result: Optional[GameResult] = None
+    while result is None:
+        moves = []
+        for seat, player in enumerate(players):
+            agent = game.agent1 if seat == 0 else game.agent2
+            t0 = time.perf_counter()
+            try:
+                move = player(game, seat + 1)
+            except Exception:
+                errors[seat] += 1
+                move = (agent.direction, False)
+            latencies[seat].append(time.perf_counter() - t0)
+            moves.append(move)
+        (d1, b1), (d2, b2) = moves
+        result = game.step(d1, d2, boost1=b1, boost2=b2)
+    if recorder is not None:
+        recorder.writer.flush()
+
+    return {
+        "game_id": task.game_id,
+        "seed": task.seed,
+        "agent1": task.seat1,
+        "agent2": task.seat2,
+        "result": result.name,
+        "turns": game.turns,
+        "lengths": [game.agent1.length, game.agent2.length],
+        "errors": errors,
+        "latency_ms": [[t * 1000.0 for t in seat] for seat in latencies],
+    }
+
+
+def schedule(
+    entries: List[Tuple[str, str]],
+    games_per_seat: int,
+    seed: int,
+    candidates: Optional[List[Tuple[str, str]]] = None,
+    replays: Optional[str] = None,
+) -> List[MatchTask]:
+    """Round-robin among ``entries``, or each candidate against every entry (gauntlet)."""
+
+    if candidates:
+        pairs = [(c, e) for c in candidates for e in entries]
+    else:
+        pairs = [(entries[i], entries[j]) for i in range(len(entries)) for j in range(i + 1, len(entries))]
+
+    tasks = []
+    for (label_a, spec_a), (label_b, spec_b) in pairs:
+        for g in range(games_per_seat):
+            for seat1, seat2 in (((label_a, spec_a), (label_b, spec_b)), ((label_b, spec_b), (label_a, spec_a))):
+                game_seed = zlib.crc32(f"{seed}|{seat1[0]}|{seat2[0]}|{g}".encode())
+                tasks.append(MatchTask(len(tasks), seat1[0], seat1[1], seat2[0], seat2[1], game_seed, replays))
+    return tasks
+
+
+def elo_ratings(records: List[dict], labels: List[str], iterations: int = 200) -> Dict[str, float]:
+    """Bradley-Terry maximum likelihood (draws count half), on the Elo scale, mean 0."""
+
+    index = {label: i for i, label in enumerate(labels)}
+    n = len(labels)
+    wins = np.zeros((n, n))
+    for record in records:
+        a, b = index[record["agent1"]], index[record["agent2"]]
+        if record["result"] == GameResult.AGENT1_WIN.name:
+            wins[a, b] += 1.0
+        elif record["result"] == GameResult.AGENT2_WIN.name:
+            wins[b, a] += 1.0
+        else:
+            wins[a, b] += 0.5
+            wins[b, a] += 0.5
+    # A tiny prior keeps undefeated or winless agents finite.
+    wins += 0.1 * (1 - np.eye(n))
+    games = wins + wins.T
+    strength = np.ones(n)
+    for _ in range(iterations):
+        denom = (games / (strength[:, None] + strength[None, :])).sum(axis=1)
+        strength = wins.sum(axis=1) / np.maximum(denom, 1e-12)
+        strength /= math.exp(np.log(strength).mean())
+    ratings = 400.0 * np.log10(strength)
+    return {label: float(ratings[i]) for label, i in index.items()}
+
+
+def bootstrap_elo(records: List[dict], labels: List[str], rounds: int, seed: int) -> Dict[str, Tuple[float, float]]:
+    rng = np.random.default_rng(seed)
+    samples: Dict[str, List[float]] = {label: [] for label in labels}
+    for _ in range(rounds):
+        picks = rng.integers(0, len(records), len(records))
+        ratings = elo_ratings([records[i] for i in picks], labels, iterations=100)
+        for label in labels:
+            samples[label].append(ratings[label])
+    return {
+        label: (float(np.percentile(values, 2.5)), float(np.percentile(values, 97.5)))
+        for label, values in samples.items()
+    }
+
+
+def summarize(records: List[dict], labels: List[str], bootstrap: int, seed: int) -> str:
+    stats = {label: {"W": 0, "D": 0, "L": 0, "errors": 0, "latency": []} for label in labels}
+    for record in records:
+        seats = (record["agent1"], record["agent2"])
+        outcome = record["result"]
+        for seat, label in enumerate(seats):
+            s = stats[label]
+            s["errors"] += record["errors"][seat]
+            s["latency"].extend(record["latency_ms"][seat])
+            if outcome == GameResult.DRAW.name:
+                s["D"] += 1
+            elif outcome == (GameResult.AGENT1_WIN.name if seat == 0 else GameResult.AGENT2_WIN.name):
+                s["W"] += 1
+            else:
+                s["L"] += 1
+
+    ratings = elo_ratings(records, labels)
+    intervals = bootstrap_elo(records, labels, bootstrap, seed) if bootstrap else {}
+
+    lines = [
+        f"{'agent':<24}{'W':>6}{'D':>6}{'L':>6}{'Elo':>8}{'95% CI':>18}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'err':>5}"
+    ]
+    for label in sorted(labels, key=lambda l: -ratings[l]):
+        s = stats[label]
+        lat = np.array(s["latency"]) if s["latency"] else np.zeros(1)
+        low, high = intervals.get(label, (float("nan"), float("nan")))
+        lines.append(
+            f"{label:<24}{s['W']:>6}{s['D']:>6}{s['L']:>6}{ratings[label]:>8.0f}"
+            f"{f'[{low:.0f}, {high:.0f}]':>18}"
+            f"{np.percentile(lat, 50):>9.2f}{np.percentile(lat, 95):>9.2f}"
+            f"{np.percentile(lat, 99):>9.2f}{lat.max():>9.2f}{s['errors']:>5}"
+        )
+    return "\n".join(lines)
+
+
+def run(
+    tasks: List[MatchTask],
+    workers: int,
+    out_path: Optional[str],
+) -> Iterable[dict]:
+    """Yield game records as they finish, appending each to ``out_path``."""
+
+    out = open(out_path, "a", encoding="utf-8") if out_path else None
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if pool is None:
+            completed = (play_match(task) for task in tasks)
+        else:
+            futures = [pool.submit(play_match, task) for task in tasks]
+            completed = (future.result() for future in as_completed(futures))
+        for record in completed:
+            if out is not None:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+            yield record
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if out is not None:
+            out.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("agents", nargs="+", help="agent specs (see module docstring)")
+    parser.add_argument("--gauntlet", nargs="*", default=None, metavar="OPPONENT",
+                        help="play the positional agents only against these opponents")
+    parser.add_argument("--games", type=int, default=10, help="games per pairing and seat")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="eval/results/tournament.jsonl")
+    parser.add_argument("--bootstrap", type=int, default=200, help="bootstrap rounds for Elo CIs (0 disables)")
+    parser.add_argument("--replays", default=None, metavar="DIR", help="record every game into this replay directory")
+    args = parser.parse_args()
+
+    if args.gauntlet is not None:
+        candidates = [parse_spec(s) for s in args.agents]
+        entries = [parse_spec(s) for s in args.gauntlet]
+    else:
+        candidates = None
+        entries = [parse_spec(s) for s in args.agents]
+    labels = list(dict.fromkeys(label for label, _ in (candidates or []) + entries))
+
+    tasks = schedule(entries, args.games, args.seed, candidates, args.replays)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+
+    records = []
+    t0 = time.perf_counter()
+    for record in run(tasks, args.workers, args.out):
+        records.append(record)
+        print(f"\r{len(records)}/{len(tasks)} games", end="", flush=True)
+    print(f"\r{len(records)} games in {time.perf_counter() - t0:.1f}s")
+    print(summarize(records, labels, args.bootstrap, args.seed))
+
+
+if __name__ == "__main__":
+    main()
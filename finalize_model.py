@@ -1,10 +1,172 @@
 # finalize_model.py
+"""Export the trained policy for fast CPU inference in the Docker image.
+
+Loads the PPO policy checkpoint, builds ``TronPolicyNet`` (extractor plus
+action/value heads), and writes:
+
+* ``policy.ts``        TorchScript, channels-last, int8 dynamic-quantized heads
+* ``policy.onnx``      ONNX fp32
+* ``policy.int8.onnx`` ONNX with int8 dynamic-quantized heads (onnxruntime)
+
+Every artifact is checked against the eager model on encoded game states and
+random boards (max |logit/value| error and argmax agreement), then timed for
+a single state and a batch. ``agent.py`` loads ``POLICY_PATH`` (default
+``models/policy.onnx``) once at startup through ``game.policy.PolicyRuntime``.
+
+    python finalize_model.py --checkpoint models/interactive_final.pt
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
 import torch
-from training.model import TronTransformer
-from gymnasium import spaces
-
-model = TronTransformer(spaces.Box(0,1,shape=(10,18,20)), features_dim=128)
-model.load_state_dict(torch.load("models/interactive_final.pt", map_location="cpu"))
-model.eval()
-torch.save(model.state_dict(), "models/interactive_final.pt")
-print("Model exported for Docker")
\ No newline at end of file
+
+from game.case_closed_game import Direction, Game
+from game.policy import PolicyRuntime
+from training.model import TronPolicyNet
+from training.utils import ObservationEncoder
+
+
+def load_eager(checkpoint):
+    state_dict = torch.load(checkpoint, map_location="cpu")
+    model = TronPolicyNet.from_state_dict(state_dict)
+    model.eval()
+    return model
+
+
+def sample_observations(n, seed=0):
+    """Observations from random games (realistic sparsity) plus uniform noise boards."""
+    rng = random.Random(seed)
+    obs = []
+    while len(obs) < n // 2:
+        game = Game()
+        encoder = ObservationEncoder(player=rng.choice((1, 2)))
+        result = None
+        while result is None and len(obs) < n // 2:
+            obs.append(encoder.update(game).copy())
+            result = game.step(rng.choice(list(Direction)), rng.choice(list(Direction)),
+                               boost1=rng.random() < 0.1, boost2=rng.random() < 0.1)
+    noise = np.random.default_rng(seed).random((n - len(obs),) + TronPolicyNet.OBS_SHAPE, dtype=np.float32)
+    return np.concatenate([np.stack(obs), (noise > 0.6).astype(np.float32)])
+
+
+def export_torchscript(model, path):
+    """Trace a channels-last copy with dynamically quantized Linear heads, then freeze."""
+    quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized = quantized.to(memory_format=torch.channels_last)
+    example = torch.zeros((1,) + TronPolicyNet.OBS_SHAPE).contiguous(memory_format=torch.channels_last)
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, example)
+        # optimize_for_inference would prepack weights into a form that
+        # cannot be serialized; freezing alone keeps the file loadable.
+        frozen = torch.jit.freeze(traced)
+    frozen.save(path)
+    return path
+
+
+def export_onnx(model, path):
+    example = torch.zeros((1,) + TronPolicyNet.OBS_SHAPE)
+    torch.onnx.export(
+        model, example, path,
+        input_names=["obs"], output_names=["logits", "value"],
+        dynamic_axes={"obs": {0: "batch"}, "logits": {0: "batch"}, "value": {0: "batch"}},
+        opset_version=17,
+        dynamo=False,
+    )
+    return path
+
+
+def quantize_onnx(src, dst):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # ConvInteger is far slower than fp32 Conv in onnxruntime on CPUs without
+    # VNNI, so only the Linear heads (Gemm/MatMul) are quantized, as in TorchScript.
+    quantize_dynamic(src, dst, weight_type=QuantType.QInt8, op_types_to_quantize=["MatMul", "Gemm"])
+    return dst
+
+
+def validate(name, runtime, model, obs, tolerance):
+    with torch.no_grad():
+        ref_logits, ref_values = model(torch.from_numpy(obs))
+    ref_logits, ref_values = ref_logits.numpy(), ref_values.numpy().reshape(-1)
+    logits, values = runtime.predict(obs)
+    logit_err = float(np.abs(logits - ref_logits).max())
+    value_err = float(np.abs(values - ref_values).max())
+    agree = float((logits.argmax(1) == ref_logits.argmax(1)).mean())
+    ok = logit_err <= tolerance and value_err <= tolerance
+    print(f"  {name:<18} max|dlogit| {logit_err:.2e}  max|dvalue| {value_err:.2e}  "
+          f"argmax agree {agree:6.1%}  {'OK' if ok else 'FAIL'} (tol {tolerance:g})")
+    return ok
+
+
+def benchmark(name, predict, obs, batch, repeat):
+    x = np.ascontiguousarray(obs[:batch])
+    for _ in range(5):
+        predict(x)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        predict(x)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    p50, p95 = np.percentile(samples, [50, 95])
+    print(f"  {name:<18} batch {batch:>3}  p50 {p50:7.3f} ms  p95 {p95:7.3f} ms  "
+          f"{batch / p50 * 1000.0:9.0f} states/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the policy network for CPU inference.")
+    parser.add_argument("--checkpoint", default="models/interactive_final.pt")
+    parser.add_argument("--out-dir", default="models")
+    parser.add_argument("--samples", type=int, default=256, help="observations used for validation")
+    parser.add_argument("--batch", type=int, default=32, help="batch size for the batched benchmark")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=1, help="intra-op threads (the container has one core)")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    os.makedirs(args.out_dir, exist_ok=True)
+    model = load_eager(args.checkpoint)
+    obs = sample_observations(args.samples)
+
+    artifacts = {}
+    artifacts["torchscript-int8"] = export_torchscript(model, os.path.join(args.out_dir, "policy.ts"))
+    onnx_path = export_onnx(model, os.path.join(args.out_dir, "policy.onnx"))
+    artifacts["onnx-fp32"] = onnx_path
+    try:
+        artifacts["onnx-int8"] = quantize_onnx(onnx_path, os.path.join(args.out_dir, "policy.int8.onnx"))
+    except ImportError:
+        print("onnxruntime not installed; skipping ONNX int8")
+
+    # Quantized heads only touch the last layers, so int8 artifacts get a looser bound.
+    tolerances = {"torchscript-int8": 5e-2, "onnx-fp32": 1e-4, "onnx-int8": 5e-2}
+    print("validation against eager fp32:")
+    runtimes = {}
+    all_ok = True
+    for name, path in artifacts.items():
+        runtime = PolicyRuntime.load(path, warmup=5, threads=args.threads)
+        if runtime is None:
+            print(f"  {name:<18} could not be loaded")
+            all_ok = False
+            continue
+        runtimes[name] = runtime
+        all_ok &= validate(name, runtime, model, obs, tolerances[name])
+
+    print("latency:")
+    with torch.inference_mode():
+        eager = lambda x: model(torch.from_numpy(x))  # noqa: E731
+        for batch in (1, args.batch):
+            benchmark("eager", eager, obs, batch, args.repeat)
+            for name, runtime in runtimes.items():
+                benchmark(name, runtime.predict, obs, batch, args.repeat)
+
+    for name, path in artifacts.items():
+        print(f"{name:<18} {path} ({os.path.getsize(path) / 1024:.0f} KiB)")
+    if not all_ok:
+        raise SystemExit("validation failed")
+    print("Model exported for Docker")
+
+
+if __name__ == "__main__":
+    main()
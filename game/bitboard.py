@@ -0,0 +1,159 @@
+"""Bit-packed torus occupancy and bit-parallel flood fill for the arena.
+
+Cell ``(x, y)`` lives at bit ``y * width + x`` of a plain Python int, so the
+default 20x18 board fits in a 360-bit integer. Masks are immutable values:
+"occupying" a cell is just ``mask | board.bit(x, y)`` and never copies a grid.
+"""
+
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+Coord = Tuple[int, int]
+
+
+class BitBoard:
+    """Geometry helpers for bitmasks over a ``width`` x ``height`` torus."""
+
+    __slots__ = ("width", "height", "size", "full", "_first_col", "_last_col", "_last_row")
+
+    def __init__(self, width: int = 20, height: int = 18) -> None:
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.full = (1 << self.size) - 1
+
+        first_col = 0
+        for y in range(height):
+            first_col |= 1 << (y * width)
+        self._first_col = first_col
+        self._last_col = first_col << (width - 1)
+        self._last_row = ((1 << width) - 1) << (self.size - width)
+
+    def bit(self, x: int, y: int) -> int:
+        return 1 << ((y % self.height) * self.width + (x % self.width))
+
+    def index(self, x: int, y: int) -> int:
+        return (y % self.height) * self.width + (x % self.width)
+
+    def coord(self, index: int) -> Coord:
+        return index % self.width, index // self.width
+
+    def adjacency(self) -> List[Tuple[int, int, int, int]]:
+        """Neighbour indices of every cell, ordered UP, DOWN, LEFT, RIGHT."""
+
+        width, height = self.width, self.height
+        table = []
+        for index in range(self.size):
+            x, y = index % width, index // width
+            table.append(
+                (
+                    ((y - 1) % height) * width + x,
+                    ((y + 1) % height) * width + x,
+                    y * width + (x - 1) % width,
+                    y * width + (x + 1) % width,
+                )
+            )
+        return table
+
+    def from_cells(self, cells: Iterable[Sequence[int]]) -> int:
+        """Pack an iterable of ``(x, y)`` pairs into a mask (wrapping on the torus)."""
+
+        mask = 0
+        width, height = self.width, self.height
+        for cell in cells:
+            mask |= 1 << ((cell[1] % height) * width + (cell[0] % width))
+        return mask
+
+    def from_grid(self, grid: Sequence[Sequence[int]]) -> int:
+        """Pack every non-zero cell of a row-major grid into a mask."""
+
+        mask = 0
+        width = self.width
+        for y, row in enumerate(grid):
+            base = y * width
+            for x, value in enumerate(row):
+                if value != 0:
+                    mask |= 1 << (base + x)
+        return mask
+
+    def iter_cells(self, mask: int) -> Iterator[Coord]:
+        width = self.width
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            yield index % width, index // width
+            mask ^= low
+
+    def cells(self, mask: int) -> List[Coord]:
+        return list(self.iter_cells(mask))
+
+    # Single-step shifts. Each returns the mask moved one cell in that direction,
+    # wrapping across the torus edges.
+
+    def shift_right(self, mask: int) -> int:
+        last = mask & self._last_col
+        return ((mask ^ last) << 1) | (last >> (self.width - 1))
+
+    def shift_left(self, mask: int) -> int:
+        first = mask & self._first_col
+        return ((mask ^ first) >> 1) | (first << (self.width - 1))
+
+    def shift_down(self, mask: int) -> int:
+        last = mask & self._last_row
+        return ((mask ^ last) << self.width) | (last >> (self.size - self.width))
+
+    def shift_up(self, mask: int) -> int:
+        return (mask >> self.width) | ((mask & ((1 << self.width) - 1)) << (self.size - self.width))
+
+    def neighbors(self, mask: int) -> int:
+        """Cells orthogonally adjacent to any cell of ``mask`` (may overlap ``mask``)."""
+
+        width = self.width
+        size = self.size
+        last_col = mask & self._last_col
+        first_col = mask & self._first_col
+        last_row = mask & self._last_row
+        return (
+            ((mask ^ last_col) << 1)
+            | (last_col >> (width - 1))
+            | ((mask ^ first_col) >> 1)
+            | (first_col << (width - 1))
+            | ((mask ^ last_row) << width)
+            | (last_row >> (size - width))
+            | (mask >> width)
+            | ((mask & ((1 << width) - 1)) << (size - width))
+        )
+
+    def flood(self, seed: int, free: int) -> int:
+        """Return every cell reachable from ``seed`` through ``free`` cells.
+
+        The seed cells are always part of the result, even if they are not free
+        (a head sits on an occupied cell). Each iteration dilates only the newest
+        frontier, so the loop runs once per BFS layer.
+        """
+
+        reach = seed
+        frontier = seed
+        while frontier:
+            frontier = self.neighbors(frontier) & free & ~reach
+            reach |= frontier
+        return reach
+
+    def flood_count(self, seed: int, free: int) -> int:
+        return self.flood(seed, free).bit_count()
+
+    def occupy(self, mask: int, x: int, y: int) -> int:
+        """Return ``mask`` with ``(x, y)`` set; the original value is untouched."""
+
+        return mask | self.bit(x, y)
+
+    def release(self, mask: int, x: int, y: int) -> int:
+        """Return ``mask`` with ``(x, y)`` cleared; the original value is untouched."""
+
+        return mask & ~self.bit(x, y)
+
+    def render(self, mask: int) -> str:
+        rows = []
+        for y in range(self.height):
+            row = (mask >> (y * self.width)) & ((1 << self.width) - 1)
+            rows.append(" ".join("#" if (row >> x) & 1 else "." for x in range(self.width)))
+        return "\n".join(rows)
@@ -1,11 +1,17 @@
+import logging
 import random
 from collections import deque
 from enum import Enum
-from typing import Optional
+from typing import Callable, Optional
 
 EMPTY = 0
 AGENT = 1
 
+logger = logging.getLogger(__name__)
+
+# Called as on_event(name, fields) for boosts, crashes, invalid moves and results.
+EventCallback = Callable[[str, dict], None]
+
 """
 GameBoard class manages the game board.
 
@@ -16,7 +22,24 @@ class GameBoard:
     def __init__(self, height: int = 18, width: int = 20):
         self.height = height
         self.width = width
-        self.grid = [[EMPTY for _ in range(width)] for _ in range(height)]
+        # Flat row-major buffers (index y * width + x) so copies are a single slice.
+        self.cells = bytearray(height * width)
+        # Id of the agent whose trail covers each cell (None when empty), so
+        # collisions can be classified without scanning trails.
+        self.owners: list = [None] * (height * width)
+        # While not None, every write appends (index, old_state, old_owner) for Game.pop.
+        self.journal: Optional[list] = None
+
+    @property
+    def grid(self) -> tuple[tuple[int, ...], ...]:
+        """Read-only rows of cell states, built from ``cells`` on each access.
+
+        Rows are tuples so ``board.grid[y][x] = ...`` fails loudly; write cells
+        through ``set_cell_state``.
+        """
+        width = self.width
+        cells = self.cells
+        return tuple(tuple(cells[y * width:(y + 1) * width]) for y in range(self.height))
 
     def _torus_check(self, position: tuple[int, int]) -> tuple[int, int]:
         x, y = position
@@ -26,17 +49,25 @@ class GameBoard:
     
     def get_cell_state(self, position: tuple[int, int]) -> int:
         x, y = self._torus_check(position)
-        return self.grid[y][x]
+        return self.cells[y * self.width + x]
 
-    def set_cell_state(self, position: tuple[int, int], state: int):
+    def set_cell_state(self, position: tuple[int, int], state: int, owner=None):
         x, y = self._torus_check(position)
-        self.grid[y][x] = state
+        index = y * self.width + x
+        if self.journal is not None:
+            self.journal.append((index, self.cells[index], self.owners[index]))
+        self.cells[index] = state
+        self.owners[index] = owner
+
+    def get_cell_owner(self, position: tuple[int, int]):
+        x, y = self._torus_check(position)
+        return self.owners[y * self.width + x]
 
     def get_random_empty_cell(self) -> tuple[int, int] | None:
         empty_cells = []
         for y in range(self.height):
             for x in range(self.width):
-                if self.grid[y][x] == EMPTY:
+                if self.cells[y * self.width + x] == EMPTY:
                     empty_cells.append((x, y))
         
         if not empty_cells:
@@ -44,12 +75,21 @@ class GameBoard:
         
         return random.choice(empty_cells)
 
+    def copy(self) -> 'GameBoard':
+        board = GameBoard.__new__(GameBoard)
+        board.height = self.height
+        board.width = self.width
+        board.cells = self.cells[:]
+        board.owners = self.owners[:]
+        board.journal = None
+        return board
+
     def __str__(self) -> str:
         chars = {EMPTY: '.', AGENT: 'A'}
         board_str = ""
         for y in range(self.height):
-            for x in range(self.width):
-                board_str += chars.get(self.grid[y][x], '?') + ' '
+            for cell in self.cells[y * self.width:(y + 1) * self.width]:
+                board_str += chars.get(cell, '?') + ' '
             board_str += '\n'
         return board_str
 
@@ -70,10 +110,19 @@ class GameResult(Enum):
     AGENT2_WIN = 2
     DRAW = 3
 
+def _emit(on_event: Optional[EventCallback], name: str, message: str, **fields) -> None:
+    if on_event is not None:
+        on_event(name, fields)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(message)
+
+
 class Agent:
     '''This class represents an agent in the game. It manages the agent's trail using a deque.'''
-    def __init__(self, agent_id: str, start_pos: tuple[int, int], start_dir: Direction, board: GameBoard):
+    def __init__(self, agent_id: str, start_pos: tuple[int, int], start_dir: Direction, board: GameBoard,
+                 on_event: Optional[EventCallback] = None):
         self.agent_id = agent_id
+        self.on_event = on_event
         second = (start_pos[0] + start_dir.value[0], start_pos[1] + start_dir.value[1])
         self.trail = deque([start_pos, second])  # Trail of positions
         self.direction = start_dir
@@ -82,8 +131,8 @@ class Agent:
         self.length = 2  # Initial length of the trail
         self.boosts_remaining = 3  # Each agent gets 3 speed boosts
 
-        self.board.set_cell_state(start_pos, AGENT)
-        self.board.set_cell_state(second, AGENT)
+        self.board.set_cell_state(start_pos, AGENT, agent_id)
+        self.board.set_cell_state(second, AGENT, agent_id)
     
     def is_head(self, position: tuple[int, int]) -> bool:
         return position == self.trail[-1]
@@ -105,20 +154,22 @@ class Agent:
             return False
 
         if use_boost and self.boosts_remaining <= 0:
-            print(f'Agent {self.agent_id} tried to boost but has no boosts remaining')
+            _emit(self.on_event, 'no_boost', f'Agent {self.agent_id} tried to boost but has no boosts remaining',
+                  agent=self.agent_id)
             use_boost = False
         
         num_moves = 2 if use_boost else 1
         
         if use_boost:
             self.boosts_remaining -= 1
-            print(f'Agent {self.agent_id} used boost! ({self.boosts_remaining} remaining)')
+            _emit(self.on_event, 'boost', f'Agent {self.agent_id} used boost! ({self.boosts_remaining} remaining)',
+                  agent=self.agent_id, remaining=self.boosts_remaining)
         
         for move_num in range(num_moves):
             cur_dx, cur_dy = self.direction.value
             req_dx, req_dy = direction.value
             if (req_dx, req_dy) == (-cur_dx, -cur_dy):
-                print('invalid move')
+                _emit(self.on_event, 'invalid_move', 'invalid move', agent=self.agent_id, direction=direction.name)
                 continue  # Skip this move if invalid direction
             
             head = self.trail[-1]
@@ -133,76 +184,172 @@ class Agent:
             
             # Handle collision with agent trail
             if cell_state == AGENT:
+                owner = self.board.get_cell_owner(new_head)
                 # Check if it's our own trail (any part of our trail)
-                if new_head in self.trail:
+                if owner == self.agent_id:
                     # Hit our own trail
                     self.alive = False
+                    _emit(self.on_event, 'crash', f'Agent {self.agent_id} hit its own trail',
+                          agent=self.agent_id, position=new_head, into='self')
                     return False
                 
                 # Check collision with the other agent
-                if other_agent and other_agent.alive and new_head in other_agent.trail:
+                if other_agent and other_agent.alive and owner == other_agent.agent_id:
                     # Check for head-on collision
                     if other_agent.is_head(new_head):
                         # Head-on collision: always a draw (both agents die)
                         self.alive = False
                         other_agent.alive = False
+                        _emit(self.on_event, 'crash', f'Agent {self.agent_id} collided head-on',
+                              agent=self.agent_id, position=new_head, into='head')
                         return False
                     else:
                         # Hit other agent's trail (not head-on)
                         self.alive = False
+                        _emit(self.on_event, 'crash', f'Agent {self.agent_id} hit the other trail',
+                              agent=self.agent_id, position=new_head, into='other')
                         return False
             
             # Normal move (empty cell) - leave trail behind
             # Add new head, trail keeps growing
             self.trail.append(new_head)
             self.length += 1
-            self.board.set_cell_state(new_head, AGENT)
+            self.board.set_cell_state(new_head, AGENT, self.agent_id)
         
         return True
 
     def get_trail_positions(self) -> list[tuple[int, int]]:
         return list(self.trail)
+
+    def copy(self, board: GameBoard) -> 'Agent':
+        """Copy of this agent bound to ``board`` (normally a copy of its own board)."""
+        agent = Agent.__new__(Agent)
+        agent.agent_id = self.agent_id
+        agent.on_event = self.on_event
+        agent.trail = self.trail.copy()
+        agent.direction = self.direction
+        agent.board = board
+        agent.alive = self.alive
+        agent.length = self.length
+        agent.boosts_remaining = self.boosts_remaining
+        return agent
     
 
 class Game:
-    def __init__(self):
+    def __init__(self, on_event: Optional[EventCallback] = None, recorder=None):
+        """Set ``on_event`` to receive structured events; otherwise they only go to ``logging``.
+
+        ``recorder`` (e.g. ``game.replay.ReplayRecorder``) is told about the
+        start position, every step played and the result of each game.
+        """
+        self.on_event = on_event
+        self.recorder = recorder
         self.board = GameBoard()
-        self.agent1 = Agent(agent_id=1, start_pos=(1, 2), start_dir=Direction.RIGHT, board=self.board)
-        self.agent2 = Agent(agent_id=2, start_pos=(17, 15), start_dir=Direction.LEFT, board=self.board)
+        self.agent1 = Agent(agent_id=1, start_pos=(1, 2), start_dir=Direction.RIGHT, board=self.board, on_event=on_event)
+        self.agent2 = Agent(agent_id=2, start_pos=(17, 15), start_dir=Direction.LEFT, board=self.board, on_event=on_event)
         self.turns = 0
+        self._history: list = []
+        if recorder is not None:
+            recorder.start(self)
     
     def reset(self):
         """Resets the game to the initial state."""
         self.board = GameBoard()
-        self.agent1 = Agent(agent_id=1, start_pos=(1, 2), start_dir=Direction.RIGHT, board=self.board)
-        self.agent2 = Agent(agent_id=2, start_pos=(17, 15), start_dir=Direction.LEFT, board=self.board)
+        self.agent1 = Agent(agent_id=1, start_pos=(1, 2), start_dir=Direction.RIGHT, board=self.board, on_event=self.on_event)
+        self.agent2 = Agent(agent_id=2, start_pos=(17, 15), start_dir=Direction.LEFT, board=self.board, on_event=self.on_event)
         self.turns = 0
+        self._history = []
+        if self.recorder is not None:
+            self.recorder.start(self)
     
     def step(self, dir1: Direction, dir2: Direction, boost1: bool = False, boost2: bool = False):
         """Advances the game by one step, moving both agents."""
         if self.turns >= 200:
-            print("Max turns reached. Checking trail lengths...")
+            lengths = {'agent1_length': self.agent1.length, 'agent2_length': self.agent2.length}
             if self.agent1.length > self.agent2.length:
-                print(f"Agent 1 wins with trail length {self.agent1.length} vs {self.agent2.length}")
-                return GameResult.AGENT1_WIN
+                return self._finish(GameResult.AGENT1_WIN, 'max_turns',
+                                    f"Agent 1 wins with trail length {self.agent1.length} vs {self.agent2.length}", **lengths)
             elif self.agent2.length > self.agent1.length:
-                print(f"Agent 2 wins with trail length {self.agent2.length} vs {self.agent1.length}")
-                return GameResult.AGENT2_WIN
+                return self._finish(GameResult.AGENT2_WIN, 'max_turns',
+                                    f"Agent 2 wins with trail length {self.agent2.length} vs {self.agent1.length}", **lengths)
             else:
-                print(f"Draw - both agents have trail length {self.agent1.length}")
-                return GameResult.DRAW
+                return self._finish(GameResult.DRAW, 'max_turns',
+                                    f"Draw - both agents have trail length {self.agent1.length}", **lengths)
         
+        if self.recorder is not None:
+            self.recorder.on_step(dir1, dir2, boost1, boost2)
         agent_one_alive = self.agent1.move(dir1, other_agent=self.agent2, use_boost=boost1)
         agent_two_alive = self.agent2.move(dir2, other_agent=self.agent1, use_boost=boost2)
 
         if not agent_one_alive and not agent_two_alive:
-            print("Both agents have crashed.")
-            return GameResult.DRAW
+            return self._finish(GameResult.DRAW, 'crash', "Both agents have crashed.")
         elif not agent_one_alive:
-            print("Agent 1 has crashed.")
-            return GameResult.AGENT2_WIN
+            return self._finish(GameResult.AGENT2_WIN, 'crash', "Agent 1 has crashed.")
         elif not agent_two_alive:
-            print("Agent 2 has crashed.")
-            return GameResult.AGENT1_WIN
+            return self._finish(GameResult.AGENT1_WIN, 'crash', "Agent 2 has crashed.")
 
         self.turns += 1
+
+    def _finish(self, result: GameResult, reason: str, message: str, **fields) -> GameResult:
+        _emit(self.on_event, 'result', message, result=result, reason=reason, turns=self.turns, **fields)
+        if self.recorder is not None:
+            self.recorder.on_result(result, reason)
+        return result
+
+    def push(self, dir1: Direction, dir2: Direction, boost1: bool = False, boost2: bool = False):
+        """Like ``step``, but remembers enough to undo the turn with ``pop``.
+
+        Only the handful of cells written this turn are journaled, so both
+        calls are O(1) regardless of trail length.
+        """
+        saved = (
+            self.turns,
+            self._agent_snapshot(self.agent1),
+            self._agent_snapshot(self.agent2),
+        )
+        journal: list = []
+        self.board.journal = journal
+        # Speculative turns are not part of the recorded game.
+        recorder, self.recorder = self.recorder, None
+        try:
+            result = self.step(dir1, dir2, boost1=boost1, boost2=boost2)
+        finally:
+            self.board.journal = None
+            self.recorder = recorder
+        self._history.append((saved, journal))
+        return result
+
+    def pop(self) -> None:
+        """Undo the most recent ``push``."""
+        (turns, snap1, snap2), journal = self._history.pop()
+        cells = self.board.cells
+        owners = self.board.owners
+        for index, state, owner in reversed(journal):
+            cells[index] = state
+            owners[index] = owner
+        self._restore_agent(self.agent1, snap1)
+        self._restore_agent(self.agent2, snap2)
+        self.turns = turns
+
+    def clone(self) -> 'Game':
+        """Independent copy of the current position (undo history and recorder are not copied)."""
+        game = Game.__new__(Game)
+        game.on_event = self.on_event
+        game.recorder = None
+        game.board = self.board.copy()
+        game.agent1 = self.agent1.copy(game.board)
+        game.agent2 = self.agent2.copy(game.board)
+        game.turns = self.turns
+        game._history = []
+        return game
+
+    @staticmethod
+    def _agent_snapshot(agent: Agent) -> tuple:
+        return (len(agent.trail), agent.direction, agent.alive, agent.length, agent.boosts_remaining)
+
+    @staticmethod
+    def _restore_agent(agent: Agent, snapshot: tuple) -> None:
+        trail_len, agent.direction, agent.alive, agent.length, agent.boosts_remaining = snapshot
+        trail = agent.trail
+        while len(trail) > trail_len:
+            trail.pop()
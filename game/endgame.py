@@ -0,0 +1,345 @@
+"""Longest-path solver for the separated endgame.
+
+Once the agents can no longer reach each other the winner is whoever
+survives longer, so each side just wants the longest self-avoiding path
+through its own region. The solver is a depth-first search with two
+admissible upper bounds used for pruning:
+
+* checkerboard parity: every step alternates colour, so a path from a head
+  can use at most one more cell of the opposite colour than of its own;
+* articulation pockets: dead-end pockets hanging off the same cut cell are
+  mutually exclusive, so all but the largest of them are unreachable.
+
+Results are memoized on ``(region mask, head bit)``. Successive turns of one
+endgame are sub-problems of each other, so the cache is kept between calls;
+an ``EndgameMemo`` can also be shared by every solver of a process, since the
+entries do not depend on the game they came from. The search is anytime: a
+wall-hugging walk seeds the best path, and on timeout the best first move
+found so far is returned.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from game.bitboard import BitBoard
+from game.search import DIRECTION_NAMES, SearchTimeout
+from game.voronoi import VoronoiEvaluator
+
+Coord = Tuple[int, int]
+
+
+class EndgameResult(NamedTuple):
+    """``length`` is exact when ``exact`` is set, otherwise an optimistic estimate."""
+
+    action: int
+    direction: str
+    length: int
+    exact: bool
+    depth: int
+    nodes: int
+
+
+class EndgameMemo:
+    """Path results and upper bounds keyed by ``(region, head)`` for one board geometry.
+
+    Emptied once it holds more than ``max_entries`` keys. The dicts are only
+    ever read, written and cleared in place, so solvers in several threads
+    can share one memo.
+    """
+
+    def __init__(self, bits: BitBoard, max_entries: int = 500_000) -> None:
+        self.width = bits.width
+        self.height = bits.height
+        self.max_entries = max_entries
+        self.paths: Dict[Tuple[int, int], Tuple[int, bool]] = {}
+        self.bounds: Dict[Tuple[int, int], int] = {}
+
+    def trim(self) -> None:
+        if len(self.paths) + len(self.bounds) > self.max_entries:
+            self.paths.clear()
+            self.bounds.clear()
+
+
+class EndgameSolver:
+    """Memoized, time-bounded longest path from a head through free cells."""
+
+    WALK_SHARE = 0.3
+
+    def __init__(
+        self,
+        bits: BitBoard,
+        evaluator: Optional[VoronoiEvaluator] = None,
+        max_cache: int = 500_000,
+        memo: Optional[EndgameMemo] = None,
+    ) -> None:
+        self.bits = bits
+        self.evaluator = evaluator or VoronoiEvaluator(bits)
+        self.step = bits.adjacency()
+        if memo is None or (memo.width, memo.height) != (bits.width, bits.height):
+            memo = EndgameMemo(bits, max_cache)
+        self.memo = memo
+        self.cache = memo.paths
+        self.bounds = memo.bounds
+        self.nodes = 0
+        # First move -> path length in the last finished pass (bounds for all but the best).
+        self.root_scores: Dict[int, int] = {}
+        self._deadline = float("inf")
+        self._cancel: Optional[threading.Event] = None
+
+        # Parity only holds if the colouring survives the torus wrap.
+        self._parity = bits.width % 2 == 0 and bits.height % 2 == 0
+        black = 0
+        for index in range(bits.size):
+            x, y = bits.coord(index)
+            if (x + y) % 2 == 0:
+                black |= 1 << index
+        self._black = black
+
+    def solve(
+        self,
+        occupied: int,
+        head: Coord,
+        budget: float,
+        cancel: Optional[threading.Event] = None,
+    ) -> EndgameResult:
+        """Best first move from ``head`` (which must be occupied) within ``budget`` seconds."""
+
+        bits = self.bits
+        self.nodes = 0
+        self.root_scores = {}
+        self._deadline = time.perf_counter() + budget
+        self._cancel = cancel
+        self.memo.trim()
+
+        hb = bits.index(*head)
+        head_bit = 1 << hb
+        free = bits.full & ~occupied
+        region = bits.flood(head_bit, free) & ~head_bit
+
+        first = self._ordered(hb, region)
+        if not first:
+            return EndgameResult(action=0, direction=DIRECTION_NAMES[0], length=0, exact=True, depth=0, nodes=0)
+
+        start = time.perf_counter()
+        walk_move, walked = self._walk(hb, region, start + budget * self.WALK_SHARE)
+        # Out of time already: the region size is a bound that costs nothing.
+        bound = region.bit_count() if self._expired() else self._bound(hb, region)
+        best_move, best, exact, depth = walk_move, walked, walked >= bound, 0
+        self.root_scores = {walk_move: walked}
+        # Deepen until a pass finishes without hitting the horizon (exact) or
+        # time runs out; the last finished pass picks the move.
+        while not exact and depth < region.bit_count():
+            move, value, complete = walk_move, walked, True
+            scores = {}
+            try:
+                for k, n in first:
+                    bit = 1 << n
+                    rest = bits.flood(bit, region & ~bit) & ~bit
+                    child, ok = self._search(n, rest, depth, value)
+                    scores[k] = max(child + 1, walked if k == walk_move else 0)
+                    complete = complete and ok
+                    if child + 1 > value:
+                        move, value = k, child + 1
+            except SearchTimeout:
+                break
+            depth += 1
+            best_move, best, exact = move, value, complete
+            self.root_scores = scores
+
+        return EndgameResult(
+            action=best_move,
+            direction=DIRECTION_NAMES[best_move],
+            length=best,
+            exact=exact,
+            depth=depth,
+            nodes=self.nodes,
+        )
+
+    def walk_scores(self, occupied: int, head: Coord, budget: float, skip: Iterable[int] = ()) -> Dict[int, int]:
+        """Length of a wall-hugging walk after each first move from ``head`` (moves in ``skip`` left out).
+
+        The walks are real paths, so every value is a lower bound; they fill in
+        the first moves ``root_scores`` has no value for. ``budget`` seconds
+        are shared by all walks, which stop short once it runs out.
+        """
+
+        bits = self.bits
+        self._deadline = time.perf_counter() + budget
+        self._cancel = None
+        hb = bits.index(*head)
+        head_bit = 1 << hb
+        region = bits.flood(head_bit, bits.full & ~occupied) & ~head_bit
+        scores = {}
+        for k, n in self._ordered(hb, region):
+            if k in skip:
+                continue
+            bit = 1 << n
+            rest = bits.flood(bit, region & ~bit) & ~bit
+            scores[k] = self._walk(n, rest, self._deadline)[1] + 1
+        return scores
+
+    def upper_bound(self, head: int, region: int) -> int:
+        """Admissible bound on the path length from ``head`` into ``region`` (head excluded)."""
+
+        bits = self.bits
+        head_bit = 1 << head
+        best = 0
+        # The head can only commit to one of the components around it.
+        remaining = region
+        while remaining:
+            seed = bits.neighbors(head_bit) & remaining
+            if not seed:
+                break
+            component = bits.flood(seed & -seed, remaining)
+            remaining &= ~component
+            best = max(best, self._component_bound(head, component))
+        return best
+
+    def _parity_bound(self, head: int, component: int) -> int:
+        size = component.bit_count()
+        if not self._parity:
+            return size
+        same = self._black if self._black >> head & 1 else ~self._black
+        own = (component & same).bit_count()
+        return min(size, 2 * (size - own), 2 * own + 1)
+
+    def _component_bound(self, head: int, component: int) -> int:
+        bound = self._parity_bound(head, component)
+        if bound <= 2:
+            return bound
+        return min(bound, component.bit_count() - self._pocket_waste(head, component))
+
+    def _pocket_waste(self, head: int, component: int) -> int:
+        """Cells in cut-free pockets that lose to a larger pocket on the same cut cell."""
+
+        bits = self.bits
+        head_bit = 1 << head
+        cuts = self.evaluator.articulation_points(head_bit, component)
+        if not cuts:
+            return 0
+        near_head = bits.neighbors(head_bit)
+        pockets: Dict[int, List[int]] = {}
+        rest = component & ~cuts
+        while rest:
+            piece = bits.flood(rest & -rest, rest)
+            rest &= ~piece
+            if piece & near_head:
+                continue
+            gates = bits.neighbors(piece) & cuts
+            if gates and gates & (gates - 1) == 0:
+                pockets.setdefault(gates, []).append(piece.bit_count())
+        return sum(sum(sizes) - max(sizes) for sizes in pockets.values())
+
+    # Search ----------------------------------------------------------------
+
+    def _ordered(self, head: int, region: int) -> List[Tuple[int, int]]:
+        """Moves into ``region`` as ``(direction, cell)``, tightest cell first (wall hugging)."""
+
+        moves = []
+        for k, n in enumerate(self.step[head]):
+            if region >> n & 1:
+                exits = sum(region >> m & 1 for m in self.step[n])
+                moves.append((exits, k, n))
+        moves.sort()
+        return [(k, n) for _, k, n in moves]
+
+    def _walk(self, head: int, region: int, deadline: float) -> Tuple[int, int]:
+        """Greedy wall-hugging path: a quick lower bound and fallback move.
+
+        Each step keeps the room with the largest upper bound and, among
+        equals, takes the cell with the fewest exits so corridors are filled
+        first. Past ``deadline`` only the cheap parity bound is used, and once
+        the solve deadline passes (or the search is cancelled) the walk stops:
+        the path so far is still a valid lower bound.
+        """
+
+        bits = self.bits
+        first_move = -1
+        length = 0
+        while True:
+            moves = self._ordered(head, region)
+            if not moves:
+                return max(first_move, 0), length
+            k, n = moves[0]
+            if first_move >= 0 and self._expired():
+                return first_move, length
+            if len(moves) > 1:
+                rate = self._bound if time.perf_counter() < deadline else self._parity_bound
+                best_room = -1
+                for kk, nn in moves:
+                    if best_room >= 0 and self._expired():
+                        break
+                    bit = 1 << nn
+                    room = rate(nn, bits.flood(bit, region & ~bit) & ~bit)
+                    if room > best_room:
+                        best_room, k, n = room, kk, nn
+            if first_move < 0:
+                first_move = k
+            region &= ~(1 << n)
+            head = n
+            length += 1
+
+    def _expired(self) -> bool:
+        return time.perf_counter() > self._deadline or (self._cancel is not None and self._cancel.is_set())
+
+    def _bound(self, head: int, region: int) -> int:
+        key = (region, head)
+        bound = self.bounds.get(key)
+        if bound is None:
+            bound = self.bounds[key] = self.upper_bound(head, region)
+        return bound
+
+    def _search(self, head: int, region: int, depth: int, need: int) -> Tuple[int, bool]:
+        """Longest path from ``head`` through ``region``, seen ``depth`` moves ahead.
+
+        Paths cut off at the horizon are scored by their upper bound, so the
+        value never underestimates. Results below ``need`` are only bounds
+        (the caller cannot use the move). The flag is True when no path was
+        cut off; such results are exact and go into the cache.
+        """
+
+        if not region:
+            return 0, True
+        self.nodes += 1
+        # Every node floods and bounds its region, so a clock read per node is cheap.
+        if self._expired():
+            raise SearchTimeout
+
+        key = (region, head)
+        hit = self.cache.get(key)
+        if hit is not None:
+            value, exact = hit
+            if exact or value < need:
+                return value, True
+
+        bound = self._bound(head, region)
+        if bound < need:
+            self.cache[key] = (bound, False)
+            return bound, True
+        if depth == 0:
+            return bound, False
+
+        bits = self.bits
+        best = 0
+        ceiling = 0  # best upper bound among moves that failed low
+        complete = True
+        for _, n in self._ordered(head, region):
+            bit = 1 << n
+            rest = bits.flood(bit, region & ~bit) & ~bit
+            target = max(best + 1, need) - 1
+            value, ok = self._search(n, rest, depth - 1, target)
+            value += 1
+            complete = complete and ok
+            if value - 1 >= target:
+                best = value
+            elif value > best:
+                ceiling = max(ceiling, value)
+            if best >= bound:
+                break
+
+        exact = ceiling <= best
+        result = best if exact else ceiling
+        if complete:
+            self.cache[key] = (result, exact)
+        return result, complete
@@ -0,0 +1,250 @@
+"""Territory evaluations cached under the symmetries of the torus.
+
+``VoronoiEvaluator.evaluate`` only depends on the occupied cells and the two
+heads, and translating the board or reflecting it along x or y describes the
+same situation. ``Canonicalizer`` moves our head to the origin and picks the
+smallest of the four reflected occupancy masks, so equivalent situations
+from different turns, seats and matches share one cache entry (evaluated on
+the canonical board, so every member of the class gets the same value).
+The masks are transformed a row at a time with integer shifts and a
+bit-reversal table, which is far cheaper than a chamber evaluation.
+
+``EvalCache`` is a size-bounded LRU of those results with hit/miss counters.
+It can be saved to a compact binary file and preloaded, so a server process
+or tournament worker starts warm.
+"""
+
+import logging
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from game.bitboard import BitBoard
+from game.voronoi import VoronoiEvaluator
+
+logger = logging.getLogger(__name__)
+
+Coord = Tuple[int, int]
+
+MAGIC = b"TRONEVAL"
+VERSION = 1
+HEADER = struct.Struct("<8sHHHI")
+# their head (0xFFFF: none), flags (chambers, separated), mine, theirs, contested, my_space, their_space
+VALUE = struct.Struct("<HBHHHHH")
+NO_HEAD = 0xFFFF
+
+
+class TerritoryScore(NamedTuple):
+    """The symmetry-invariant part of ``voronoi.Territory``."""
+
+    mine: int
+    theirs: int
+    contested: int
+    my_space: int
+    their_space: int
+    separated: bool
+
+
+class Canonicalizer:
+    """Canonical form of ``(occupied, my head, their head)`` under translation and reflection."""
+
+    def __init__(self, bits: BitBoard) -> None:
+        self.bits = bits
+        width = bits.width
+        self.row_mask = (1 << width) - 1
+        # Reverse a row as two table lookups (low and high part).
+        self._low = (width + 1) // 2
+        self._high = width - self._low
+        self._rev_low = [_reverse(v, self._low) for v in range(1 << self._low)]
+        self._rev_high = [_reverse(v, self._high) for v in range(1 << self._high)]
+
+    def key(self, occupied: int, my_head: Coord, their_head: Optional[Coord]) -> Tuple[int, int]:
+        """``(mask, their head index)`` with our head at the origin, minimal over the reflections."""
+
+        bits = self.bits
+        width, height = bits.width, bits.height
+        row_mask = self.row_mask
+        hx, hy = my_head[0] % width, my_head[1] % height
+
+        # Rows in translated order, each rotated so our head's column is 0.
+        rows = []
+        shift = hy * width
+        wrapped = (occupied >> shift) | (occupied << (bits.size - shift))
+        for y in range(height):
+            row = (wrapped >> (y * width)) & row_mask
+            if hx:
+                row = ((row >> hx) | (row << (width - hx))) & row_mask
+            rows.append(row)
+        # x -> -x: reverse the row (x -> width-1-x), then rotate by one.
+        low, low_mask = self._low, (1 << self._low) - 1
+        rev_low, rev_high = self._rev_low, self._rev_high
+        flipped = []
+        for row in rows:
+            rev = (rev_low[row & low_mask] << self._high) | rev_high[row >> low]
+            flipped.append(((rev << 1) | (rev >> (width - 1))) & row_mask)
+
+        if their_head is None:
+            tx = ty = -1
+        else:
+            tx, ty = (their_head[0] - hx) % width, (their_head[1] - hy) % height
+
+        best: Optional[Tuple[int, int]] = None
+        for flip_x in (False, True):
+            source = flipped if flip_x else rows
+            for flip_y in (False, True):
+                mask = 0
+                for y in range(height):
+                    row = source[-y % height if flip_y else y]
+                    if row:
+                        mask |= row << (y * width)
+                if tx < 0:
+                    their = NO_HEAD
+                else:
+                    their = (-ty % height if flip_y else ty) * width + (-tx % width if flip_x else tx)
+                candidate = (mask, their)
+                if best is None or candidate < best:
+                    best = candidate
+        return best  # type: ignore[return-value]
+
+
+def _reverse(value: int, width: int) -> int:
+    out = 0
+    for _ in range(width):
+        out = (out << 1) | (value & 1)
+        value >>= 1
+    return out
+
+
+class EvalCache:
+    """Thread-safe LRU of ``TerritoryScore`` keyed by canonical position.
+
+    One instance is meant to be shared by every ``Tron`` (and search) in a
+    process so work carries over between turns and games.
+    """
+
+    def __init__(self, bits: BitBoard, evaluator: Optional[VoronoiEvaluator] = None, max_entries: int = 100_000) -> None:
+        self.bits = bits
+        self.evaluator = evaluator or VoronoiEvaluator(bits)
+        self.canonical = Canonicalizer(bits)
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[int, int, bool], TerritoryScore]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def score(
+        self,
+        occupied: int,
+        my_head: Coord,
+        their_head: Optional[Coord],
+        chambers: bool = True,
+        evaluator: Optional[VoronoiEvaluator] = None,
+    ) -> TerritoryScore:
+        """Cached ``evaluate(occupied, my_head, their_head, chambers)``.
+
+        ``evaluator`` computes misses; pass the caller's own instance, as
+        evaluators keep scratch state and are not safe to share between threads.
+        """
+
+        mask, their = self.canonical.key(occupied, my_head, their_head)
+        key = (mask, their, chambers)
+        entries = self._entries
+        with self._lock:
+            hit = entries.get(key)
+            if hit is not None:
+                entries.move_to_end(key)
+                self.hits += 1
+                return hit
+            self.misses += 1
+        # Evaluate the canonical board itself: chamber scores depend on the
+        # order cut cells are visited, so this keeps every member of a
+        # symmetry class (and hits and misses alike) on the same value.
+        canonical_head = self.bits.coord(their) if their != NO_HEAD else None
+        territory = (evaluator or self.evaluator).evaluate(mask, (0, 0), canonical_head, chambers=chambers)
+        score = TerritoryScore(
+            territory.mine,
+            territory.theirs,
+            territory.contested,
+            territory.my_space,
+            territory.their_space,
+            territory.separated,
+        )
+        with self._lock:
+            entries[key] = score
+            if len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return score
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def save(self, path: str) -> int:
+        """Write the entries (least recently used first) to ``path``; returns the count."""
+
+        bits = self.bits
+        mask_bytes = (bits.size + 7) // 8
+        with self._lock:
+            items = list(self._entries.items())
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as handle:
+            handle.write(HEADER.pack(MAGIC, VERSION, bits.width, bits.height, len(items)))
+            for (mask, their, chambers), s in items:
+                flags = int(chambers) | int(s.separated) << 1
+                handle.write(mask.to_bytes(mask_bytes, "little"))
+                handle.write(VALUE.pack(their, flags, s.mine, s.theirs, s.contested, s.my_space, s.their_space))
+        os.replace(tmp, path)
+        return len(items)
+
+    def preload(self, path: str) -> int:
+        """Merge the entries saved at ``path``; a missing or foreign file loads nothing."""
+
+        bits = self.bits
+        if not path or not os.path.isfile(path):
+            return 0
+        mask_bytes = (bits.size + 7) // 8
+        record = mask_bytes + VALUE.size
+        with open(path, "rb") as handle:
+            data = handle.read()
+        if len(data) < HEADER.size:
+            return 0
+        magic, version, width, height, count = HEADER.unpack_from(data, 0)
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or (width, height) != (bits.width, bits.height)
+            or len(data) != HEADER.size + count * record
+        ):
+            logger.warning("eval cache: %r is not a version %d cache for %dx%d, ignoring it", path, VERSION, bits.width, bits.height)
+            return 0
+        loaded = 0
+        offset = HEADER.size
+        with self._lock:
+            for _ in range(count):
+                mask = int.from_bytes(data[offset:offset + mask_bytes], "little")
+                their, flags, mine, theirs, contested, my_space, their_space = VALUE.unpack_from(data, offset + mask_bytes)
+                offset += record
+                key = (mask, their, bool(flags & 1))
+                self._entries[key] = TerritoryScore(mine, theirs, contested, my_space, their_space, bool(flags & 2))
+                self._entries.move_to_end(key)
+                loaded += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        logger.info("eval cache: preloaded %d entries from %s", loaded, path)
+        return loaded
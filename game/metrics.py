@@ -0,0 +1,301 @@
+"""Decision-level instrumentation for the agent service.
+
+``Tron.decide`` leaves a ``Decision`` behind for every move: where the move
+came from, per-phase timings, search depth and nodes, evaluator calls and
+the score of each of the four directions. ``Metrics`` folds those and the
+HTTP request latencies into fixed-bucket histograms, keeps the most recent
+decisions in a bounded ring buffer and, when enabled, appends every
+decision to a JSONL trace file. ``SamplingProfiler`` periodically samples
+the stacks of all threads so a live server can be profiled without a
+restart; its output is in the folded format read by ``flamegraph.pl`` and
+speedscope.
+
+Everything is in-process: with several gunicorn workers each worker reports
+its own numbers.
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Latency buckets in milliseconds, sized around the per-move search budget.
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 150, 200, 300, 500, 1000)
+DEPTH_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 12, 16, 24, 32)
+COUNT_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+Scores = Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]
+
+
+class Decision(NamedTuple):
+    """One move choice; ``scores`` are indexed UP, DOWN, LEFT, RIGHT (``None`` if not scored).
+
+    Scores are on the scale of the engine named by ``source``: territory
+    difference for search and greedy, path length for the endgame, action
+    probability for the policy. Alpha-beta scores of moves other than the
+    chosen one are upper bounds.
+    """
+
+    source: str
+    move: str
+    boost: bool
+    turn: int
+    depth: int
+    nodes: int
+    flood_fills: int
+    scores: Scores
+    phases: Dict[str, float]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a running sum, as exposed by Prometheus."""
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        index = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile (``max`` for the overflow bucket)."""
+
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "max": round(self.max, 3),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.bounds] + ["+Inf"], self.counts)),
+        }
+
+
+class Metrics:
+    """Thread-safe store of request and decision statistics for one server process."""
+
+    def __init__(self, buffer_size: int = 512, trace_path: Optional[str] = None) -> None:
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.latency: Dict[str, Histogram] = {}
+        self.depth = Histogram(DEPTH_BUCKETS)
+        self.nodes = Histogram(COUNT_BUCKETS)
+        self.flood_fills = Histogram(COUNT_BUCKETS)
+        self.sources: Counter = Counter()
+        self.recent: Deque[Dict[str, object]] = deque(maxlen=max(1, buffer_size))
+        self.trace_path: Optional[str] = None
+        self._trace = None
+        if trace_path:
+            self.set_trace(trace_path)
+
+    def observe(self, name: str, ms: float) -> None:
+        """Add a latency sample (milliseconds) to the histogram ``name``."""
+
+        with self._lock:
+            self._histogram(name).observe(ms)
+
+    def record(self, match_id: str, decision: Optional[Decision], request_ms: float) -> None:
+        """Account for one answered ``/send-move``."""
+
+        with self._lock:
+            self._histogram("send_move").observe(request_ms)
+            if decision is None:
+                self.sources["unknown"] += 1
+                return
+            for phase, ms in decision.phases.items():
+                self._histogram(phase).observe(ms)
+            self.sources[decision.source] += 1
+            if decision.depth:
+                self.depth.observe(decision.depth)
+            self.nodes.observe(decision.nodes)
+            self.flood_fills.observe(decision.flood_fills)
+            entry = decision._asdict()
+            entry["match_id"] = match_id
+            entry["time"] = round(time.time(), 3)
+            entry["request_ms"] = round(request_ms, 3)
+            entry["phases"] = {k: round(v, 3) for k, v in decision.phases.items()}
+            self.recent.append(entry)
+            if self._trace is not None:
+                self._trace.write(json.dumps(entry) + "\n")
+                self._trace.flush()
+
+    def set_trace(self, path: Optional[str]) -> None:
+        """Start appending decisions to ``path`` as JSONL, or stop with ``None``."""
+
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+            self.trace_path = path or None
+            if path:
+                self._trace = open(path, "a", encoding="utf-8")
+
+    def decisions(self, limit: Optional[int] = None) -> List[Dict[str, object]]:
+        """Most recent decisions, oldest first."""
+
+        with self._lock:
+            recent = list(self.recent)
+        return recent[-limit:] if limit else recent
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "latency_ms": {name: h.snapshot() for name, h in sorted(self.latency.items())},
+                "search_depth": self.depth.snapshot(),
+                "search_nodes": self.nodes.snapshot(),
+                "flood_fills": self.flood_fills.snapshot(),
+                "decisions_by_source": dict(self.sources),
+                "trace_path": self.trace_path,
+            }
+
+    def prometheus(self, prefix: str = "tron") -> str:
+        """The counters in the Prometheus text exposition format."""
+
+        lines: List[str] = []
+        with self._lock:
+            name = f"{prefix}_latency_ms"
+            lines.append(f"# TYPE {name} histogram")
+            for phase, histogram in sorted(self.latency.items()):
+                _histogram_lines(lines, name, histogram, f'phase="{phase}"')
+            for metric, histogram in (
+                ("search_depth", self.depth),
+                ("search_nodes", self.nodes),
+                ("flood_fills", self.flood_fills),
+            ):
+                name = f"{prefix}_{metric}"
+                lines.append(f"# TYPE {name} histogram")
+                _histogram_lines(lines, name, histogram, "")
+            name = f"{prefix}_decisions_total"
+            lines.append(f"# TYPE {name} counter")
+            for source, count in sorted(self.sources.items()):
+                lines.append(f'{name}{{source="{source}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def _histogram(self, name: str) -> Histogram:
+        histogram = self.latency.get(name)
+        if histogram is None:
+            histogram = self.latency[name] = Histogram(LATENCY_BUCKETS_MS)
+        return histogram
+
+
+def _histogram_lines(lines: List[str], name: str, histogram: Histogram, labels: str) -> None:
+    sep = "," if labels else ""
+    cumulative = 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.total:.3f}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+
+
+class SamplingProfiler:
+    """Background thread that samples every other thread's stack at a fixed interval.
+
+    Stacks are aggregated as ``frame;frame;frame count`` lines (root first),
+    so starting, stopping and reading can all happen on a live server.
+    """
+
+    def __init__(self) -> None:
+        self.interval = 0.005
+        self.samples: Counter = Counter()
+        self.started: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()  # start/stop
+        self._samples_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 5.0, reset: bool = True) -> None:
+        with self._lock:
+            if self.running:
+                self._stop.set()
+                self._thread.join()  # type: ignore[union-attr]
+            if reset:
+                with self._samples_lock:
+                    self.samples = Counter()
+            self.interval = max(interval_ms, 0.5) / 1000.0
+            self.started = time.time()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                self._stop.set()
+                self._thread.join()
+                self._thread = None
+
+    def folded(self, limit: int = 0) -> str:
+        """Aggregated stacks, most frequent first."""
+
+        return folded_stacks(self.counts(), limit)
+
+    def counts(self) -> Counter:
+        """A copy of the stack counts, e.g. to merge samples from several processes."""
+
+        with self._samples_lock:
+            return Counter(self.samples)
+
+    def status(self) -> Dict[str, object]:
+        samples = self.counts()
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000.0,
+            "started": self.started,
+            "samples": sum(samples.values()),
+            "stacks": len(samples),
+        }
+
+    def _run(self, stop: threading.Event) -> None:
+        me = threading.get_ident()
+        while not stop.wait(self.interval):
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(stack)))
+            with self._samples_lock:
+                self.samples.update(stacks)
+
+
+def folded_stacks(samples: Counter, limit: int = 0) -> str:
+    """``stack count`` lines, most frequent first (the input of ``flamegraph.pl``)."""
+
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common(limit or None))
@@ -0,0 +1,236 @@
+"""Precomputed opening moves in a memory-mapped hash table.
+
+Every match starts from the same two positions, so the first turns can be
+searched offline far deeper than the live budget allows
+(``build_opening_book.py``) and answered with a single table probe.
+
+Positions are keyed from the mover's point of view: the board is translated
+so our head sits at the origin and then reflected along x and/or y, which
+are exact symmetries of the torus. The smallest Zobrist key of the four
+reflections is the canonical key, and the stored action is mapped back
+through the same reflection on lookup.
+
+File layout (little endian): a 32-byte header ``magic, version, width,
+height, turns, slots, count, seed`` followed by ``slots`` fixed-size
+records ``key, action, depth, score`` addressed by linear probing from
+``key & (slots - 1)``. Key 0 marks an empty slot.
+"""
+
+import logging
+import mmap
+import os
+import random
+import struct
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from game.bitboard import BitBoard
+from game.search import DIRECTION_NAMES, ZobristKeys
+
+logger = logging.getLogger(__name__)
+
+Coord = Tuple[int, int]
+
+MAGIC = b"TRONBOOK"
+VERSION = 1
+HEADER = struct.Struct("<8sHHHHIIQ")
+RECORD = struct.Struct("<QBBxxf")
+BOOK_SEED = 0x0B00C
+
+# Direction index under each reflection (identity, flip x, flip y, both).
+_REFLECT_DIRECTION = (
+    (0, 1, 2, 3, 4),
+    (0, 1, 3, 2, 4),
+    (1, 0, 2, 3, 4),
+    (1, 0, 3, 2, 4),
+)
+
+
+class BookMove(NamedTuple):
+    action: int
+    direction: str
+    boost: bool
+    score: float
+    depth: int
+
+
+class BookKeys:
+    """Canonical position keys, shared by the builder and the reader."""
+
+    def __init__(self, bits: BitBoard, seed: int = BOOK_SEED) -> None:
+        self.bits = bits
+        self.seed = seed
+        self.zobrist = ZobristKeys(bits.size, seed=seed)
+        self.first = random.Random(seed + 1).getrandbits(64)
+
+    def canonical(
+        self,
+        occupied: int,
+        my_head: Coord,
+        their_head: Coord,
+        my_dir: Optional[int],
+        their_dir: Optional[int],
+        my_boosts: int,
+        their_boosts: int,
+        me_first: bool,
+    ) -> Tuple[int, int]:
+        """``(key, reflection)`` of the position; ``reflection`` maps canonical moves back."""
+
+        width, height = self.bits.width, self.bits.height
+        hx, hy = my_head
+        cells: List[Coord] = []
+        mask = occupied
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            cells.append(((index % width - hx) % width, (index // width - hy) % height))
+            mask ^= low
+        ox, oy = (their_head[0] - hx) % width, (their_head[1] - hy) % height
+        md = 4 if my_dir is None else my_dir
+        td = 4 if their_dir is None else their_dir
+
+        cell_keys = self.zobrist.cell
+        best_key, best_reflection = -1, 0
+        for reflection, directions in enumerate(_REFLECT_DIRECTION):
+            fx, fy = reflection & 1, reflection & 2
+            cells_key = 0
+            for x, y in cells:
+                cells_key ^= cell_keys[(-y % height if fy else y) * width + (-x % width if fx else x)]
+            their = (-oy % height if fy else oy) * width + (-ox % width if fx else ox)
+            key = self.zobrist.position(
+                cells_key, 0, their, directions[md], directions[td], my_boosts, their_boosts
+            )
+            if me_first:
+                key ^= self.first
+            key = key or 1  # 0 marks empty slots
+            if best_key < 0 or key < best_key:
+                best_key, best_reflection = key, reflection
+        return best_key, best_reflection
+
+    @staticmethod
+    def reflect_action(action: int, reflection: int) -> int:
+        """Map an action between the real and the canonical frame (reflections are involutions)."""
+
+        return (action & 4) | _REFLECT_DIRECTION[reflection][action & 3]
+
+
+class OpeningBook:
+    """Read-only view of a book file; lookups read straight from the mapping."""
+
+    def __init__(
+        self,
+        path: str,
+        buffer: mmap.mmap,
+        width: int,
+        height: int,
+        turns: int,
+        slots: int,
+        count: int,
+        seed: int,
+    ) -> None:
+        self.path = path
+        self.width = width
+        self.height = height
+        self.turns = turns
+        self.count = count
+        self.hits = 0
+        self.misses = 0
+        self._buffer = buffer
+        self._mask = slots - 1
+        self._keys = BookKeys(BitBoard(width, height), seed)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["OpeningBook"]:
+        """Map ``path`` or return ``None`` if it is missing or not a book file."""
+
+        if not path or not os.path.isfile(path) or os.path.getsize(path) < HEADER.size:
+            logger.info("opening book: no book at %r, searching every move", path)
+            return None
+        with open(path, "rb") as handle:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, width, height, turns, slots, count, seed = HEADER.unpack_from(buffer, 0)
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or slots & (slots - 1)
+            or len(buffer) != HEADER.size + slots * RECORD.size
+        ):
+            logger.warning("opening book: %r is not a version %d book, ignoring it", path, VERSION)
+            buffer.close()
+            return None
+        logger.info("opening book: mapped %s (%d positions, first %d turns)", path, count, turns)
+        return cls(path, buffer, width, height, turns, slots, count, seed)
+
+    def get(self, key: int) -> Optional[Tuple[int, int, float]]:
+        """Raw ``(action, depth, score)`` stored under a canonical key."""
+
+        buffer = self._buffer
+        slot = key & self._mask
+        while True:
+            stored, action, depth, score = RECORD.unpack_from(buffer, HEADER.size + slot * RECORD.size)
+            if stored == key:
+                return action, depth, score
+            if stored == 0:
+                return None
+            slot = (slot + 1) & self._mask
+
+    def probe(
+        self,
+        occupied: int,
+        my_head: Coord,
+        their_head: Coord,
+        my_dir: Optional[int],
+        their_dir: Optional[int],
+        my_boosts: int,
+        their_boosts: int,
+        me_first: bool,
+    ) -> Optional[BookMove]:
+        """The book move for this position in real board coordinates, if any."""
+
+        key, reflection = self._keys.canonical(
+            occupied, my_head, their_head, my_dir, their_dir, my_boosts, their_boosts, me_first
+        )
+        hit = self.get(key)
+        if hit is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        canonical_action, depth, score = hit
+        action = BookKeys.reflect_action(canonical_action, reflection)
+        return BookMove(action, DIRECTION_NAMES[action & 3], action >= 4, score, depth)
+
+    def close(self) -> None:
+        self._buffer.close()
+
+
+def write_book(
+    path: str,
+    width: int,
+    height: int,
+    turns: int,
+    entries: Dict[int, Tuple[int, int, float]],
+    seed: int = BOOK_SEED,
+) -> int:
+    """Write ``{canonical key: (action, depth, score)}`` as a book file; returns its size in bytes.
+
+    The table is sized to a power of two at most half full so probes stay short.
+    """
+
+    slots = 1
+    while slots < 2 * max(len(entries), 1):
+        slots <<= 1
+    table = bytearray(HEADER.size + slots * RECORD.size)
+    HEADER.pack_into(table, 0, MAGIC, VERSION, width, height, turns, slots, len(entries), seed)
+    mask = slots - 1
+    used = [False] * slots
+    for key in sorted(entries):
+        action, depth, score = entries[key]
+        slot = key & mask
+        while used[slot]:
+            slot = (slot + 1) & mask
+        used[slot] = True
+        RECORD.pack_into(table, HEADER.size + slot * RECORD.size, key, action, min(depth, 255), score)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(table)
+    os.replace(tmp, path)
+    return len(table)
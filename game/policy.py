@@ -0,0 +1,144 @@
+"""Inference runtime for the exported policy network.
+
+``finalize_model.py`` writes the network as ONNX (optionally int8) and as
+TorchScript. ``PolicyRuntime.load`` picks a backend from the file extension,
+runs a few warm-up inferences so the first real request does not pay for
+graph initialisation, and then answers ``predict`` with plain NumPy arrays.
+Both backends are optional: without onnxruntime/torch or without a model
+file, ``load`` returns ``None`` and the agent keeps using search alone.
+"""
+
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OBS_SHAPE = (10, 18, 20)
+
+Predictor = Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+def encode_board(
+    board: Sequence[Sequence[int]],
+    me: int,
+    my_head: Optional[Tuple[int, int]],
+    their_head: Optional[Tuple[int, int]],
+    my_boosts: int,
+    turn: int,
+) -> np.ndarray:
+    """Observation planes matching ``training.utils.state_to_tensor`` from an owner grid.
+
+    ``board`` holds the trail owner (1/2) of every cell as in ``Tron.board``;
+    walls are not part of the training observation and are ignored.
+    """
+
+    grid = np.asarray(board)
+    obs = np.zeros((1,) + OBS_SHAPE, dtype=np.float32)
+    them = 2 if me == 1 else 1
+    obs[0, 0] = grid == me
+    obs[0, 1] = grid == them
+    if my_head is not None:
+        obs[0, 2, my_head[1], my_head[0]] = 1.0
+    if their_head is not None:
+        obs[0, 3, their_head[1], their_head[0]] = 1.0
+    obs[0, 8] = my_boosts / 3.0
+    obs[0, 9] = min(turn / 200.0, 1.0)
+    return obs
+
+
+class PolicyRuntime:
+    """A loaded policy network: ``predict(obs) -> (logits, values)`` on ``(N, 10, 18, 20)`` float32."""
+
+    def __init__(self, predict: Predictor, backend: str, path: str) -> None:
+        self._predict = predict
+        self.backend = backend
+        self.path = path
+        self.warmup_ms: List[float] = []
+
+    @classmethod
+    def load(cls, path: str, warmup: int = 10, threads: int = 1) -> Optional["PolicyRuntime"]:
+        """Load ``path`` (``.onnx`` or TorchScript ``.ts``/``.pt``) or return ``None`` if unavailable."""
+
+        if not path or not os.path.isfile(path) or os.path.getsize(path) == 0:
+            logger.info("policy: no model at %r, using search only", path)
+            return None
+        try:
+            if path.endswith(".onnx"):
+                runtime = cls(_onnx_predictor(path, threads), "onnxruntime", path)
+            else:
+                runtime = cls(_torchscript_predictor(path, threads), "torchscript", path)
+        except ImportError as exc:
+            logger.warning("policy: backend for %r not installed (%s), using search only", path, exc)
+            return None
+        except Exception:  # noqa: BLE001 - a broken model must not take the agent down
+            logger.exception("policy: failed to load %r, using search only", path)
+            return None
+        runtime.warm_up(warmup)
+        logger.info(
+            "policy: loaded %s via %s, warm-up last %.2f ms",
+            path,
+            runtime.backend,
+            runtime.warmup_ms[-1] if runtime.warmup_ms else 0.0,
+        )
+        return runtime
+
+    def warm_up(self, count: int) -> None:
+        """Run ``count`` inferences on zeros (batch sizes 1 and 2) and record their latency."""
+
+        for i in range(count):
+            obs = np.zeros((1 + i % 2,) + OBS_SHAPE, dtype=np.float32)
+            t0 = time.perf_counter()
+            self._predict(obs)
+            self.warmup_ms.append((time.perf_counter() - t0) * 1000.0)
+
+    def predict(self, obs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        logits, values = self._predict(np.ascontiguousarray(obs, dtype=np.float32))
+        return logits, values.reshape(-1)
+
+    def action_probs(self, obs: np.ndarray) -> np.ndarray:
+        """Softmax over the 8 actions for a single observation."""
+
+        logits, _ = self.predict(obs)
+        row = logits[0] - logits[0].max()
+        probs = np.exp(row)
+        return probs / probs.sum()
+
+    def describe(self) -> Dict[str, object]:
+        return {"backend": self.backend, "path": self.path, "warmup_ms": self.warmup_ms}
+
+
+def _onnx_predictor(path: str, threads: int) -> Predictor:
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    name = session.get_inputs()[0].name
+
+    def predict(obs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        logits, values = session.run(None, {name: obs})
+        return logits, values
+
+    return predict
+
+
+def _torchscript_predictor(path: str, threads: int) -> Predictor:
+    import torch
+
+    torch.set_num_threads(threads)
+    module = torch.jit.load(path, map_location="cpu")
+    module.eval()
+
+    def predict(obs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        x = torch.from_numpy(obs).contiguous(memory_format=torch.channels_last)
+        with torch.inference_mode():
+            logits, values = module(x)
+        return logits.numpy(), values.numpy()
+
+    return predict
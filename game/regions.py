@@ -0,0 +1,158 @@
+"""Incremental connected-region labels for the free cells of the torus.
+
+``RegionTracker`` keeps every free cell labelled with the id of its connected
+region and the size of each region. Occupying a cell only re-floods when the
+cell could be a cut (two or more same-region neighbours that are not joined
+inside its 3x3 window), and then relabels only the smaller pieces. Queries
+such as "are the heads separated?" and "how much room does each side have?"
+are O(1) lookups over the four cells around a head.
+"""
+
+from typing import Dict, Iterator, List, Set
+
+from game.bitboard import BitBoard
+
+
+def _indices(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class RegionTracker:
+    """Connected components of the free cells, maintained under occupy/release."""
+
+    def __init__(self, bits: BitBoard, occupied: int = 0) -> None:
+        self.bits = bits
+        self._adjacency = bits.adjacency()
+        self._box = [self._window(index) for index in range(bits.size)]
+        self.label: List[int] = [-1] * bits.size
+        self.masks: Dict[int, int] = {}
+        self.sizes: Dict[int, int] = {}
+        self.occupied = 0
+        self._next_id = 0
+        self.reset(occupied)
+
+    def _window(self, index: int) -> int:
+        bit = 1 << index
+        column = bit | self.bits.shift_up(bit) | self.bits.shift_down(bit)
+        return column | self.bits.shift_left(column) | self.bits.shift_right(column)
+
+    def reset(self, occupied: int = 0) -> None:
+        """Label every region of ``~occupied`` from scratch."""
+
+        bits = self.bits
+        self.label = [-1] * bits.size
+        self.masks = {}
+        self.sizes = {}
+        self.occupied = occupied & bits.full
+        self._next_id = 0
+        free = bits.full & ~occupied
+        while free:
+            region = bits.flood(free & -free, free)
+            self._new_region(region)
+            free &= ~region
+
+    def sync(self, occupied: int) -> None:
+        """Bring the labels in line with ``occupied`` by releasing and occupying the difference."""
+
+        occupied &= self.bits.full
+        for index in _indices(self.occupied & ~occupied):
+            self.release(index)
+        for index in _indices(occupied & ~self.occupied):
+            self.occupy(index)
+
+    def occupy(self, index: int) -> None:
+        """Mark ``index`` occupied, splitting its region if it was a cut cell."""
+
+        rid = self.label[index]
+        if rid < 0:
+            return
+        bit = 1 << index
+        self.label[index] = -1
+        self.occupied |= bit
+        mask = self.masks[rid] & ~bit
+        if not mask:
+            del self.masks[rid]
+            del self.sizes[rid]
+            return
+        self.masks[rid] = mask
+        self.sizes[rid] -= 1
+
+        neighbours = [n for n in set(self._adjacency[index]) if self.label[n] == rid]
+        if len(neighbours) <= 1:
+            return
+        # Neighbours still joined around the removed cell cannot have been split.
+        window = self._box[index] & mask
+        local = self.bits.flood(1 << neighbours[0], window)
+        if all(local >> n & 1 for n in neighbours):
+            return
+
+        pieces = []
+        seen = 0
+        for n in neighbours:
+            if seen >> n & 1:
+                continue
+            piece = self.bits.flood(1 << n, mask)
+            if piece == mask:
+                return
+            pieces.append(piece)
+            seen |= piece
+        # The largest piece keeps the id; the rest are relabelled.
+        pieces.sort(key=int.bit_count, reverse=True)
+        self.masks[rid] = pieces[0]
+        self.sizes[rid] = pieces[0].bit_count()
+        for piece in pieces[1:]:
+            self._new_region(piece)
+
+    def release(self, index: int) -> None:
+        """Mark ``index`` free again, merging the regions it reconnects."""
+
+        if self.label[index] >= 0:
+            return
+        bit = 1 << index
+        self.occupied &= ~bit
+        around = {self.label[n] for n in self._adjacency[index] if self.label[n] >= 0}
+        if not around:
+            self._new_region(bit)
+            return
+        rid = max(around, key=self.sizes.__getitem__)
+        mask = self.masks[rid] | bit
+        for other in around - {rid}:
+            piece = self.masks.pop(other)
+            del self.sizes[other]
+            for cell in _indices(piece):
+                self.label[cell] = rid
+            mask |= piece
+        self.label[index] = rid
+        self.masks[rid] = mask
+        self.sizes[rid] = mask.bit_count()
+
+    def _new_region(self, mask: int) -> int:
+        rid = self._next_id
+        self._next_id += 1
+        self.masks[rid] = mask
+        self.sizes[rid] = mask.bit_count()
+        for cell in _indices(mask):
+            self.label[cell] = rid
+        return rid
+
+    def regions_near(self, index: int) -> Set[int]:
+        """Ids of the regions a piece on ``index`` can enter (its own if it is free)."""
+
+        if self.label[index] >= 0:
+            return {self.label[index]}
+        return {self.label[n] for n in self._adjacency[index] if self.label[n] >= 0}
+
+    def reachable(self, index: int) -> int:
+        """Cells reachable from ``index``, counting the cell itself (matches ``BitBoard.flood_count``)."""
+
+        if self.label[index] >= 0:
+            return self.sizes[self.label[index]]
+        return 1 + sum(self.sizes[rid] for rid in self.regions_near(index))
+
+    def separated(self, a: int, b: int) -> bool:
+        """True when no free region is reachable from both ``a`` and ``b``."""
+
+        return not (self.regions_near(a) & self.regions_near(b))
@@ -0,0 +1,402 @@
+"""Compact, append-only match replays with an indexed streaming reader.
+
+A game is fully determined by its start configuration and the
+``(direction, boost)`` pair each seat sent every turn, so that is all a
+replay stores: a fixed 21-byte header followed by 6 bits per turn (two
+2-bit directions and two boost flags). A 200-turn game takes 171 bytes.
+
+``ReplayRecorder`` hooks into ``Game`` (``Game(recorder=...)``): the engine
+reports its start position, every applied step and the result, and the
+recorder appends finished games to a ``ReplayWriter``. A writer owns its
+own shards in the replay directory (named after a per-process prefix), so
+any number of processes can record into one directory without locking:
+
+* ``<prefix>-NNNNN.replay``: the records, back to back;
+* ``<prefix>-NNNNN.index``: one fixed-size ``INDEX_DTYPE`` row per game
+  (offset, size, steps, agent ids, result, reason, tag);
+* ``<prefix>-NNNNN.agents``: agent names, one per line, ids local to the shard.
+
+``ReplayStore`` loads every index into one NumPy table, selects games by
+outcome, length and agent pair with array masks, and reads records through
+memory maps. ``simulate`` re-runs a record through the engine, so any game
+can be replayed or stopped at turn N.
+"""
+
+import glob
+import mmap
+import os
+import socket
+import struct
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from game.case_closed_game import Agent, Direction, Game, GameBoard, GameResult
+
+MAGIC = 0x5254  # "TR"
+# magic, size, width, height, a1 x/y/dir, a2 x/y/dir, boosts, result, reason, steps, tag
+RECORD_HEADER = struct.Struct("<HHBBBBBBBBBBBHI")
+INDEX_DTYPE = np.dtype(
+    [
+        ("offset", "<u8"),
+        ("size", "<u2"),
+        ("steps", "<u2"),
+        ("agent1", "<u2"),
+        ("agent2", "<u2"),
+        ("result", "u1"),
+        ("reason", "u1"),
+        ("tag", "<u4"),
+    ]
+)
+STORE_DTYPE = np.dtype(INDEX_DTYPE.descr + [("shard", "<u2")])
+
+DIRECTIONS = (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT)
+_DIRECTION_CODE = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+# Result codes; 0 marks a game that was abandoned (e.g. a truncated training episode).
+UNFINISHED = 0
+RESULT_CODES = {GameResult.AGENT1_WIN: 1, GameResult.AGENT2_WIN: 2, GameResult.DRAW: 3}
+RESULTS = {code: result for result, code in RESULT_CODES.items()}
+REASONS = ("", "crash", "max_turns")
+
+Move = Tuple[int, int, bool, bool]  # direction codes and boost flags of both seats
+
+
+class StartConfig(NamedTuple):
+    width: int
+    height: int
+    agent1: Tuple[int, int, int]  # x, y, direction code
+    agent2: Tuple[int, int, int]
+    boosts: int
+
+
+class Replay(NamedTuple):
+    start: StartConfig
+    moves: List[Move]
+    result: Optional[GameResult]
+    reason: str
+    agents: Tuple[str, str]
+    tag: int
+
+
+def encode_moves(moves: Sequence[Move]) -> bytes:
+    """Pack moves at 6 bits per turn, least significant bits first."""
+
+    packed = 0
+    for turn, (d1, d2, b1, b2) in enumerate(moves):
+        packed |= (d1 | d2 << 2 | b1 << 4 | b2 << 5) << (6 * turn)
+    return packed.to_bytes((6 * len(moves) + 7) // 8, "little")
+
+
+def decode_moves(data: bytes, steps: int) -> List[Move]:
+    packed = int.from_bytes(data, "little")
+    moves = []
+    for _ in range(steps):
+        code = packed & 63
+        packed >>= 6
+        moves.append((code & 3, code >> 2 & 3, bool(code & 16), bool(code & 32)))
+    return moves
+
+
+def start_config(game: Game) -> StartConfig:
+    agents = []
+    for agent in (game.agent1, game.agent2):
+        x, y = agent.trail[0]
+        agents.append((x, y, _DIRECTION_CODE[agent.direction]))
+    return StartConfig(game.board.width, game.board.height, agents[0], agents[1], game.agent1.boosts_remaining)
+
+
+def new_game(start: StartConfig) -> Game:
+    """A fresh ``Game`` in the recorded start configuration."""
+
+    game = Game()
+    if start == start_config(game):
+        return game
+    game.board = GameBoard(height=start.height, width=start.width)
+    for agent_id, (x, y, direction) in ((1, start.agent1), (2, start.agent2)):
+        agent = Agent(agent_id=agent_id, start_pos=(x, y), start_dir=DIRECTIONS[direction], board=game.board)
+        agent.boosts_remaining = start.boosts
+        setattr(game, f"agent{agent_id}", agent)
+    return game
+
+
+def simulate(replay: Replay, turns: Optional[int] = None) -> Game:
+    """Re-run ``replay`` through the engine, stopping after ``turns`` steps if given."""
+
+    game = new_game(replay.start)
+    for d1, d2, b1, b2 in replay.moves[:turns]:
+        game.step(DIRECTIONS[d1], DIRECTIONS[d2], boost1=b1, boost2=b2)
+    return game
+
+
+def positions(replay: Replay) -> Iterator[Tuple[int, Game]]:
+    """Yield ``(steps played, game)`` from the start position on; the same ``Game`` is advanced in place."""
+
+    game = new_game(replay.start)
+    yield 0, game
+    for turn, (d1, d2, b1, b2) in enumerate(replay.moves, 1):
+        game.step(DIRECTIONS[d1], DIRECTIONS[d2], boost1=b1, boost2=b2)
+        yield turn, game
+
+
+class ReplayWriter:
+    """Appends records to this process's shards in ``directory``, rolling over at ``shard_bytes``."""
+
+    def __init__(self, directory: str, prefix: Optional[str] = None, shard_bytes: int = 64 << 20) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix or f"{socket.gethostname()}-{os.getpid()}"
+        self.shard_bytes = shard_bytes
+        self.games = 0
+        existing = glob.glob(os.path.join(directory, f"{glob.escape(self.prefix)}-*.index"))
+        self._shard = len(existing) - 1
+        self._data = self._index = self._agents = None
+        self._agent_ids: Dict[str, int] = {}
+        self._offset = 0
+        self._open_next()
+
+    def _open_next(self) -> None:
+        self._close_files()
+        self._shard += 1
+        base = os.path.join(self.directory, f"{self.prefix}-{self._shard:05d}")
+        self._data = open(base + ".replay", "ab")
+        self._index = open(base + ".index", "ab")
+        self._agents = open(base + ".agents", "a", encoding="utf-8")
+        self._agent_ids = {}
+        self._offset = self._data.tell()
+
+    def _agent_id(self, name: str) -> int:
+        agent_id = self._agent_ids.get(name)
+        if agent_id is None:
+            agent_id = self._agent_ids[name] = len(self._agent_ids)
+            self._agents.write(name.replace("\n", " ") + "\n")  # type: ignore[union-attr]
+        return agent_id
+
+    def append(
+        self,
+        start: StartConfig,
+        moves: Sequence[Move],
+        result: Optional[GameResult],
+        reason: str = "",
+        agents: Tuple[str, str] = ("agent1", "agent2"),
+        tag: int = 0,
+    ) -> None:
+        if self._offset >= self.shard_bytes:
+            self._open_next()
+        body = encode_moves(moves)
+        size = RECORD_HEADER.size + len(body)
+        result_code = RESULT_CODES.get(result, UNFINISHED)  # type: ignore[arg-type]
+        reason_code = REASONS.index(reason) if reason in REASONS else 0
+        header = RECORD_HEADER.pack(
+            MAGIC, size, start.width, start.height, *start.agent1, *start.agent2,
+            min(start.boosts, 255), result_code, reason_code, len(moves), tag & 0xFFFFFFFF,
+        )
+        row = np.zeros(1, dtype=INDEX_DTYPE)
+        row[0] = (
+            self._offset, size, len(moves), self._agent_id(agents[0]), self._agent_id(agents[1]),
+            result_code, reason_code, tag & 0xFFFFFFFF,
+        )
+        self._data.write(header + body)  # type: ignore[union-attr]
+        self._index.write(row.tobytes())  # type: ignore[union-attr]
+        self._offset += size
+        self.games += 1
+
+    def flush(self) -> None:
+        # Data before index and names, so an index row never points past the data.
+        for handle in (self._data, self._agents, self._index):
+            if handle is not None:
+                handle.flush()
+
+    def _close_files(self) -> None:
+        self.flush()
+        for handle in (self._data, self._agents, self._index):
+            if handle is not None:
+                handle.close()
+        self._data = self._index = self._agents = None
+
+    def close(self) -> None:
+        self._close_files()
+
+    def __enter__(self) -> "ReplayWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ReplayRecorder:
+    """Engine hook that records each game of a ``Game`` into a ``ReplayWriter``.
+
+    Set ``agents`` (and optionally ``tag``) before a game starts; a game that
+    is reset or re-started before it finishes is written as unfinished.
+    """
+
+    def __init__(self, writer: ReplayWriter, agents: Tuple[str, str] = ("agent1", "agent2"), tag: int = 0) -> None:
+        self.writer = writer
+        self.agents = agents
+        self.tag = tag
+        self._start: Optional[StartConfig] = None
+        self._moves: List[Move] = []
+        self._done = True
+
+    def start(self, game: Game) -> None:
+        if not self._done and self._moves:
+            self._write(None, "")
+        self._start = start_config(game)
+        self._moves = []
+        self._done = False
+
+    def on_step(self, dir1: Direction, dir2: Direction, boost1: bool, boost2: bool) -> None:
+        if not self._done:
+            self._moves.append((_DIRECTION_CODE[dir1], _DIRECTION_CODE[dir2], bool(boost1), bool(boost2)))
+
+    def on_result(self, result: GameResult, reason: str) -> None:
+        if not self._done:
+            self._write(result, reason)
+
+    def _write(self, result: Optional[GameResult], reason: str) -> None:
+        self._done = True
+        if self._start is not None:
+            self.writer.append(self._start, self._moves, result, reason, self.agents, self.tag)
+
+
+class ReplayStore:
+    """Read-only view of every shard in a replay directory.
+
+    ``index`` is one structured array over all games, with the shard number
+    in ``shard`` and agent ids mapped to positions in ``agents``.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.agents: List[str] = []
+        self._shards: List[str] = []
+        self._maps: List[Optional[mmap.mmap]] = []
+        agent_ids: Dict[str, int] = {}
+        tables = []
+        for index_path in sorted(glob.glob(os.path.join(directory, "*.index"))):
+            base = index_path[: -len(".index")]
+            data_path = base + ".replay"
+            if not os.path.exists(data_path) or not os.path.getsize(data_path):
+                continue
+            rows = np.fromfile(index_path, dtype=INDEX_DTYPE)
+            # Drop rows whose record was not fully written.
+            rows = rows[rows["offset"] + rows["size"] <= os.path.getsize(data_path)]
+            names_path = base + ".agents"
+            names = []
+            if os.path.exists(names_path):
+                with open(names_path, encoding="utf-8") as handle:
+                    names = handle.read().splitlines()
+            # Shard-local agent ids -> ids into the store-wide name list.
+            local = np.array([agent_ids.setdefault(n, len(agent_ids)) for n in names], dtype=np.uint16)
+            rows = rows[(rows["agent1"] < len(local)) & (rows["agent2"] < len(local))]
+            table = np.zeros(len(rows), dtype=STORE_DTYPE)
+            for field in INDEX_DTYPE.names:
+                table[field] = rows[field]
+            table["agent1"] = local[rows["agent1"]]
+            table["agent2"] = local[rows["agent2"]]
+            table["shard"] = len(self._shards)
+            tables.append(table)
+            self._shards.append(data_path)
+            self._maps.append(None)
+        self.agents = sorted(agent_ids, key=agent_ids.__getitem__)
+        self.index = (
+            np.concatenate(tables) if tables else np.zeros(0, dtype=STORE_DTYPE)
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def select(
+        self,
+        result: Optional[GameResult] = None,
+        min_steps: int = 0,
+        max_steps: Optional[int] = None,
+        agents: Optional[Tuple[Optional[str], Optional[str]]] = None,
+        either_seat: bool = False,
+        unfinished: bool = False,
+    ) -> np.ndarray:
+        """Row numbers of the games matching every given filter.
+
+        ``agents`` is ``(agent1, agent2)`` with ``None`` as a wildcard; with
+        ``either_seat`` the pair also matches with the seats swapped.
+        Unfinished games are skipped unless ``unfinished`` is set.
+        """
+
+        index = self.index
+        mask = index["steps"] >= min_steps
+        if max_steps is not None:
+            mask &= index["steps"] <= max_steps
+        if result is not None:
+            mask &= index["result"] == RESULT_CODES[result]
+        elif not unfinished:
+            mask &= index["result"] != UNFINISHED
+        if agents is not None:
+            pair = self._pair_mask(agents[0], agents[1])
+            if either_seat:
+                pair |= self._pair_mask(agents[1], agents[0])
+            mask &= pair
+        return np.flatnonzero(mask)
+
+    def _pair_mask(self, first: Optional[str], second: Optional[str]) -> np.ndarray:
+        mask = np.ones(len(self.index), dtype=bool)
+        for name, seat in ((first, "agent1"), (second, "agent2")):
+            if name is not None:
+                if name not in self.agents:
+                    return np.zeros(len(self.index), dtype=bool)
+                mask &= self.index[seat] == self.agents.index(name)
+        return mask
+
+    def read(self, row: int) -> Replay:
+        entry = self.index[row]
+        data = self._map(int(entry["shard"]))
+        offset = int(entry["offset"])
+        return self._decode(data, offset, (self.agents[entry["agent1"]], self.agents[entry["agent2"]]))
+
+    def __iter__(self) -> Iterator[Replay]:
+        return self.iter_replays()
+
+    def iter_replays(self, rows: Optional[np.ndarray] = None) -> Iterator[Replay]:
+        """Stream replays, in file order so reads stay sequential."""
+
+        if rows is None:
+            rows = np.arange(len(self.index))
+        order = np.lexsort((self.index["offset"][rows], self.index["shard"][rows]))
+        for row in np.asarray(rows)[order]:
+            yield self.read(int(row))
+
+    def game_at(self, row: int, turn: int) -> Game:
+        """The engine state of game ``row`` after ``turn`` steps."""
+
+        return simulate(self.read(row), turn)
+
+    def close(self) -> None:
+        for data in self._maps:
+            if data is not None:
+                data.close()
+        self._maps = [None] * len(self._maps)
+
+    def _map(self, shard: int) -> mmap.mmap:
+        data = self._maps[shard]
+        if data is None:
+            with open(self._shards[shard], "rb") as handle:
+                data = self._maps[shard] = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return data
+
+    @staticmethod
+    def _decode(data: mmap.mmap, offset: int, agents: Tuple[str, str]) -> Replay:
+        (magic, size, width, height, x1, y1, dir1, x2, y2, dir2, boosts, result, reason, steps, tag) = (
+            RECORD_HEADER.unpack_from(data, offset)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"no replay record at offset {offset}")
+        body = data[offset + RECORD_HEADER.size: offset + size]
+        start = StartConfig(width, height, (x1, y1, dir1), (x2, y2, dir2), boosts)
+        return Replay(
+            start=start,
+            moves=decode_moves(body, steps),
+            result=RESULTS.get(result),
+            reason=REASONS[reason] if reason < len(REASONS) else "",
+            agents=agents,
+            tag=tag,
+        )
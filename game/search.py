@@ -0,0 +1,493 @@
+"""Time-budgeted iterative-deepening alpha-beta over (direction, boost) actions.
+
+Moves are simultaneous in the real game. The tree models this by letting us
+commit to an action at MAX nodes and letting the opponent answer at MIN nodes
+without extending the depth; both paths are then resolved in the order
+``Game.step`` applies them. Agent 1 moves first, so it wins a race to a
+shared cell, while agent 1 running into agent 2's current head is a draw.
+
+Actions follow ``training.env`` numbering: ``action & 3`` indexes
+UP/DOWN/LEFT/RIGHT and ``action >= 4`` means the move is boosted.
+"""
+
+import random
+import threading
+import time
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from game.bitboard import BitBoard
+from game.eval_cache import EvalCache
+from game.voronoi import VoronoiEvaluator
+
+Coord = Tuple[int, int]
+
+DIRECTION_NAMES = ("UP", "DOWN", "LEFT", "RIGHT")
+DIRECTION_VECTORS: Tuple[Coord, ...] = ((0, -1), (0, 1), (-1, 0), (1, 0))
+OPPOSITE = (1, 0, 3, 2)
+
+WIN = 10_000.0
+BOOST_WEIGHT = 1.0
+NO_MOVE = -1
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class SearchTimeout(Exception):
+    """Raised inside the tree walk once the wall-clock deadline has passed."""
+
+
+class SearchResult(NamedTuple):
+    action: int
+    direction: str
+    boost: bool
+    score: float
+    depth: int
+    nodes: int
+
+
+class ZobristKeys:
+    """Random 64-bit keys for every hashed feature of a search position."""
+
+    MAX_BOOSTS = 16
+
+    def __init__(self, size: int, seed: int = 2025) -> None:
+        rng = random.Random(seed)
+        draw = lambda count: [rng.getrandbits(64) for _ in range(count)]  # noqa: E731
+        self.cell = draw(size)
+        self.my_head = draw(size)
+        self.their_head = draw(size + 1)
+        self.my_dir = draw(5)
+        self.their_dir = draw(5)
+        self.my_boosts = draw(self.MAX_BOOSTS)
+        self.their_boosts = draw(self.MAX_BOOSTS)
+
+    def cells(self, occupied: int) -> int:
+        """XOR of the cell keys of every occupied cell."""
+
+        key = 0
+        cell = self.cell
+        mask = occupied
+        while mask:
+            low = mask & -mask
+            key ^= cell[low.bit_length() - 1]
+            mask ^= low
+        return key
+
+    def position(
+        self,
+        cells_key: int,
+        my_head: int,
+        their_head: int,
+        my_dir: int,
+        their_dir: int,
+        my_boosts: int,
+        their_boosts: int,
+    ) -> int:
+        return (
+            cells_key
+            ^ self.my_head[my_head]
+            ^ self.their_head[their_head]
+            ^ self.my_dir[my_dir]
+            ^ self.their_dir[their_dir]
+            ^ self.my_boosts[min(my_boosts, self.MAX_BOOSTS - 1)]
+            ^ self.their_boosts[min(their_boosts, self.MAX_BOOSTS - 1)]
+        )
+
+
+class TranspositionTable:
+    """Fixed-size, index-addressed table of MAX-node results.
+
+    Slots are replaced when the stored entry is from an older search or was
+    searched no deeper than the new one, so memory never grows past
+    ``2 ** bits`` entries.
+    """
+
+    def __init__(self, bits: int = 16) -> None:
+        size = 1 << bits
+        self.mask = size - 1
+        self.keys = [0] * size
+        self.depths = [-1] * size
+        self.values = [0.0] * size
+        self.flags = [EXACT] * size
+        self.moves = [NO_MOVE] * size
+        self.ages = [0] * size
+        self.age = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self) -> None:
+        self.age += 1
+
+    def probe(self, key: int) -> int:
+        slot = key & self.mask
+        if self.keys[slot] == key and self.depths[slot] >= 0:
+            self.hits += 1
+            return slot
+        return -1
+
+    def store(self, key: int, depth: int, value: float, flag: int, move: int) -> None:
+        slot = key & self.mask
+        if self.keys[slot] != key and self.ages[slot] == self.age and self.depths[slot] > depth:
+            return
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.values[slot] = value
+        self.flags[slot] = flag
+        self.moves[slot] = move
+        self.ages[slot] = self.age
+        self.stores += 1
+
+    def clear(self) -> None:
+        size = self.mask + 1
+        self.keys = [0] * size
+        self.depths = [-1] * size
+        self.values = [0.0] * size
+        self.flags = [EXACT] * size
+        self.moves = [NO_MOVE] * size
+        self.ages = [0] * size
+        self.age = 0
+
+
+class AlphaBetaSearch:
+    """Anytime search engine bound to one board geometry."""
+
+    MAX_PLY = 64
+
+    def __init__(
+        self,
+        bits: BitBoard,
+        evaluator: Optional[VoronoiEvaluator] = None,
+        tt_bits: int = 16,
+        leaf_chambers: bool = False,
+        cache: Optional[EvalCache] = None,
+    ) -> None:
+        self.bits = bits
+        self.evaluator = evaluator or VoronoiEvaluator(bits)
+        self.step = bits.adjacency()
+        self.zobrist = ZobristKeys(bits.size)
+        self.table = TranspositionTable(tt_bits)
+        self.leaf_chambers = leaf_chambers
+        self.cache = cache
+        self.killers: List[List[List[int]]] = [
+            [[NO_MOVE, NO_MOVE] for _ in range(self.MAX_PLY)] for _ in range(2)
+        ]
+        self.history: List[List[int]] = [[0] * 8, [0] * 8]
+        self.nodes = 0
+        self._deadline = float("inf")
+        self._root_best = NO_MOVE
+        self._me_first = True
+        self._cancel: Optional[threading.Event] = None
+        self.best: Optional[SearchResult] = None
+        # Root action -> value in the last finished depth (bounds for all but the best).
+        self.root_scores: Dict[int, float] = {}
+        self._scores: Dict[int, float] = {}
+
+    def search(
+        self,
+        occupied: int,
+        my_head: Coord,
+        their_head: Optional[Coord],
+        my_dir: Optional[int],
+        their_dir: Optional[int],
+        my_boosts: int,
+        their_boosts: int,
+        budget: float,
+        max_depth: int = 32,
+        me_first: bool = True,
+        occupied_key: Optional[int] = None,
+        cancel: Optional[threading.Event] = None,
+        first_trail: int = 0,
+    ) -> SearchResult:
+        """Deepen until ``budget`` seconds elapse and return the last finished depth.
+
+        ``occupied`` must include both heads. Directions are indexes into
+        ``DIRECTION_NAMES`` (``None`` when unknown). ``me_first`` is True when
+        we are agent 1. Callers that maintain ``ZobristKeys.cells(occupied)``
+        incrementally can pass it as ``occupied_key`` to skip rehashing the
+        board. Setting ``cancel`` from another thread ends the search early
+        with the best finished depth; ``self.best`` holds that result as the
+        search progresses. Depth 1 always runs to completion so a move is
+        returned even with a zero budget or an early cancel. ``first_trail``
+        marks agent 1's trail cells: like ``Game.step``, agent 2 crosses them
+        unharmed in a turn where agent 1 crashed first. Left at 0, that move
+        counts as a crash.
+        """
+
+        bits = self.bits
+        start = time.perf_counter()
+        mh = bits.index(*my_head)
+        th = bits.index(*their_head) if their_head is not None else bits.size
+        md = 4 if my_dir is None else my_dir
+        td = 4 if their_dir is None else their_dir
+        if occupied_key is None:
+            occupied_key = self.zobrist.cells(occupied)
+        key = self.zobrist.position(occupied_key, mh, th, md, td, my_boosts, their_boosts)
+
+        self.table.new_search()
+        self.nodes = 0
+        self._me_first = me_first
+        self._cancel = None
+        self.best = None
+        self.root_scores = {}
+        for side in self.killers:
+            for slot in side:
+                slot[0] = slot[1] = NO_MOVE
+        for side in self.history:
+            for a in range(8):
+                side[a] >>= 2
+
+        max_depth = min(max_depth, self.MAX_PLY - 1, (bits.full & ~occupied).bit_count() + 1)
+        best: Optional[SearchResult] = None
+        last_duration = 0.0
+
+        for depth in range(1, max_depth + 1):
+            now = time.perf_counter()
+            remaining = start + budget - now
+            if best is not None and (remaining <= 0 or last_duration * 3 > remaining):
+                break
+            if best is not None and cancel is not None and cancel.is_set():
+                break
+            self._deadline = float("inf") if best is None else start + budget
+            self._cancel = None if best is None else cancel
+            self._root_best = NO_MOVE
+            self._scores = {}
+            try:
+                score = self._max_node(
+                    occupied, first_trail, mh, th, md, td, my_boosts, their_boosts, key, depth, 0, -WIN * 2, WIN * 2
+                )
+            except SearchTimeout:
+                break
+            last_duration = time.perf_counter() - now
+            action = self._root_best
+            self.root_scores = self._scores
+            best = SearchResult(
+                action=action,
+                direction=DIRECTION_NAMES[action & 3],
+                boost=action >= 4,
+                score=score,
+                depth=depth,
+                nodes=self.nodes,
+            )
+            self.best = best
+            if abs(score) >= WIN - self.MAX_PLY:
+                break  # forced result; deeper search cannot change it
+
+        assert best is not None
+        return best._replace(nodes=self.nodes)
+
+    # Tree walk -------------------------------------------------------------
+
+    def _actions(self, direction: int, boosts: int) -> List[int]:
+        reverse = OPPOSITE[direction] if direction < 4 else -1
+        actions = [d for d in range(4) if d != reverse]
+        if boosts > 0:
+            actions += [d + 4 for d in actions]
+        return actions
+
+    def _order(self, actions: List[int], side: int, ply: int, first: int) -> List[int]:
+        killers = self.killers[side][ply]
+        history = self.history[side]
+
+        def rank(action: int) -> Tuple[int, int, int]:
+            if action == first:
+                return (0, 0, 0)
+            if action == killers[0] or action == killers[1]:
+                return (1, 0, 0)
+            # Unboosted moves first on ties: boosts are a scarce resource.
+            return (2, -history[action], action >> 2)
+
+        return sorted(actions, key=rank)
+
+    def _record_cutoff(self, side: int, ply: int, action: int, depth: int) -> None:
+        killers = self.killers[side][ply]
+        if killers[0] != action:
+            killers[1] = killers[0]
+            killers[0] = action
+        self.history[side][action] += depth * depth
+
+    def _path(self, head: int, action: int, occupied: int) -> Tuple[List[int], bool]:
+        """Cells entered by ``action`` and whether the mover crashed doing it."""
+
+        step = self.step
+        direction = action & 3
+        cells = []
+        cell = head
+        for _ in range(2 if action >= 4 else 1):
+            cell = step[cell][direction]
+            cells.append(cell)
+            if (occupied >> cell) & 1:
+                return cells, True
+        return cells, False
+
+    def _resolve(
+        self,
+        first_cells: List[int],
+        first_crashed: bool,
+        second_cells: List[int],
+        second_crashed: bool,
+        second_head: int,
+        second_action: int,
+        crossable: int,
+    ) -> Tuple[bool, bool]:
+        """Deaths of (first, second) mover, mirroring ``Game.step`` ordering.
+
+        ``crossable`` is the occupancy the second mover sees once the first
+        has crashed: the dead first mover's trail no longer blocks it.
+        """
+
+        if first_crashed:
+            # Running into the other head kills both; the second mover then never moves.
+            if first_cells[-1] == second_head:
+                return True, True
+            if second_crashed:
+                second_crashed = self._path(second_head, second_action, crossable)[1]
+            return True, second_crashed
+        first_head = first_cells[-1] if first_cells else -1
+        for cell in second_cells:
+            if cell == first_head:
+                return True, True  # onto the first mover's new head: head-on
+            if cell in first_cells:
+                return False, True
+        return False, second_crashed
+
+    def _max_node(self, occ, ft, mh, th, md, td, mb, tb, key, depth, ply, alpha, beta) -> float:
+        self.nodes += 1
+        if not self.nodes & 31 and (
+            time.perf_counter() > self._deadline or (self._cancel is not None and self._cancel.is_set())
+        ):
+            raise SearchTimeout
+
+        if depth == 0:
+            return self._leaf(occ, mh, th, mb, tb)
+
+        table = self.table
+        tt_move = NO_MOVE
+        slot = table.probe(key)
+        if slot >= 0:
+            tt_move = table.moves[slot]
+            if ply > 0 and table.depths[slot] >= depth:
+                value = table.values[slot]
+                flag = table.flags[slot]
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value >= beta:
+                    return value
+                if flag == UPPER and value <= alpha:
+                    return value
+
+        original_alpha = alpha
+        best = -WIN * 2
+        best_move = NO_MOVE
+        for action in self._order(self._actions(md, mb), 0, ply, tt_move):
+            value = self._min_node(occ, ft, mh, th, md, td, mb, tb, key, action, depth, ply, alpha, beta)
+            if ply == 0:
+                self._scores[action] = value
+            if value > best:
+                best = value
+                best_move = action
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                self._record_cutoff(0, ply, action, depth)
+                break
+
+        if ply == 0:
+            self._root_best = best_move
+        flag = EXACT
+        if best <= original_alpha:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        table.store(key, depth, best, flag, best_move)
+        return best
+
+    def _min_node(self, occ, ft, mh, th, md, td, mb, tb, key, my_action, depth, ply, alpha, beta) -> float:
+        zobrist = self.zobrist
+        my_cells, my_crashed = self._path(mh, my_action, occ)
+        my_dir = my_action & 3
+        my_boosts = mb - 1 if my_action >= 4 else mb
+
+        if th >= self.bits.size:
+            their_options = [NO_MOVE]
+        else:
+            their_options = self._order(self._actions(td, tb), 1, ply, NO_MOVE)
+
+        best = WIN * 2
+        for their_action in their_options:
+            if their_action == NO_MOVE:
+                their_cells, their_crashed = [], False
+            else:
+                their_cells, their_crashed = self._path(th, their_action, occ)
+            if self._me_first:
+                my_dead, their_dead = self._resolve(
+                    my_cells, my_crashed, their_cells, their_crashed, th, their_action, occ & ~ft
+                )
+            else:
+                their_dead, my_dead = self._resolve(
+                    their_cells, their_crashed, my_cells, my_crashed, mh, my_action, occ & ~ft
+                )
+
+            if my_dead or their_dead:
+                if my_dead and their_dead:
+                    value = 0.0
+                elif my_dead:
+                    value = -WIN + ply
+                else:
+                    value = WIN - ply
+            else:
+                child_occ = occ
+                first_cells = my_cells if self._me_first else their_cells
+                child_ft = ft
+                for cell in first_cells:
+                    child_ft |= 1 << cell
+                child_key = key ^ zobrist.my_head[mh] ^ zobrist.my_dir[md]
+                for cell in my_cells:
+                    child_occ |= 1 << cell
+                    child_key ^= zobrist.cell[cell]
+                new_mh = my_cells[-1]
+                child_key ^= zobrist.my_head[new_mh] ^ zobrist.my_dir[my_dir]
+                child_key ^= zobrist.my_boosts[min(mb, 15)] ^ zobrist.my_boosts[min(my_boosts, 15)]
+
+                new_th, new_td, their_boosts = th, td, tb
+                if their_action != NO_MOVE:
+                    for cell in their_cells:
+                        child_occ |= 1 << cell
+                        child_key ^= zobrist.cell[cell]
+                    new_th = their_cells[-1]
+                    new_td = their_action & 3
+                    their_boosts = tb - 1 if their_action >= 4 else tb
+                    child_key ^= zobrist.their_head[th] ^ zobrist.their_head[new_th]
+                    child_key ^= zobrist.their_dir[td] ^ zobrist.their_dir[new_td]
+                    child_key ^= zobrist.their_boosts[min(tb, 15)] ^ zobrist.their_boosts[min(their_boosts, 15)]
+
+                value = self._max_node(
+                    child_occ, child_ft, new_mh, new_th, my_dir, new_td, my_boosts, their_boosts,
+                    child_key, depth - 1, ply + 1, alpha, beta,
+                )
+
+            if value < best:
+                best = value
+            if value < beta:
+                beta = value
+            if alpha >= beta:
+                if their_action != NO_MOVE:
+                    self._record_cutoff(1, ply, their_action, depth)
+                break
+
+        return best
+
+    def _leaf(self, occ: int, mh: int, th: int, mb: int, tb: int) -> float:
+        bits = self.bits
+        their_head = bits.coord(th) if th < bits.size else None
+        if self.cache is not None:
+            evaluate = partial(self.cache.score, evaluator=self.evaluator)
+        else:
+            evaluate = self.evaluator.evaluate
+        territory = evaluate(occ, bits.coord(mh), their_head, chambers=self.leaf_chambers)
+        if territory.separated and not self.leaf_chambers:
+            # Once cut off, raw territory overstates corridors; score the chamber tree.
+            territory = evaluate(occ, bits.coord(mh), their_head, chambers=True)
+        return territory.my_space - territory.their_space + BOOST_WEIGHT * (mb - tb)
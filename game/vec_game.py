@@ -0,0 +1,176 @@
+"""Vectorized simulator that steps many Case Closed games at once.
+
+``VecGame`` mirrors ``Game.step`` rule for rule (including its quirks: a
+reversed move is skipped but still burns a boost, moving into a dead agent's
+trail is allowed, and the return value of each ``Agent.move`` decides the
+result even when the second mover's head-on collision also killed the first)
+over NumPy arrays shaped ``(N, ...)``. ``python -m eval.check_vec_game`` replays
+random games through both engines to keep them in lock-step.
+
+Directions are indexes in ``training.env`` order: UP, DOWN, LEFT, RIGHT.
+"""
+
+import numpy as np
+
+from game.case_closed_game import Direction, GameResult
+
+DIRECTIONS = (Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT)
+DX = np.array([d.value[0] for d in DIRECTIONS], dtype=np.int64)
+DY = np.array([d.value[1] for d in DIRECTIONS], dtype=np.int64)
+OPPOSITE = np.array([1, 0, 3, 2], dtype=np.int64)
+
+ONGOING = 0
+AGENT1_WIN = GameResult.AGENT1_WIN.value
+AGENT2_WIN = GameResult.AGENT2_WIN.value
+DRAW = GameResult.DRAW.value
+
+MAX_TURNS = 200
+START_POSITIONS = ((1, 2), (17, 15))
+START_DIRECTIONS = (DIRECTIONS.index(Direction.RIGHT), DIRECTIONS.index(Direction.LEFT))
+START_BOOSTS = 3
+
+
+class VecGame:
+    """``n`` independent games stored as flat NumPy arrays.
+
+    ``grid[i, y, x]`` is 0 when empty, otherwise the id (1 or 2) of the agent
+    whose trail covers the cell. Per-agent arrays are indexed ``[game, agent]``
+    with agent 0 being agent 1.
+    """
+
+    def __init__(self, n: int, height: int = 18, width: int = 20):
+        self.n = n
+        self.height = height
+        self.width = width
+        self.grid = np.zeros((n, height, width), dtype=np.int8)
+        self.head_x = np.zeros((n, 2), dtype=np.int64)
+        self.head_y = np.zeros((n, 2), dtype=np.int64)
+        self.direction = np.zeros((n, 2), dtype=np.int64)
+        self.boosts = np.zeros((n, 2), dtype=np.int64)
+        self.length = np.zeros((n, 2), dtype=np.int64)
+        self.alive = np.zeros((n, 2), dtype=bool)
+        self.turns = np.zeros(n, dtype=np.int64)
+        self.result = np.zeros(n, dtype=np.int8)
+        self.reset()
+
+    @property
+    def done(self) -> np.ndarray:
+        return self.result != ONGOING
+
+    def reset(self, mask: np.ndarray | None = None) -> None:
+        """Reset every game, or only those selected by the boolean ``mask``."""
+
+        idx = np.arange(self.n) if mask is None else np.flatnonzero(mask)
+        if idx.size == 0:
+            return
+        self.grid[idx] = 0
+        for agent, (sx, sy) in enumerate(START_POSITIONS):
+            d = START_DIRECTIONS[agent]
+            nx = (sx + DX[d]) % self.width
+            ny = (sy + DY[d]) % self.height
+            self.grid[idx, sy % self.height, sx % self.width] = agent + 1
+            self.grid[idx, ny, nx] = agent + 1
+            self.head_x[idx, agent] = nx
+            self.head_y[idx, agent] = ny
+            self.direction[idx, agent] = d
+        self.boosts[idx] = START_BOOSTS
+        self.length[idx] = 2
+        self.alive[idx] = True
+        self.turns[idx] = 0
+        self.result[idx] = ONGOING
+
+    def step(
+        self,
+        dir1: np.ndarray,
+        dir2: np.ndarray,
+        boost1: np.ndarray | None = None,
+        boost2: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Advance every unfinished game by one turn.
+
+        Returns an ``int8`` array with the ``GameResult`` value of games that
+        ended on this call and 0 elsewhere. Finished games are left untouched
+        until they are ``reset``.
+        """
+
+        n = self.n
+        dir1 = np.asarray(dir1, dtype=np.int64)
+        dir2 = np.asarray(dir2, dtype=np.int64)
+        boost1 = np.zeros(n, dtype=bool) if boost1 is None else np.asarray(boost1, dtype=bool)
+        boost2 = np.zeros(n, dtype=bool) if boost2 is None else np.asarray(boost2, dtype=bool)
+
+        active = self.result == ONGOING
+        outcome = np.zeros(n, dtype=np.int8)
+
+        # Turn limit is checked before anyone moves, exactly like Game.step.
+        limit = active & (self.turns >= MAX_TURNS)
+        if limit.any():
+            l1 = self.length[:, 0]
+            l2 = self.length[:, 1]
+            outcome[limit & (l1 > l2)] = AGENT1_WIN
+            outcome[limit & (l2 > l1)] = AGENT2_WIN
+            outcome[limit & (l1 == l2)] = DRAW
+        playing = active & ~limit
+
+        one_ok = self._move(0, dir1, boost1, playing)
+        two_ok = self._move(1, dir2, boost2, playing)
+
+        outcome[playing & ~one_ok & ~two_ok] = DRAW
+        outcome[playing & ~one_ok & two_ok] = AGENT2_WIN
+        outcome[playing & one_ok & ~two_ok] = AGENT1_WIN
+        self.turns[playing & one_ok & two_ok] += 1
+
+        self.result[active] = outcome[active]
+        return outcome
+
+    def _move(self, agent: int, dirs: np.ndarray, boost: np.ndarray, playing: np.ndarray) -> np.ndarray:
+        """Vectorized ``Agent.move``; returns its boolean return value per game."""
+
+        other = 1 - agent
+        mine = agent + 1
+        theirs = other + 1
+
+        ok = playing & self.alive[:, agent]
+        boosting = ok & boost & (self.boosts[:, agent] > 0)
+        self.boosts[boosting, agent] -= 1
+
+        # A reversal skips both sub-moves and leaves the direction unchanged.
+        moving = ok & (dirs != OPPOSITE[self.direction[:, agent]])
+
+        for sub in range(2):
+            idx = np.flatnonzero(moving if sub == 0 else moving & boosting)
+            if idx.size == 0:
+                break
+            d = dirs[idx]
+            nx = (self.head_x[idx, agent] + DX[d]) % self.width
+            ny = (self.head_y[idx, agent] + DY[d]) % self.height
+            cell = self.grid[idx, ny, nx]
+            self.direction[idx, agent] = d
+
+            other_alive = self.alive[idx, other]
+            own_hit = cell == mine
+            their_hit = (cell == theirs) & other_alive
+            head_on = their_hit & (nx == self.head_x[idx, other]) & (ny == self.head_y[idx, other])
+            dead = own_hit | their_hit
+
+            if dead.any():
+                dead_idx = idx[dead]
+                self.alive[dead_idx, agent] = False
+                self.alive[idx[head_on], other] = False
+                ok[dead_idx] = False
+                moving[dead_idx] = False
+
+            # Survivors (including moves onto a dead opponent's trail) advance.
+            live = ~dead
+            live_idx = idx[live]
+            self.grid[live_idx, ny[live], nx[live]] = mine
+            self.head_x[live_idx, agent] = nx[live]
+            self.head_y[live_idx, agent] = ny[live]
+            self.length[live_idx, agent] += 1
+
+        return ok
+
+    def occupancy(self) -> np.ndarray:
+        """Boolean ``(N, H, W)`` view of occupied cells."""
+
+        return self.grid != 0
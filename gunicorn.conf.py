@@ -0,0 +1,28 @@
+"""Production server settings: ``gunicorn -c gunicorn.conf.py agent:app``.
+
+Matches live in the memory of the worker that created them, so the default is
+one worker process with many threads; moves for different matches run in
+parallel in ``SEARCH_PROCESSES`` search processes owned by that worker (one
+per CPU unless set). Only raise ``WEB_CONCURRENCY`` behind a proxy that routes
+every request of a match (``X-Game-Id``) to the same worker.
+"""
+
+import os
+
+# Read by agent.py when the worker imports it.
+os.environ.setdefault("SEARCH_PROCESSES", "auto")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5008')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 32))
+timeout = 60
+graceful_timeout = 10
+keepalive = 5
+
+
+def post_worker_init(worker):
+    # Load the models and start the search processes before the first request.
+    import agent
+
+    agent.matches.start()
@@ -0,0 +1,177 @@
+# training/boards.py
+"""Random survival-phase positions, generated in batches with NumPy, and their oracle labels.
+
+A survival position is a torus where our head can only reach one enclosed
+region: everything outside it is trail or wall, so the only goal left is
+the longest self-avoiding path. ``random_boards`` builds ``n`` of them at
+once:
+
+1. scatter walls with a per-board density and draw one or two pairs of
+   parallel cut lines (rows and/or columns, with a few gaps), which is what
+   partitions a torus;
+2. put the head on a random free cell and flood its region with vectorized
+   dilation (``np.roll`` over the whole batch);
+3. fill every cell outside the region, pick an incoming direction whose
+   cell behind the head is occupied (that cell becomes our trail), and drop
+   boards whose region is too small.
+
+``label`` scores each position with ``game.endgame.EndgameSolver`` (the
+anytime longest-path search the agent uses in separated endgames): the
+policy target spreads over the first moves reaching the best length, and the
+value target is that length as a fraction of the region.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from game.bitboard import BitBoard
+from game.endgame import EndgameSolver
+from game.vec_game import DX, DY
+from training.utils import OBS_SHAPE
+
+N_ACTIONS = 8
+
+
+class Boards(NamedTuple):
+    """A batch of positions; ``blocked`` excludes the head, ``region`` is its reachable free area."""
+
+    blocked: np.ndarray  # (n, H, W) bool
+    region: np.ndarray  # (n, H, W) bool
+    head: np.ndarray  # (n, 2) x, y
+    direction: np.ndarray  # (n,) index in UP, DOWN, LEFT, RIGHT
+    behind: np.ndarray  # (n, 2) the trail cell behind the head
+    boosts: np.ndarray  # (n,)
+    turn: np.ndarray  # (n,)
+
+
+def flood(seed, free):
+    """Cells of ``free`` (plus ``seed``) connected to ``seed`` on the torus, for a batch of ``(n, H, W)`` masks."""
+    reach = seed.copy()
+    active = np.arange(len(seed))
+    while len(active):
+        r = reach[active]
+        grown = r | ((np.roll(r, 1, 1) | np.roll(r, -1, 1) | np.roll(r, 1, 2) | np.roll(r, -1, 2)) & free[active])
+        changed = (grown != r).reshape(len(active), -1).any(axis=1)
+        reach[active] = grown
+        active = active[changed]
+    return reach
+
+
+def random_boards(rng, n, width=20, height=18, min_region=6, max_density=0.4):
+    """``n`` survival positions (regenerating any that come out degenerate)."""
+    parts = []
+    have = 0
+    while have < n:
+        batch = _attempt(rng, max(n - have, 16) * 2, width, height, min_region, max_density)
+        parts.append(batch)
+        have += len(batch.head)
+    return Boards(*(np.concatenate(arrays)[:n] for arrays in zip(*parts)))
+
+
+def _attempt(rng, n, width, height, min_region, max_density):
+    shape = (n, height, width)
+    density = rng.uniform(0.0, max_density, size=(n, 1, 1))
+    blocked = rng.random(shape) < density
+
+    # Two parallel cuts split the torus into bands; a few gaps keep some bands joined.
+    idx = np.arange(n)
+    for axis, size in ((1, height), (2, width)):
+        use = rng.random(n) < 0.85
+        for _ in range(2):
+            line = rng.integers(0, size, n)
+            gaps = rng.random((n, width if axis == 1 else height)) < rng.uniform(0.0, 0.1, (n, 1))
+            if axis == 1:
+                blocked[idx[use], line[use], :] |= ~gaps[use]
+            else:
+                blocked[idx[use], :, line[use]] |= ~gaps[use]
+
+    # Head: a random free cell.
+    free = ~blocked
+    keys = np.where(free.reshape(n, -1), rng.random((n, height * width)), -1.0)
+    cell = keys.argmax(axis=1)
+    ok = free.reshape(n, -1)[idx, cell]
+    hx, hy = cell % width, cell // width
+    seed = np.zeros(shape, dtype=bool)
+    seed[idx, hy, hx] = True
+    region = flood(seed, free) & ~seed
+
+    # Incoming direction: one whose cell behind the head is occupied.
+    bx = (hx[:, None] - DX[None, :]) % width
+    by = (hy[:, None] - DY[None, :]) % height
+    behind_blocked = ~region[idx[:, None], by, bx]  # a free neighbour of the head is in the region
+    keys = np.where(behind_blocked, rng.random((n, 4)), -1.0)
+    direction = keys.argmax(axis=1)
+    ok &= behind_blocked.any(axis=1)
+    ok &= region.reshape(n, -1).sum(axis=1) >= min_region
+
+    keep = np.flatnonzero(ok)
+    head = np.stack([hx, hy], axis=1)[keep]
+    behind = np.stack([bx[idx, direction], by[idx, direction]], axis=1)[keep]
+    region = region[keep]
+    blocked = ~region
+    blocked[np.arange(len(keep)), head[:, 1], head[:, 0]] = False
+    return Boards(
+        blocked=blocked,
+        region=region,
+        head=head,
+        direction=direction[keep],
+        behind=behind,
+        boosts=rng.integers(0, 4, len(keep)),
+        turn=rng.integers(20, 200, len(keep)),
+    )
+
+
+def observations(boards):
+    """``(n, 10, 18, 20)`` float32 planes as ``training.utils.state_to_tensor`` lays them out.
+
+    The head and the cell behind it are our trail; every other blocked cell
+    is drawn as the opponent's, with their head somewhere inside it.
+    """
+    n = len(boards.head)
+    obs = np.zeros((n, *OBS_SHAPE), dtype=np.float32)
+    idx = np.arange(n)
+    hx, hy = boards.head[:, 0], boards.head[:, 1]
+    bx, by = boards.behind[:, 0], boards.behind[:, 1]
+    obs[idx, 0, hy, hx] = 1.0
+    obs[idx, 0, by, bx] = 1.0
+    obs[:, 1] = boards.blocked
+    obs[idx, 1, by, bx] = 0.0
+    obs[idx, 2, hy, hx] = 1.0
+    # Their head: the first opponent cell in row-major order.
+    theirs = obs[:, 1].reshape(n, -1).argmax(axis=1)
+    obs[idx, 3, theirs // OBS_SHAPE[2], theirs % OBS_SHAPE[2]] = obs[idx, 1].reshape(n, -1)[idx, theirs]
+    obs[:, 8] = (boards.boosts / 3.0)[:, None, None]
+    obs[:, 9] = np.minimum(boards.turn / 200.0, 1.0)[:, None, None]
+    return obs
+
+
+def label(boards, budget_ms=10.0, solver=None):
+    """``(policy, value, lengths)`` targets from the longest-path oracle.
+
+    ``lengths[i, d]`` is the path length found after first move ``d`` (0 for
+    a blocked move). Legal moves the search left unscored (its wall-hugging
+    walk was already optimal, or time ran out) get the length of a walk from
+    that first move.
+    """
+    n, height, width = boards.blocked.shape
+    bits = solver.bits if solver is not None else BitBoard(width, height)
+    solver = solver or EndgameSolver(bits)
+    packed = np.packbits(boards.blocked.reshape(n, -1), axis=1, bitorder="little")
+    policy = np.zeros((n, N_ACTIONS), dtype=np.float32)
+    value = np.zeros(n, dtype=np.float32)
+    lengths = np.zeros((n, 4), dtype=np.int64)
+    sizes = boards.region.reshape(n, -1).sum(axis=1)
+    for i in range(n):
+        head = (int(boards.head[i, 0]), int(boards.head[i, 1]))
+        occupied = int.from_bytes(packed[i].tobytes(), "little") | bits.bit(*head)
+        result = solver.solve(occupied, head, budget_ms / 1000.0)
+        scores = dict(solver.root_scores) or {result.action: result.length}
+        scores.update(solver.walk_scores(occupied, head, budget_ms / 1000.0, skip=scores))
+        top = max(scores.values())
+        for action, length in scores.items():
+            lengths[i, action] = length
+            if length == top:
+                policy[i, action] = 1.0
+        policy[i] /= policy[i].sum()
+        value[i] = top / max(int(sizes[i]), 1)
+    return policy, value, lengths
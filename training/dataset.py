@@ -0,0 +1,197 @@
+# training/dataset.py
+"""Fixed-size ``.npy`` shards of (observation, policy target, value target) samples.
+
+A shard is three preallocated arrays written through ``np.lib.format.open_memmap``
+plus a small JSON manifest holding how many rows are filled:
+
+* ``<prefix>-NNNNN.obs.npy``     ``(size, 10, 18, 20)`` float16 observations
+  (the planes of ``training.utils.ObservationEncoder``; every value is exact
+  in float16 except the turn plane, which is off by < 0.001);
+* ``<prefix>-NNNNN.policy.npy``  ``(size, 8)`` float32 action distributions;
+* ``<prefix>-NNNNN.value.npy``   ``(size,)`` float32 outcomes in [-1, 1];
+* ``<prefix>-NNNNN.json``        ``{"count": filled rows, "size": ..., "games": ...}``.
+
+Each ``ShardWriter`` owns the shards with its prefix, so generator processes
+never share a file. The manifest is rewritten on every ``flush``, so a reader
+only ever sees completely written rows. ``SelfPlayDataset`` memory-maps the
+shards and fetches a whole batch of random indices shard by shard, so a
+shuffled ``DataLoader`` streams from disk without loading the dataset.
+"""
+import glob
+import json
+import os
+import socket
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from training.utils import OBS_SHAPE
+
+N_ACTIONS = 8
+OBS_DTYPE = np.float16
+
+
+class ShardWriter:
+    """Appends samples to this process's shards in ``directory``, ``shard_size`` rows per shard."""
+
+    def __init__(self, directory, prefix=None, shard_size=4096):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix or f"{socket.gethostname()}-{os.getpid()}"
+        self.shard_size = shard_size
+        self.samples = 0
+        self._shard = len(glob.glob(os.path.join(directory, f"{glob.escape(self.prefix)}-*.json"))) - 1
+        self._arrays = None
+        self._count = 0
+        self._games = 0
+
+    def _open_next(self):
+        self.flush()
+        self._shard += 1
+        base = self._base()
+        shapes = (("obs", (self.shard_size, *OBS_SHAPE), OBS_DTYPE),
+                  ("policy", (self.shard_size, N_ACTIONS), np.float32),
+                  ("value", (self.shard_size,), np.float32))
+        self._arrays = {
+            name: np.lib.format.open_memmap(f"{base}.{name}.npy", mode="w+", dtype=dtype, shape=shape)
+            for name, shape, dtype in shapes
+        }
+        self._count = 0
+        self._games = 0
+        self._write_manifest()
+
+    def _base(self):
+        return os.path.join(self.directory, f"{self.prefix}-{self._shard:05d}")
+
+    def extend(self, obs, policy, value):
+        """Append a batch of samples (typically one game's worth), spilling into new shards as needed."""
+        obs = np.asarray(obs)
+        n = len(obs)
+        done = 0
+        while done < n:
+            if self._arrays is None or self._count == self.shard_size:
+                self._open_next()
+            take = min(n - done, self.shard_size - self._count)
+            rows = slice(self._count, self._count + take)
+            self._arrays["obs"][rows] = obs[done:done + take]
+            self._arrays["policy"][rows] = policy[done:done + take]
+            self._arrays["value"][rows] = value[done:done + take]
+            self._count += take
+            done += take
+        self._games += 1
+        self.samples += n
+
+    def flush(self):
+        """Write the filled rows to disk and publish them in the manifest."""
+        if self._arrays is None:
+            return
+        for array in self._arrays.values():
+            array.flush()
+        self._write_manifest()
+
+    def _write_manifest(self):
+        path = self._base() + ".json"
+        with open(path + ".tmp", "w", encoding="utf-8") as handle:
+            json.dump({"count": self._count, "size": self.shard_size, "games": self._games}, handle)
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        self.flush()
+        self._arrays = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def list_shards(directory) -> List[Tuple[str, int]]:
+    """``(base path, filled rows)`` of every non-empty shard in ``directory``."""
+    shards = []
+    for manifest in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(manifest, encoding="utf-8") as handle:
+            count = json.load(handle).get("count", 0)
+        base = manifest[:-len(".json")]
+        if count and all(os.path.exists(f"{base}.{name}.npy") for name in ("obs", "policy", "value")):
+            shards.append((base, count))
+    return shards
+
+
+class SelfPlayDataset(Dataset):
+    """Map-style view over every shard in a directory.
+
+    Shards are opened lazily with ``mmap_mode="r"`` in whichever process
+    reads them, so the dataset pickles cheaply into ``DataLoader`` workers.
+    ``__getitems__`` serves a whole batch: indices are grouped by shard and
+    sorted before the memory-mapped gather, then put back in sampler order.
+    """
+
+    def __init__(self, directory):
+        self.shards = list_shards(directory)
+        self.offsets = np.cumsum([0] + [count for _, count in self.shards])
+        self._arrays: List[Optional[tuple]] = [None] * len(self.shards)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_arrays"] = [None] * len(self.shards)
+        return state
+
+    def _shard(self, index):
+        arrays = self._arrays[index]
+        if arrays is None:
+            base, _ = self.shards[index]
+            arrays = self._arrays[index] = tuple(
+                np.load(f"{base}.{name}.npy", mmap_mode="r") for name in ("obs", "policy", "value")
+            )
+        return arrays
+
+    def __getitem__(self, index):
+        obs, policy, value = self.__getitems__([index])
+        return obs[0], policy[0], value[0]
+
+    def __getitems__(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError("sample index out of range")
+        n = len(indices)
+        obs = np.empty((n, *OBS_SHAPE), dtype=np.float32)
+        policy = np.empty((n, N_ACTIONS), dtype=np.float32)
+        value = np.empty(n, dtype=np.float32)
+        shard_of = np.searchsorted(self.offsets, indices, side="right") - 1
+        for shard in np.unique(shard_of):
+            picks = np.flatnonzero(shard_of == shard)
+            local = indices[picks] - self.offsets[shard]
+            order = np.argsort(local, kind="stable")
+            picks, local = picks[order], local[order]
+            shard_obs, shard_policy, shard_value = self._shard(int(shard))
+            obs[picks] = shard_obs[local]
+            policy[picks] = shard_policy[local]
+            value[picks] = shard_value[local]
+        return torch.from_numpy(obs), torch.from_numpy(policy), torch.from_numpy(value)
+
+
+def _batched(batch):
+    # __getitems__ already returns collated tensors.
+    return batch
+
+
+def make_loader(directory, batch_size=256, shuffle=True, num_workers=0, drop_last=False, seed=None):
+    """``DataLoader`` yielding ``(obs, policy, value)`` batches from the shards in ``directory``."""
+    dataset = SelfPlayDataset(directory)
+    generator = torch.Generator().manual_seed(seed) if seed is not None else None
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=shuffle,
+        num_workers=num_workers,
+        drop_last=drop_last,
+        collate_fn=_batched,
+        generator=generator,
+        persistent_workers=num_workers > 0,
+    )
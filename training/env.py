@@ -3,15 +3,23 @@ import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
 from game.case_closed_game import Game, Direction, GameResult
-from training.utils import state_to_tensor
+from training.utils import ObservationEncoder
 import random
 
 DIR_MAP = {0: Direction.UP, 1: Direction.DOWN, 2: Direction.LEFT, 3: Direction.RIGHT}
 
 class TronEnv(gym.Env):
-    def __init__(self):
+    def __init__(self, debug=False, opponent=None):
         super().__init__()
+        self.debug = debug  # per-step debug prints; off for fast rollout collection
+        # Agent 2: a training.opponents spec (e.g. "flood_fill") or any
+        # (game, player) -> (Direction, boost) callable; None keeps going RIGHT.
+        if isinstance(opponent, str):
+            from training.opponents import make_opponent
+            opponent = make_opponent(opponent)
+        self.opponent = opponent
         self.game = Game()
+        self.encoder = ObservationEncoder(player=1)
         self.turns = 0
         self.action_space = spaces.Discrete(8)
         self.observation_space = spaces.Box(low=0, high=1, shape=(10, 18, 20), dtype=np.float32)
@@ -20,27 +28,23 @@ class TronEnv(gym.Env):
         self.game.reset()
         self.turns = 0
         obs = self._get_obs()
-        print(f"[DEBUG RESET] Obs shape: {obs.shape}, turns: 0")
+        if self.debug:
+            print(f"[DEBUG RESET] Obs shape: {obs.shape}, turns: 0")
         return obs, {}
 
     def _get_obs(self):
-        state_dict = {
-            'board': self.game.board.grid,
-            'agent1_trail': self.game.agent1.get_trail_positions(),
-            'agent2_trail': self.game.agent2.get_trail_positions(),
-            'agent1_boosts': self.game.agent1.boosts_remaining,
-            'agent2_boosts': self.game.agent2.boosts_remaining,
-            'turn_count': self.game.turns,
-        }
-        return state_to_tensor(state_dict).numpy()
+        # Incremental encode into a persistent buffer; copy so callers may keep it.
+        return self.encoder.update(self.game).copy()
 
     def step(self, action):
         self.turns += 1
-        print(f"[DEBUG STEP] Turn {self.turns}, action {action}, agent1.alive {self.game.agent1.alive}, agent2.alive {self.game.agent2.alive}")
+        if self.debug:
+            print(f"[DEBUG STEP] Turn {self.turns}, action {action}, agent1.alive {self.game.agent1.alive}, agent2.alive {self.game.agent2.alive}")
 
         # Force end after 100 turns
         if self.turns >= 100:
-            print("[DEBUG] Force end at max turns")
+            if self.debug:
+                print("[DEBUG] Force end at max turns")
             reward = 50 if self.game.agent1.length > self.game.agent2.length else -50
             return self._get_obs(), reward, True, False, {"result": "max_turns"}
 
@@ -48,7 +52,8 @@ class TronEnv(gym.Env):
         if not self.game.agent1.alive or not self.game.agent2.alive:
             result = GameResult.DRAW if not self.game.agent1.alive and not self.game.agent2.alive else GameResult.AGENT2_WIN if not self.game.agent1.alive else GameResult.AGENT1_WIN
             reward = self._compute_reward(result)
-            print(f"[DEBUG] Episode end: {result}, reward {reward}")
+            if self.debug:
+                print(f"[DEBUG] Episode end: {result}, reward {reward}")
             return self._get_obs(), reward, True, False, {"result": result.name}
 
         # Player move
@@ -56,14 +61,18 @@ class TronEnv(gym.Env):
         boost = action >= 4 and self.game.agent1.boosts_remaining > 0
         dir1 = DIR_MAP[dir_idx]
 
-        # Fixed opponent (always RIGHT to avoid invalid)
-        opp_dir = Direction.RIGHT
+        if self.opponent is not None:
+            opp_dir, opp_boost = self.opponent(self.game, 2)
+        else:
+            # Fixed opponent (always RIGHT to avoid invalid)
+            opp_dir, opp_boost = Direction.RIGHT, False
 
-        result = self.game.step(dir1, opp_dir, boost1=boost, boost2=False)
+        result = self.game.step(dir1, opp_dir, boost1=boost, boost2=opp_boost)
 
         reward = self._compute_reward(result)
         done = result is not None
-        print(f"[DEBUG] After step: done {done}, reward {reward}")
+        if self.debug:
+            print(f"[DEBUG] After step: done {done}, reward {reward}")
 
         return self._get_obs(), reward, done, False, {}
 
@@ -1,57 +1,293 @@
 # training/mcts.py
+import math
+import threading
+
 import numpy as np
+import torch
 from training.utils import state_to_tensor
 
-class MCTSNode:
-    def __init__(self, prior=0.0):
-        self.prior = prior
-        self.visit_count = 0
-        self.total_value = 0.0
-        self.children = {}
-
-def mcts_search(state, model, player, simulations=80):
-    root = MCTSNode()
-    for _ in range(simulations):
-        node = root
-        current_state = dict(state)
-        path = [node]
-
-        # Selection
-        while node.children:
-            children = node.children
-            best_score = -float('inf')
-            best_action = None
-            for action, child in children.items():
-                Q = child.total_value / (child.visit_count + 1)
-                U = 1.4 * child.prior * np.sqrt(node.visit_count + 1) / (1 + child.visit_count)
-                score = Q + U
-                if score > best_score:
-                    best_score = score
-                    best_action = action
-            # Simulate move (skip invalid for speed)
-            node = children[best_action]
-            path.append(node)
-
-        # Expansion & Evaluation
-        obs = state_to_tensor(current_state, player).unsqueeze(0)
-        with torch.no_grad():
-            policy_logits, value = model(obs)
-        policy = torch.softmax(policy_logits, dim=-1).squeeze(0).cpu().numpy()
-        value = value.item()
+VIRTUAL_LOSS = 1.0
+C_PUCT = 1.4
+WIDTH, HEIGHT = 20, 18
+DELTAS = ((0, -1), (0, 1), (-1, 0), (1, 0))  # UP, DOWN, LEFT, RIGHT (action % 4)
+
+
+class MCTSTree:
+    """Search tree stored in flat, preallocated arrays.
+
+    Node ``i`` has ``prior[i]``, ``visits[i]``, ``value_sum[i]``, the
+    ``action[i]`` that leads to it and, once expanded, its children in the
+    contiguous slots ``first_child[i] : first_child[i] + num_children[i]``.
+    Node 0 is the root. ``first_child == -1`` marks an unexpanded leaf.
+
+    The tree remembers the searching player's trail at the root; passing the
+    next turn's state to ``reuse`` promotes the child we actually played and
+    keeps its statistics instead of starting from scratch.
+    """
+
+    def __init__(self, capacity=4096):
+        self.prior = np.zeros(capacity, dtype=np.float32)
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.value_sum = np.zeros(capacity, dtype=np.float32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.int8)
+        self.action = np.zeros(capacity, dtype=np.int8)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.pending = np.zeros(capacity, dtype=bool)
+        self.size = 1
+        self.root_trail = None
+
+    @property
+    def capacity(self):
+        return len(self.prior)
+
+    def clear(self):
+        self.size = 1
+        self._reset_slots(0, 1)
+        self.root_trail = None
+
+    def _reset_slots(self, start, stop):
+        self.prior[start:stop] = 0.0
+        self.visits[start:stop] = 0
+        self.value_sum[start:stop] = 0.0
+        self.first_child[start:stop] = -1
+        self.num_children[start:stop] = 0
+        self.pending[start:stop] = False
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name in ('prior', 'visits', 'value_sum', 'first_child', 'num_children', 'action', 'parent', 'pending'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def expand(self, node, actions, priors):
+        """Append children for ``actions`` (with matching ``priors``) under ``node``."""
+        count = len(actions)
+        if count == 0 or self.first_child[node] != -1:
+            return
+        start = self.size
+        if start + count > self.capacity:
+            self._grow(start + count)
+        stop = start + count
+        self._reset_slots(start, stop)
+        self.prior[start:stop] = priors
+        self.action[start:stop] = actions
+        self.parent[start:stop] = node
+        self.first_child[node] = start
+        self.num_children[node] = count
+        self.size = stop
+
+    def select_child(self, node):
+        """PUCT over all children of ``node`` in one vectorized pass."""
+        start = self.first_child.item(node)
+        stop = start + self.num_children.item(node)
+        # Q + U share the 1 / (1 + N_child) factor.
+        explore = C_PUCT * math.sqrt(self.visits.item(node) + 1)
+        score = (self.value_sum[start:stop] + explore * self.prior[start:stop]) / (self.visits[start:stop] + 1)
+        return start + int(score.argmax())
+
+    def root_children(self):
+        start = self.first_child[0]
+        if start == -1:
+            return np.zeros(0, dtype=np.int32)
+        return np.arange(start, start + self.num_children[0], dtype=np.int32)
+
+    def best_action(self):
+        children = self.root_children()
+        if len(children) == 0:
+            return 3  # RIGHT fallback
+        return int(self.action[children[np.argmax(self.visits[children])]])
+
+    def reuse(self, state, player):
+        """Re-root on the subtree matching ``state``; clear the tree if none does.
+
+        Only the searching player's moves are in the tree, so the opponent's
+        reply does not change which subtree is kept; its effect shows up in
+        the evaluations of new leaves.
+        """
+        trail = [tuple(c) for c in state[f'agent{player}_trail']]
+        if self.root_trail is not None and self.first_child[0] != -1:
+            n = len(self.root_trail)
+            if trail[:n] == self.root_trail:
+                x, y = self.root_trail[-1]
+                for child in self.root_children():
+                    action = int(self.action[child])
+                    dx, dy = DELTAS[action % 4]
+                    steps = 2 if action >= 4 else 1
+                    expected = [((x + dx * k) % WIDTH, (y + dy * k) % HEIGHT) for k in range(1, steps + 1)]
+                    if trail[n:] == expected:
+                        self._promote(int(child))
+                        self.root_trail = trail
+                        return True
+        self.clear()
+        self.root_trail = trail
+        return False
+
+    def _promote(self, new_root):
+        # Breadth-first order keeps every child block contiguous.
+        order = [new_root]
+        i = 0
+        while i < len(order):
+            node = order[i]
+            start = self.first_child[node]
+            if start != -1:
+                order.extend(range(start, start + self.num_children[node]))
+            i += 1
+        order = np.array(order, dtype=np.int32)
+        remap = np.full(self.size, -1, dtype=np.int32)
+        remap[order] = np.arange(len(order), dtype=np.int32)
+
+        for name in ('prior', 'visits', 'value_sum', 'num_children', 'action', 'pending'):
+            arr = getattr(self, name)
+            arr[:len(order)] = arr[order]
+        first = self.first_child[order]
+        self.first_child[:len(order)] = np.where(first == -1, -1, remap[np.maximum(first, 0)])
+        parent = self.parent[order]
+        self.parent[:len(order)] = np.where(parent == -1, -1, remap[np.maximum(parent, 0)])
+        self.parent[0] = -1
+        self.pending[:len(order)] = False
+        self.size = len(order)
+
 
+def mcts_search(state, model, player, simulations=80, batch_size=8, tree=None):
+    """Run ``simulations`` PUCT simulations, evaluating up to ``batch_size`` leaves per forward pass.
+
+    Leaves in a batch are spread out with virtual loss: every node on a selected
+    path is charged one visit and ``VIRTUAL_LOSS`` value until its real value is
+    backed up. Pass the same ``tree`` every turn to keep the subtree of the move
+    that was played.
+    """
+    tree = tree if tree is not None else MCTSTree()
+    tree.reuse(state, player)
+    done = 0
+    while done < simulations:
+        leaves = _collect(tree, state, player, min(batch_size, simulations - done))
+        _evaluate(tree, leaves, model, player)
+        done += len(leaves)
+    return tree.best_action()
+
+
+def mcts_search_threaded(state, model, player, simulations=80, batch_size=8, threads=2, tree=None):
+    """``mcts_search`` with several threads sharing one tree.
+
+    Selection, expansion and backup happen under a lock; the batched forward
+    pass runs outside it so one thread's network call overlaps another
+    thread's tree work (torch releases the GIL during inference). A thread
+    whose descents all end on leaves another thread is evaluating waits for
+    the next backup.
+    """
+    tree = tree if tree is not None else MCTSTree()
+    tree.reuse(state, player)
+    lock = threading.Condition()
+    counter = {'done': 0}
+
+    def worker():
+        while True:
+            with lock:
+                while True:
+                    remaining = simulations - counter['done']
+                    if remaining <= 0:
+                        return
+                    leaves = _collect(tree, state, player, min(batch_size, remaining))
+                    if leaves:
+                        break
+                    lock.wait()
+                counter['done'] += len(leaves)
+            priors, values = _forward(leaves, model, player)
+            with lock:
+                _backup(tree, leaves, priors, values, player)
+                lock.notify_all()
+
+    pool = [threading.Thread(target=worker, daemon=True) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return tree.best_action()
+
+
+def _select(tree, state, player):
+    node = 0
+    current_state = _copy_state(state, player)
+    path = [node]
+    first_child, action = tree.first_child, tree.action
+    while first_child[node] != -1:
+        node = tree.select_child(node)
+        apply_action(current_state, player, action.item(node))
+        path.append(node)
+    return np.array(path, dtype=np.int32), current_state
+
+
+def _collect(tree, state, player, count):
+    """Select up to ``count`` distinct leaves, charging virtual loss along each path.
+
+    Stops early when selection lands on a leaf that is already pending, since
+    further descents would keep finding it. The result is empty only when
+    another thread's in-flight leaves block every descent; a pending leaf is
+    never queued twice, so each leaf is backed up once.
+    """
+    leaves = []
+    for _ in range(count):
+        path, leaf_state = _select(tree, state, player)
+        leaf = path[-1]
+        if tree.pending[leaf]:
+            break
+        tree.pending[leaf] = True
+        tree.visits[path] += 1
+        tree.value_sum[path] -= VIRTUAL_LOSS
+        leaves.append((path, leaf_state))
+    return leaves
+
+
+def _forward(leaves, model, player):
+    obs = torch.stack([state_to_tensor(s, player) for _, s in leaves])
+    with torch.no_grad():
+        policy_logits, value = model(obs)
+    priors = torch.softmax(policy_logits, dim=-1).cpu().numpy()
+    values = value.reshape(-1).cpu().numpy()
+    return priors, values
+
+
+def _backup(tree, leaves, priors, values, player):
+    for (path, leaf_state), policy, value in zip(leaves, priors, values):
+        leaf = path[-1]
         # Only expand valid actions
-        for a in range(8):
-            if is_valid_action(current_state, player, a):
-                node.children[a] = MCTSNode(prior=policy[a])
+        actions = [a for a in range(8) if is_valid_action(leaf_state, player, a)]
+        tree.expand(leaf, actions, policy[actions])
+        tree.pending[leaf] = False
+        # visits were already charged by the virtual loss.
+        tree.value_sum[path] += VIRTUAL_LOSS + float(value)
+
+
+def _evaluate(tree, leaves, model, player):
+    priors, values = _forward(leaves, model, player)
+    _backup(tree, leaves, priors, values, player)
+
+
+def _copy_state(state, player):
+    current_state = dict(state)
+    key = f'agent{player}_trail'
+    current_state[key] = [tuple(c) for c in state[key]]
+    return current_state
+
 
-        # Backpropagation
-        for n in reversed(path):
-            n.visit_count += 1
-            n.total_value += value
+def apply_action(state, player, action):
+    """Advance ``player``'s trail in a state dict (one cell, two when boosting)."""
+    trail = state[f'agent{player}_trail']
+    dx, dy = DELTAS[action % 4]
+    steps = 1
+    if action >= 4 and state[f'agent{player}_boosts'] > 0:
+        state[f'agent{player}_boosts'] -= 1
+        steps = 2
+    for _ in range(steps):
+        x, y = trail[-1]
+        trail.append(((x + dx) % WIDTH, (y + dy) % HEIGHT))
+    state['turn_count'] = state.get('turn_count', 0) + 1
 
-    if not root.children:
-        return 3  # RIGHT fallback
-    return max(root.children, key=lambda a: root.children[a].visit_count)
 
 def is_valid_action(state, player, action):
     # Simplified: don't go opposite + boost check
@@ -60,13 +296,12 @@ def is_valid_action(state, player, action):
         return True
     prev = my_trail[-2]
     head = my_trail[-1]
-    dx = head[0] - prev[0]
-    dy = head[1] - prev[1]
+    dx = (head[0] - prev[0] + 1) % WIDTH - 1  # undo torus wrap
+    dy = (head[1] - prev[1] + 1) % HEIGHT - 1
     opposites = {(1,0): (-1,0), (-1,0): (1,0), (0,1): (0,-1), (0,-1): (0,1)}
-    new_dx = (1, 0, -1, 0)[action % 4]
-    new_dy = (0, 1, 0, -1)[action % 4]
+    new_dx, new_dy = DELTAS[action % 4]
     if (new_dx, new_dy) == opposites.get((dx, dy), None):
         return False
     if action >= 4 and state[f'agent{player}_boosts'] == 0:
         return False
-    return True
\ No newline at end of file
+    return True
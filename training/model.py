@@ -21,4 +21,43 @@ class TronTransformer(nn.Module):
         x = self.conv(observations)
         x = self.flatten(x)
         x = x.view(x.size(0), -1)
-        return x
\ No newline at end of file
+        return x
+
+class TronPolicyNet(nn.Module):
+    """TronTransformer plus the PPO action/value heads as one inference module.
+
+    Mirrors ``CnnPolicy`` with ``net_arch=[]`` (see train_interactive.py), so a
+    saved ``model.policy.state_dict()`` loads directly and ``forward`` returns
+    ``(policy_logits, value)`` like mcts_search expects.
+    """
+
+    OBS_SHAPE = (10, 18, 20)
+
+    def __init__(self, features_dim: int = 128, n_actions: int = 8):
+        super().__init__()
+        self.features_extractor = TronTransformer(spaces.Box(0, 1, shape=self.OBS_SHAPE), features_dim)
+        self.action_net = nn.Linear(features_dim, n_actions)
+        self.value_net = nn.Linear(features_dim, 1)
+
+    def forward(self, observations: torch.Tensor):
+        features = self.features_extractor(observations)
+        return self.action_net(features), self.value_net(features)
+
+    @classmethod
+    def from_state_dict(cls, state_dict, features_dim: int = 128, n_actions: int = 8, random_heads: bool = False):
+        """Build from a PPO policy state_dict (heads included).
+
+        A bare TronTransformer state_dict has no action/value heads; it is
+        rejected unless ``random_heads`` is set (e.g. to train the heads from
+        a pretrained extractor), since the result would be a random policy.
+        """
+        net = cls(features_dim, n_actions)
+        if any(k.startswith("features_extractor.") for k in state_dict):
+            keep = ("features_extractor.", "action_net.", "value_net.")
+            net.load_state_dict({k: v for k, v in state_dict.items() if k.startswith(keep)})
+        elif random_heads:
+            net.features_extractor.load_state_dict(state_dict)
+        else:
+            raise ValueError("state_dict has no action_net/value_net weights (bare feature extractor); "
+                             "pass random_heads=True to load it with untrained heads")
+        return net
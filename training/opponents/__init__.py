@@ -0,0 +1,38 @@
+# training/opponents/__init__.py
+"""In-process opponents for training environments and the tournament runner.
+
+Every opponent is ``opponent(game, player) -> (Direction, boost)`` and has
+``act_batch(vec_game, player, rows) -> (dirs, boosts)`` for ``VecGame``; see
+``training.opponents.base``. Build one by name with ``make_opponent``:
+
+    random_safe         uniformly random safe move
+    wall_hugger         safe move touching the most occupied cells
+    flood_fill          safe move with the largest reachable area
+    a1k0n               one ply of Voronoi territory with chamber-tree scoring
+    policy:<path>       argmax of a frozen policy (.onnx/.ts export or .pt checkpoint)
+"""
+from training.opponents.a1k0n import ChamberOpponent
+from training.opponents.base import Opponent, Position, game_position, vec_positions, vec_safe_mask
+from training.opponents.heuristics import FloodFill, RandomSafe, WallHugger
+from training.opponents.policy import PolicyOpponent
+
+OPPONENTS = {
+    RandomSafe.name: RandomSafe,
+    WallHugger.name: WallHugger,
+    FloodFill.name: FloodFill,
+    ChamberOpponent.name: ChamberOpponent,
+    PolicyOpponent.name: PolicyOpponent,
+}
+
+
+def make_opponent(spec, seed=None):
+    """Opponent for ``name`` or ``name:arg`` (the policy path for ``policy``)."""
+    name, _, arg = spec.partition(":")
+    if name not in OPPONENTS:
+        raise ValueError(f"Unknown opponent {spec!r}; choose from {', '.join(OPPONENTS)}")
+    if name == PolicyOpponent.name:
+        if not arg:
+            raise ValueError("policy opponent needs a model path: policy:<path>")
+        return PolicyOpponent(arg, seed=seed)
+    return OPPONENTS[name](seed=seed)
+
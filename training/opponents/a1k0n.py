@@ -0,0 +1,39 @@
+# training/opponents/a1k0n.py
+"""a1k0n-style opponent: one ply scored with Voronoi territory and the tree of chambers.
+
+After each safe move the board is split between the two heads
+(``game.voronoi.VoronoiEvaluator``); each side's share is then reduced to
+what it can actually collect, since passing an articulation point commits a
+player to one branch of the chamber tree. The move maximising our chamber
+space minus theirs is played. A move that leaves the heads separated has
+its difference weighted by ``SEPARATED_WEIGHT``: sealed-off space is certain,
+contested space is not. Once they are separated, their region is the same
+whichever move we make, so only our own space decides between moves and the
+bot fills its region instead of chasing.
+"""
+from game.voronoi import VoronoiEvaluator
+from training.opponents.base import Opponent
+
+SEPARATED_WEIGHT = 4  # a sealed-off region is worth more than contested territory
+
+
+class ChamberOpponent(Opponent):
+    name = "a1k0n"
+
+    def __init__(self, width=20, height=18, seed=None):
+        super().__init__(width, height, seed)
+        self.voronoi = VoronoiEvaluator(self.bits)
+
+    def choose(self, position):
+        best, best_score = position.direction, None
+        for direction, bit in self.safe_moves(position):
+            x, y = self.bits.coord(bit.bit_length() - 1)
+            territory = self.voronoi.evaluate(position.occupied | bit, (x, y), position.their_head)
+            if territory.separated:
+                score = SEPARATED_WEIGHT * (territory.my_space - territory.their_space)
+            else:
+                score = territory.my_space - territory.their_space
+            key = (score, direction == position.direction)
+            if best_score is None or key > best_score:
+                best, best_score = direction, key
+        return best, False
@@ -0,0 +1,159 @@
+# training/opponents/base.py
+"""Common interface of the in-process opponents.
+
+An opponent is called like a tournament player, ``opponent(game, player) ->
+(Direction, boost)``, and can also move many games of a ``VecGame`` at once
+with ``act_batch(vec, player, rows) -> (dirs, boosts)``. Both entry points
+reduce the position to a ``Position`` (a bitboard plus the two heads), so a
+heuristic only implements ``choose``; opponents that vectorize well override
+``act_batch`` with NumPy code instead of looping over ``choose``.
+
+Directions are indexes in ``training.env`` / ``game.vec_game`` order: UP,
+DOWN, LEFT, RIGHT. A move is "safe" if it does not reverse and lands on a
+free cell; with no safe move an opponent keeps going straight.
+"""
+import random
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from game.bitboard import BitBoard
+from game.case_closed_game import Game
+from game.vec_game import DIRECTIONS, DX, DY, OPPOSITE, VecGame
+
+Coord = Tuple[int, int]
+
+# Plain tuples: indexing NumPy arrays with Python ints is slow in the per-move path.
+_DELTAS = tuple(zip(DX.tolist(), DY.tolist()))
+_REVERSE = tuple(OPPOSITE.tolist())
+
+
+class Position(NamedTuple):
+    """One seat's view of a position; ``occupied`` is a ``BitBoard`` mask with both heads set.
+
+    ``mine`` is the part of ``occupied`` that is our own trail (head included).
+    """
+
+    occupied: int
+    mine: int
+    head: Coord
+    their_head: Coord
+    direction: int
+    their_direction: int
+    boosts: int
+    their_boosts: int
+    turn: int
+
+
+def _pack(cells: np.ndarray) -> int:
+    """``BitBoard`` mask of a flat, row-major array of cell states (nonzero = occupied)."""
+    return int.from_bytes(np.packbits(cells != 0, bitorder="little").tobytes(), "little")
+
+
+def _unpack(mask: int, height: int, width: int) -> np.ndarray:
+    """``(height, width)`` bool grid of a ``BitBoard`` mask; the inverse of ``_pack``."""
+    size = height * width
+    raw = np.frombuffer(mask.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder="little")[:size].reshape(height, width).astype(bool)
+
+
+def game_position(game: Game, player: int) -> Position:
+    me, them = (game.agent1, game.agent2) if player == 1 else (game.agent2, game.agent1)
+    owners = np.array([owner == player for owner in game.board.owners])
+    return Position(
+        occupied=_pack(np.frombuffer(game.board.cells, dtype=np.uint8)),
+        mine=_pack(owners),
+        head=me.trail[-1],
+        their_head=them.trail[-1],
+        direction=DIRECTIONS.index(me.direction),
+        their_direction=DIRECTIONS.index(them.direction),
+        boosts=me.boosts_remaining,
+        their_boosts=them.boosts_remaining,
+        turn=game.turns,
+    )
+
+
+def vec_positions(vec: VecGame, player: int, rows: np.ndarray) -> List[Position]:
+    me, them = player - 1, 2 - player
+    grid = vec.grid[rows].reshape(len(rows), -1)
+    packed = np.packbits(grid != 0, axis=1, bitorder="little")
+    ours = np.packbits(grid == player, axis=1, bitorder="little")
+    return [
+        Position(
+            occupied=int.from_bytes(packed[i].tobytes(), "little"),
+            mine=int.from_bytes(ours[i].tobytes(), "little"),
+            head=(int(vec.head_x[row, me]), int(vec.head_y[row, me])),
+            their_head=(int(vec.head_x[row, them]), int(vec.head_y[row, them])),
+            direction=int(vec.direction[row, me]),
+            their_direction=int(vec.direction[row, them]),
+            boosts=int(vec.boosts[row, me]),
+            their_boosts=int(vec.boosts[row, them]),
+            turn=int(vec.turns[row]),
+        )
+        for i, row in enumerate(rows)
+    ]
+
+
+def vec_safe_mask(vec: VecGame, player: int, rows: np.ndarray) -> np.ndarray:
+    """``(len(rows), 4)`` bool: which directions are safe for ``player`` in each game."""
+    agent = player - 1
+    nx = (vec.head_x[rows, agent][:, None] + DX[None, :]) % vec.width
+    ny = (vec.head_y[rows, agent][:, None] + DY[None, :]) % vec.height
+    free = vec.grid[rows[:, None], ny, nx] == 0
+    return free & (np.arange(4)[None, :] != OPPOSITE[vec.direction[rows, agent]][:, None])
+
+
+class Opponent:
+    """Base class: subclasses implement ``choose`` and optionally a vectorized ``act_batch``."""
+
+    name = "opponent"
+
+    def __init__(self, width: int = 20, height: int = 18, seed: Optional[int] = None) -> None:
+        self.bits = BitBoard(width, height)
+        self.seed = seed
+        self.reset()
+
+    def reset(self) -> None:
+        """Reseed for a new game, as a freshly built opponent would be."""
+        seed = self.seed
+        if seed is None:
+            # Follow the global RNG, so a seeded tournament game stays reproducible.
+            seed = random.getrandbits(32)
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+
+    def __call__(self, game: Game, player: int):
+        direction, boost = self.choose(game_position(game, player))
+        return DIRECTIONS[direction], boost
+
+    def choose(self, position: Position) -> Tuple[int, bool]:
+        raise NotImplementedError
+
+    def act_batch(self, vec: VecGame, player: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Moves of ``player`` in games ``rows`` (default: every unfinished game) as ``(dirs, boosts)``.
+
+        The arrays have length ``vec.n``; games outside ``rows`` keep their direction.
+        """
+        rows = np.flatnonzero(~vec.done) if rows is None else np.asarray(rows)
+        dirs, boosts = self._defaults(vec, player)
+        for row, position in zip(rows, vec_positions(vec, player, rows)):
+            dirs[row], boosts[row] = self.choose(position)
+        return dirs, boosts
+
+    @staticmethod
+    def _defaults(vec: VecGame, player: int) -> Tuple[np.ndarray, np.ndarray]:
+        return vec.direction[:, player - 1].copy(), np.zeros(vec.n, dtype=bool)
+
+    def safe_moves(self, position: Position) -> List[Tuple[int, int]]:
+        """``(direction, target bit)`` of every safe move."""
+        bits = self.bits
+        x, y = position.head
+        reverse = _REVERSE[position.direction]
+        moves = []
+        for direction, (dx, dy) in enumerate(_DELTAS):
+            if direction == reverse:
+                continue
+            bit = bits.bit(x + dx, y + dy)
+            if not position.occupied & bit:
+                moves.append((direction, bit))
+        return moves
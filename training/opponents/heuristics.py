@@ -0,0 +1,92 @@
+# training/opponents/heuristics.py
+"""Cheap rule-based opponents: random-safe, wall-hugger and greedy flood fill.
+
+The first two only look at the four neighbours of the head, so their batched
+versions are a handful of NumPy gathers over a whole ``VecGame``. The flood
+fill runs one bit-parallel ``BitBoard.flood`` per candidate move.
+"""
+import numpy as np
+
+from game.vec_game import DX, DY
+from training.opponents.base import Opponent, vec_safe_mask
+
+
+class RandomSafe(Opponent):
+    """Uniformly random among the safe moves."""
+
+    name = "random_safe"
+
+    def choose(self, position):
+        moves = self.safe_moves(position)
+        if not moves:
+            return position.direction, False
+        return self.rng.choice(moves)[0], False
+
+    def act_batch(self, vec, player, rows=None):
+        rows = np.flatnonzero(~vec.done) if rows is None else np.asarray(rows)
+        dirs, boosts = self._defaults(vec, player)
+        safe = vec_safe_mask(vec, player, rows)
+        # Random keys on the safe moves; rows without one keep going straight.
+        keys = np.where(safe, self.np_rng.random(safe.shape), -1.0)
+        choice = keys.argmax(axis=1)
+        has_move = safe.any(axis=1)
+        dirs[rows[has_move]] = choice[has_move]
+        return dirs, boosts
+
+
+class WallHugger(Opponent):
+    """Takes the safe move whose target cell touches the most occupied cells.
+
+    Ties keep the current direction, then follow UP, DOWN, LEFT, RIGHT. Hugging
+    trails packs its own body tightly and leaves few holes behind.
+    """
+
+    name = "wall_hugger"
+
+    def choose(self, position):
+        bits = self.bits
+        best, best_key = position.direction, None
+        for direction, bit in self.safe_moves(position):
+            walls = (bits.neighbors(bit) & position.occupied).bit_count()
+            key = (walls, direction == position.direction)
+            if best_key is None or key > best_key:
+                best, best_key = direction, key
+        return best, False
+
+    def act_batch(self, vec, player, rows=None):
+        rows = np.flatnonzero(~vec.done) if rows is None else np.asarray(rows)
+        dirs, boosts = self._defaults(vec, player)
+        agent = player - 1
+        safe = vec_safe_mask(vec, player, rows)
+        tx = (vec.head_x[rows, agent][:, None] + DX[None, :]) % vec.width
+        ty = (vec.head_y[rows, agent][:, None] + DY[None, :]) % vec.height
+        walls = np.zeros(safe.shape, dtype=np.int64)
+        occupied = vec.grid[rows] != 0
+        local = np.arange(len(rows))[:, None]
+        for dx, dy in zip(DX, DY):
+            walls += occupied[local, (ty + dy) % vec.height, (tx + dx) % vec.width]
+        straight = np.arange(4)[None, :] == vec.direction[rows, agent][:, None]
+        # Same order as ``choose``: walls, then straight, then the lower index.
+        score = np.where(safe, walls * 8 + straight * 4 + (3 - np.arange(4))[None, :], -1)
+        has_move = safe.any(axis=1)
+        dirs[rows[has_move]] = score.argmax(axis=1)[has_move]
+        return dirs, boosts
+
+
+class FloodFill(Opponent):
+    """Takes the safe move with the most reachable free cells, hugging walls on ties."""
+
+    name = "flood_fill"
+
+    def choose(self, position):
+        bits = self.bits
+        free = bits.full & ~position.occupied
+        best, best_key = position.direction, None
+        for direction, bit in self.safe_moves(position):
+            space = bits.flood_count(bit, free & ~bit)
+            walls = (bits.neighbors(bit) & position.occupied).bit_count()
+            key = (space, walls, direction == position.direction)
+            if best_key is None or key > best_key:
+                best, best_key = direction, key
+        return best, False
+
@@ -0,0 +1,88 @@
+# training/opponents/policy.py
+"""Frozen-policy opponent: the argmax legal action of a saved policy network.
+
+``path`` is an exported model (``.onnx`` / ``.ts``, loaded through
+``game.policy.PolicyRuntime``) or a training checkpoint (``.pt`` state dict
+for ``training.model.TronPolicyNet``). Observations are the usual
+``(10, 18, 20)`` planes: ``choose`` builds them from a ``Position`` (our
+trail is ``mine``, the rest of ``occupied`` is theirs), ``act_batch`` for all
+games straight from the ``VecGame`` arrays with one forward pass per call.
+"""
+import numpy as np
+
+from game.policy import OBS_SHAPE, PolicyRuntime, encode_board
+from training.opponents.base import Opponent, _unpack, vec_safe_mask
+
+
+def _checkpoint_predictor(path):
+    import torch
+
+    from training.model import TronPolicyNet
+
+    model = TronPolicyNet.from_state_dict(torch.load(path, map_location="cpu"))
+    model.eval()
+
+    def predict(obs):
+        with torch.inference_mode():
+            logits, values = model(torch.from_numpy(obs))
+        return logits.numpy(), values.numpy().reshape(-1)
+
+    return predict
+
+
+class PolicyOpponent(Opponent):
+    name = "policy"
+
+    def __init__(self, path, width=20, height=18, seed=None):
+        super().__init__(width, height, seed)
+        if path.endswith((".onnx", ".ts")):
+            runtime = PolicyRuntime.load(path, warmup=2)
+            if runtime is None:
+                raise ValueError(f"policy opponent: cannot load {path!r}")
+            self.predict = runtime.predict
+        else:
+            self.predict = _checkpoint_predictor(path)
+
+    def choose(self, position):
+        bits = self.bits
+        mine = _unpack(position.mine, bits.height, bits.width)
+        theirs = _unpack(position.occupied & ~position.mine, bits.height, bits.width)
+        owners = mine.astype(np.int8) + 2 * theirs.astype(np.int8)
+        obs = encode_board(owners, 1, position.head, position.their_head, position.boosts, position.turn)
+        safe = np.zeros((1, 4), dtype=bool)
+        for direction, _ in self.safe_moves(position):
+            safe[0, direction] = True
+        logits, _ = self.predict(obs)
+        action = int(self._pick(logits, safe, np.array([position.boosts]), np.array([position.direction]))[0])
+        return action % 4, action >= 4
+
+    def act_batch(self, vec, player, rows=None):
+        rows = np.flatnonzero(~vec.done) if rows is None else np.asarray(rows)
+        dirs, boosts = self._defaults(vec, player)
+        if not len(rows):
+            return dirs, boosts
+        me, them = player - 1, 2 - player
+        grid = vec.grid[rows]
+        obs = np.zeros((len(rows),) + OBS_SHAPE, dtype=np.float32)
+        obs[:, 0] = grid == player
+        obs[:, 1] = grid == 3 - player
+        local = np.arange(len(rows))
+        obs[local, 2, vec.head_y[rows, me], vec.head_x[rows, me]] = 1.0
+        obs[local, 3, vec.head_y[rows, them], vec.head_x[rows, them]] = 1.0
+        obs[:, 8] = (vec.boosts[rows, me] / 3.0)[:, None, None]
+        obs[:, 9] = np.minimum(vec.turns[rows] / 200.0, 1.0)[:, None, None]
+        logits, _ = self.predict(obs)
+        actions = self._pick(logits, vec_safe_mask(vec, player, rows), vec.boosts[rows, me], vec.direction[rows, me])
+        dirs[rows] = actions % 4
+        boosts[rows] = actions >= 4
+        return dirs, boosts
+
+    @staticmethod
+    def _pick(logits, safe, boosts_left, direction):
+        """Argmax over the legal actions: safe directions, boosted only with boosts left."""
+        legal = np.concatenate([safe, safe & (boosts_left > 0)[:, None]], axis=1)
+        # No safe move: the network may still pick, but never a reversal.
+        stuck = ~safe.any(axis=1)
+        if stuck.any():
+            legal[stuck, direction[stuck]] = True
+        return np.where(legal, logits, -np.inf).argmax(axis=1)
@@ -1,19 +1,72 @@
 # training/phase_detector.py
-import networkx as nx
+"""Survival-phase detection on state dicts (``board`` grid plus both trails).
+
+Keep one ``PhaseDetector`` per env or game: the first state of a game labels
+the board once, and later states only occupy the cells their trails gained,
+so each query is an O(1) ``RegionTracker`` lookup. A detector is not shared
+between threads. The module-level functions share one detector behind a
+lock, so successive states of a single game stay incremental there too.
+"""
+import threading
+
+from game.bitboard import BitBoard
+from game.regions import RegionTracker
+
+
+class PhaseDetector:
+    """Region labels of one game, updated from the trail cells added since the last state."""
+
+    def __init__(self, width=20, height=18):
+        self.bits = BitBoard(width, height)
+        self.tracker = RegionTracker(self.bits)
+        # Trail cells already occupied, and each trail's first cell to spot a new game.
+        self._seen = {1: 0, 2: 0}
+        self._starts = {1: None, 2: None}
+
+    def update(self, state):
+        trails = {idx: state[f'agent{idx}_trail'] for idx in (1, 2)}
+        fresh = any(
+            len(trail) < self._seen[idx] or (trail and tuple(trail[0]) != self._starts[idx])
+            for idx, trail in trails.items()
+        )
+        if fresh:
+            self.tracker.reset(self.bits.from_grid(state['board']))
+        else:
+            for idx, trail in trails.items():
+                for x, y in trail[self._seen[idx]:]:
+                    self.tracker.occupy(self.bits.index(x, y))
+        for idx, trail in trails.items():
+            self._seen[idx] = len(trail)
+            self._starts[idx] = tuple(trail[0]) if trail else None
+
+    def heads(self, state, player):
+        my_head = state['agent1_trail'][-1] if player == 1 else state['agent2_trail'][-1]
+        opp_head = state['agent2_trail'][-1] if player == 1 else state['agent1_trail'][-1]
+        return self.bits.index(*my_head), self.bits.index(*opp_head)
+
+    def is_separated(self, state, player):
+        """Return True if agents are in separate regions (survival phase)"""
+        self.update(state)
+        return self.tracker.separated(*self.heads(state, player))
+
+    def region_sizes(self, state, player):
+        """Cells reachable by us and by the opponent (each counting its own head)."""
+        self.update(state)
+        mine, theirs = self.heads(state, player)
+        return self.tracker.reachable(mine), self.tracker.reachable(theirs)
+
+
+_detector = PhaseDetector()
+_detector_lock = threading.Lock()
+
 
 def is_separated(state, player):
     """Return True if agents are in separate regions (survival phase)"""
-    G = nx.grid_2d_graph(20, 18, periodic=True)
-    # Remove all walls/trails
-    for y in range(18):
-        for x in range(20):
-            if state['board'][y][x] != 0:
-                G.remove_node((x, y))
-    
-    my_head = state['agent1_trail'][-1] if player == 1 else state['agent2_trail'][-1]
-    opp_head = state['agent2_trail'][-1] if player == 1 else state['agent1_trail'][-1]
-    
-    try:
-        return not nx.has_path(G, my_head, opp_head)
-    except:
-        return True  # Graph disconnected
\ No newline at end of file
+    with _detector_lock:
+        return _detector.is_separated(state, player)
+
+
+def region_sizes(state, player):
+    """Cells reachable by us and by the opponent (each counting its own head)."""
+    with _detector_lock:
+        return _detector.region_sizes(state, player)
@@ -0,0 +1,299 @@
+# training/selfplay.py
+"""Generate an offline training set by self-play and games against an opponent pool.
+
+Every game is played by the current agent (``search``: ``agent.Tron`` with a
+per-move budget, or ``mcts``: ``training.mcts.mcts_search`` guided by a
+policy checkpoint) either against itself or against an opponent drawn from
+``--opponents`` (any ``eval.tournament`` agent spec). For each move the
+current agent makes, the encoded observation and its policy target (the
+MCTS root visit distribution, or the searched action one-hot) are kept; once
+the game ends they are written with the final outcome from that seat as the
+value target (+1 win, 0 draw, -1 loss) to the shards of ``training.dataset``.
+Games are spread over worker processes, each writing its own shards.
+
+    python -m training.selfplay --out data/selfplay --games 2000 --workers 4 --agent search --budget-ms 50
+    python -m training.selfplay --out data/selfplay --agent mcts --checkpoint models/interactive_final.pt \\
+        --opponents greedy right_turn --self-play 0.5
+
+Read the result with ``training.dataset.make_loader("data/selfplay")``.
+"""
+import argparse
+import multiprocessing.util
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eval.tournament import build_player, encode_state, parse_spec  # noqa: E402
+from game.case_closed_game import Direction, Game, GameResult  # noqa: E402
+from game.replay import ReplayRecorder, ReplayWriter  # noqa: E402
+from training.dataset import N_ACTIONS, OBS_DTYPE, ShardWriter  # noqa: E402
+from training.env import DIR_MAP  # noqa: E402
+from training.utils import ObservationEncoder  # noqa: E402
+
+class SelfPlayConfig(NamedTuple):
+    out: str
+    agent: str  # "search" or "mcts"
+    budget_ms: float
+    checkpoint: Optional[str]
+    simulations: int
+    opponents: Tuple[Tuple[str, str], ...]  # (label, spec)
+    self_play: float  # fraction of games against itself
+    explore_turns: int
+    epsilon: float
+    shard_size: int
+    replays: Optional[str]
+
+
+class SearchPlayer:
+    """``agent.Tron`` search; the policy target is the chosen action, one-hot."""
+
+    def __init__(self, budget_ms):
+        from agent import Tron, shared_eval_cache
+
+        self.trons = {seat: Tron(search_budget_ms=budget_ms, eval_cache=shared_eval_cache()) for seat in (1, 2)}
+
+    def new_game(self):
+        for tron in self.trons.values():
+            tron.reset()
+
+    def __call__(self, game, seat):
+        tron = self.trons[seat]
+        tron.update_state(encode_state(game, seat))
+        move, boost = tron.decide()
+        target = np.zeros(N_ACTIONS, dtype=np.float32)
+        target[action_index(Direction[move], boost)] = 1.0
+        return target
+
+
+class MCTSPlayer:
+    """``mcts_search`` with a policy/value network; the target is the root visit distribution."""
+
+    def __init__(self, checkpoint, simulations):
+        import torch
+
+        from training.mcts import MCTSTree
+        from training.model import TronPolicyNet
+
+        torch.set_num_threads(1)
+        self.model = TronPolicyNet.from_state_dict(torch.load(checkpoint, map_location="cpu"))
+        self.model.eval()
+        self.simulations = simulations
+        self.trees = {seat: MCTSTree() for seat in (1, 2)}
+
+    def new_game(self):
+        for tree in self.trees.values():
+            tree.clear()
+
+    def __call__(self, game, seat):
+        from training.mcts import mcts_search
+
+        tree = self.trees[seat]
+        state = encode_state(game, seat)
+        mcts_search(state, self.model, seat, simulations=self.simulations, tree=tree)
+        target = np.zeros(N_ACTIONS, dtype=np.float32)
+        children = tree.root_children()
+        target[tree.action[children]] = tree.visits[children]
+        total = target.sum()
+        if total > 0:
+            target /= total
+        else:
+            target[action_index(game_agent(game, seat).direction, False)] = 1.0
+        return target
+
+
+def action_index(direction, boost):
+    """Index into the 8-way action space of ``training.env`` (UP, DOWN, LEFT, RIGHT, then boosted)."""
+    return [DIR_MAP[i] for i in range(4)].index(direction) + (4 if boost else 0)
+
+
+def game_agent(game, seat):
+    return game.agent1 if seat == 1 else game.agent2
+
+
+def safe_actions(game, seat):
+    agent = game_agent(game, seat)
+    x, y = agent.trail[-1]
+    reverse = (-agent.direction.value[0], -agent.direction.value[1])
+    actions = []
+    for action in range(4):
+        dx, dy = DIR_MAP[action].value
+        if (dx, dy) != reverse and game.board.get_cell_state((x + dx, y + dy)) == 0:
+            actions.append(action)
+    return actions
+
+
+_config: Optional[SelfPlayConfig] = None
+_agent = None
+_opponents = {}
+_writer: Optional[ShardWriter] = None
+_replays: Optional[ReplayWriter] = None
+
+
+def _init_worker(config):
+    global _config, _agent, _writer, _replays
+    _config = config
+    if config.agent == "mcts":
+        _agent = MCTSPlayer(config.checkpoint, config.simulations)
+    else:
+        _agent = SearchPlayer(config.budget_ms)
+    _writer = ShardWriter(config.out, shard_size=config.shard_size)
+    _replays = ReplayWriter(config.replays) if config.replays else None
+    # Pool workers end without running atexit hooks; multiprocessing finalizers do run.
+    multiprocessing.util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    global _writer, _replays
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+    if _replays is not None:
+        _replays.close()
+        _replays = None
+
+
+def _opponent(spec):
+    player = _opponents.get(spec)
+    if player is None:
+        player = _opponents[spec] = build_player(spec)
+    return player
+
+
+def play_game(game_id, seed):
+    """Play one game in this worker and write its samples; returns ``(samples, result name, turns)``."""
+    config = _config
+    rng = random.Random(seed)
+    random.seed(seed)
+    np.random.seed(seed % (2 ** 32))
+
+    if not config.opponents or rng.random() < config.self_play:
+        opponent, recorded = None, (1, 2)
+        labels = (config.agent, config.agent)
+    else:
+        label, spec = rng.choice(config.opponents)
+        opponent = _opponent(spec)
+        recorded = (rng.choice((1, 2)),)
+        labels = (config.agent, label) if recorded[0] == 1 else (label, config.agent)
+
+    recorder = ReplayRecorder(_replays, labels, tag=game_id) if _replays is not None else None
+    game = Game(recorder=recorder)
+    _agent.new_game()
+    encoders = {seat: ObservationEncoder(player=seat) for seat in recorded}
+    samples = {seat: ([], []) for seat in recorded}
+    result = None
+    while result is None:
+        moves = {}
+        for seat in (1, 2):
+            if seat not in recorded:
+                moves[seat] = opponent(game, seat)
+                continue
+            obs = encoders[seat].update(game).astype(OBS_DTYPE)
+            target = _agent(game, seat)
+            samples[seat][0].append(obs)
+            samples[seat][1].append(target)
+            action = int(target.argmax())
+            if game.turns < config.explore_turns:
+                # Vary the openings: sample from the target, or now and then any safe move.
+                safe = safe_actions(game, seat)
+                if safe and rng.random() < config.epsilon:
+                    action = rng.choice(safe)
+                else:
+                    action = rng.choices(range(N_ACTIONS), weights=target)[0]
+            moves[seat] = (DIR_MAP[action % 4], action >= 4)
+        (d1, b1), (d2, b2) = moves[1], moves[2]
+        result = game.step(d1, d2, boost1=b1, boost2=b2)
+
+    obs, policy, value = [], [], []
+    for seat, (seat_obs, seat_policy) in samples.items():
+        won = GameResult.AGENT1_WIN if seat == 1 else GameResult.AGENT2_WIN
+        outcome = 0.0 if result == GameResult.DRAW else (1.0 if result == won else -1.0)
+        obs += seat_obs
+        policy += seat_policy
+        value += [outcome] * len(seat_obs)
+    _writer.extend(np.stack(obs), np.stack(policy), np.array(value, dtype=np.float32))
+    return len(obs), result.name, game.turns
+
+
+def play_games(task):
+    """Worker entry point: play ``(game_id, seed)`` pairs and publish the samples."""
+    games = [play_game(game_id, seed) for game_id, seed in task]
+    _writer.flush()
+    if _replays is not None:
+        _replays.flush()
+    return games
+
+
+def generate(config, games, workers, seed=0, chunk=4):
+    """Play ``games`` games over ``workers`` processes, yielding per-game ``(samples, result, turns)``."""
+    seeds = [(i, (seed * 1_000_003 + i) & 0xFFFFFFFF) for i in range(games)]
+    tasks = [seeds[i:i + chunk] for i in range(0, len(seeds), chunk)]
+    if workers <= 1:
+        _init_worker(config)
+        try:
+            for task in tasks:
+                yield from play_games(task)
+        finally:
+            _close_worker()
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(config,)) as pool:
+        for results in pool.map(play_games, tasks):
+            yield from results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="data/selfplay", help="shard directory")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--agent", choices=("search", "mcts"), default="search")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="search budget per move (--agent search)")
+    parser.add_argument("--checkpoint", default="models/interactive_final.pt", help="policy for --agent mcts")
+    parser.add_argument("--simulations", type=int, default=80, help="MCTS simulations per move")
+    parser.add_argument("--opponents", nargs="*", default=[], metavar="SPEC",
+                        help="opponent pool (eval.tournament agent specs)")
+    parser.add_argument("--self-play", type=float, default=0.5,
+                        help="fraction of games against itself when an opponent pool is given")
+    parser.add_argument("--explore-turns", type=int, default=8,
+                        help="turns in which moves are sampled instead of taken greedily")
+    parser.add_argument("--epsilon", type=float, default=0.25, help="chance of a random safe move in explore turns")
+    parser.add_argument("--shard-size", type=int, default=4096, help="samples per shard")
+    parser.add_argument("--chunk", type=int, default=4, help="games per worker task")
+    parser.add_argument("--replays", default=None, metavar="DIR", help="also record the games as replays")
+    args = parser.parse_args()
+    if args.agent == "mcts" and not (os.path.isfile(args.checkpoint) and os.path.getsize(args.checkpoint)):
+        parser.error(f"--agent mcts needs a policy checkpoint; {args.checkpoint!r} is missing or empty")
+
+    config = SelfPlayConfig(
+        out=args.out,
+        agent=args.agent,
+        budget_ms=args.budget_ms,
+        checkpoint=args.checkpoint,
+        simulations=args.simulations,
+        opponents=tuple(parse_spec(spec) for spec in args.opponents),
+        self_play=args.self_play,
+        explore_turns=args.explore_turns,
+        epsilon=args.epsilon,
+        shard_size=args.shard_size,
+        replays=args.replays,
+    )
+    samples = 0
+    results = {}
+    t0 = time.perf_counter()
+    for done, (count, result, _) in enumerate(generate(config, args.games, args.workers, args.seed, args.chunk), 1):
+        samples += count
+        results[result] = results.get(result, 0) + 1
+        print(f"\r{done}/{args.games} games  {samples} samples", end="", flush=True)
+    elapsed = time.perf_counter() - t0
+    print(f"\r{args.games} games, {samples} samples in {elapsed:.1f}s ({samples / max(elapsed, 1e-9):.0f}/s)  {results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,15 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv
-from training.env import TronEnv
+from training.vec_env import make_vec_env
 from training.model import TronTransformer
 import torch as th
 
 if __name__ == "__main__":
-    env = DummyVecEnv([lambda: TronEnv()])
+    # One TronEnv worker process per core; set TRON_ENVS to override, TRON_DEBUG=1 for env prints,
+    # TRON_OPPONENT to a training.opponents spec (e.g. flood_fill) instead of the always-RIGHT bot.
+    env = make_vec_env(int(os.getenv("TRON_ENVS", 0)) or None, debug=os.getenv("TRON_DEBUG") == "1",
+                       opponent=os.getenv("TRON_OPPONENT") or None)
 
     policy_kwargs = dict(
         features_extractor_class=TronTransformer,
@@ -1,3 +1,161 @@
 # training/train_survival.py
-# Generates random boards, trains agent to survive longest
-# Run this first → survival_final.pt
\ No newline at end of file
+"""Survival-phase trainer: learn to fill an enclosed region on random boards.
+
+Run this first -> ``models/survival_final.pt``. Positions come from
+``training.boards.random_boards`` (batches of partitioned torus boards where
+our head has a single reachable region) and are labelled by the
+longest-path oracle in ``training.boards.label``. Generation and labelling
+run in ``--workers`` DataLoader processes, each streaming whole labelled
+batches, while the main process trains ``TronPolicyNet``: cross-entropy
+against the oracle's best first moves plus MSE on the value head (best path
+length as a fraction of the region). A fixed validation set reports how
+often the argmax move is one of the best and the mean path length given up
+(regret) compared to the oracle.
+
+    python training/train_survival.py --steps 20000 --workers 7 --threads 1
+    python training/train_survival.py --init models/survival_final.pt --steps 5000 --lr 3e-4
+
+The checkpoint is a ``TronPolicyNet`` state dict, so ``finalize_model.py
+--checkpoint models/survival_final.pt`` exports it like the PPO policy.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from game.bitboard import BitBoard  # noqa: E402
+from game.endgame import EndgameSolver  # noqa: E402
+from training.boards import label, observations, random_boards  # noqa: E402
+from training.model import TronPolicyNet  # noqa: E402
+
+
+class SurvivalStream(IterableDataset):
+    """Endless labelled batches; every DataLoader worker draws from its own seed."""
+
+    def __init__(self, batch_size, budget_ms, seed):
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.seed = seed
+
+    def __iter__(self):
+        info = get_worker_info()
+        worker = info.id if info is not None else 0
+        rng = np.random.default_rng([self.seed, worker])
+        solver = EndgameSolver(BitBoard())
+        while True:
+            boards = random_boards(rng, self.batch_size)
+            policy, value, _ = label(boards, self.budget_ms, solver)
+            yield torch.from_numpy(observations(boards)), torch.from_numpy(policy), torch.from_numpy(value)
+
+
+def losses(model, obs, policy, value):
+    logits, predicted = model(obs)
+    policy_loss = -(policy * F.log_softmax(logits, dim=-1)).sum(dim=-1).mean()
+    value_loss = F.mse_loss(predicted.reshape(-1), value)
+    return policy_loss, value_loss
+
+
+def validation_set(size, budget_ms, seed):
+    rng = np.random.default_rng([seed, 1 << 20])
+    boards = random_boards(rng, size)
+    policy, value, lengths = label(boards, budget_ms)
+    return torch.from_numpy(observations(boards)), torch.from_numpy(policy), torch.from_numpy(value), lengths
+
+
+def evaluate(model, val):
+    """``(policy loss, value loss, best-move accuracy, mean regret in cells)`` on the validation set."""
+    obs, policy, value, lengths = val
+    model.eval()
+    with torch.no_grad():
+        policy_loss, value_loss = losses(model, obs, policy, value)
+        logits, _ = model(obs)
+    model.train()
+    # Boosting spends two cells per turn, so it counts as its direction.
+    moves = (logits[:, :4].maximum(logits[:, 4:])).argmax(dim=-1).numpy()
+    chosen = lengths[np.arange(len(moves)), moves]
+    best = lengths.max(axis=1)
+    accuracy = float((policy.numpy()[np.arange(len(moves)), moves] > 0).mean())
+    return float(policy_loss), float(value_loss), accuracy, float((best - chosen).mean())
+
+
+def save(model, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    torch.save(model.state_dict(), path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the survival-phase policy on random enclosed boards.")
+    parser.add_argument("--out", default=os.path.join(ROOT, "models", "survival_final.pt"))
+    parser.add_argument("--init", default=None, help="checkpoint to continue from")
+    parser.add_argument("--steps", type=int, default=20_000)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--value-weight", type=float, default=1.0)
+    parser.add_argument("--budget-ms", type=float, default=10.0, help="oracle time per board")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) - 1),
+                        help="board generation processes")
+    parser.add_argument("--threads", type=int, default=1, help="torch threads for the training step")
+    parser.add_argument("--val-size", type=int, default=512)
+    parser.add_argument("--eval-every", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    torch.set_num_threads(args.threads)
+    if args.init and not (os.path.isfile(args.init) and os.path.getsize(args.init)):
+        parser.error(f"--init {args.init!r} is missing or empty")
+    if args.init:
+        # The heads are trained here, so a bare feature-extractor checkpoint is fine.
+        model = TronPolicyNet.from_state_dict(torch.load(args.init, map_location="cpu"), random_heads=True)
+    else:
+        model = TronPolicyNet()
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+    schedule = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=args.steps)
+
+    t0 = time.perf_counter()
+    val = validation_set(args.val_size, args.budget_ms, args.seed)
+    print(f"validation set: {args.val_size} boards in {time.perf_counter() - t0:.1f}s")
+    stream = SurvivalStream(args.batch_size, args.budget_ms, args.seed)
+    loader = DataLoader(stream, batch_size=None, num_workers=args.workers, prefetch_factor=4 if args.workers else None,
+                        persistent_workers=args.workers > 0)
+
+    model.train()
+    t0 = time.perf_counter()
+    waited = 0.0
+    running = []
+    batches = iter(loader)
+    for step in range(1, args.steps + 1):
+        fetch = time.perf_counter()
+        obs, policy, value = next(batches)
+        waited += time.perf_counter() - fetch
+        policy_loss, value_loss = losses(model, obs, policy, value)
+        loss = policy_loss + args.value_weight * value_loss
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        schedule.step()
+        running.append((policy_loss.item(), value_loss.item()))
+
+        if step % args.eval_every == 0 or step == args.steps:
+            elapsed = time.perf_counter() - t0
+            train_p, train_v = np.mean(running, axis=0)
+            running = []
+            val_p, val_v, accuracy, regret = evaluate(model, val)
+            print(f"step {step:6d}  train {train_p:.3f}/{train_v:.4f}  val {val_p:.3f}/{val_v:.4f}  "
+                  f"best-move {accuracy:.1%}  regret {regret:.2f} cells  "
+                  f"{step * args.batch_size / elapsed:.0f} boards/s  data wait {waited / elapsed:.0%}", flush=True)
+            save(model, args.out)
+    print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,132 @@
 import numpy as np
 import torch
 
-def state_to_tensor(state):
-    board = np.zeros((10, 18, 20), dtype=np.float32)
-    
-    my_trail = state['agent1_trail']
-    opp_trail = state['agent2_trail']
+OBS_SHAPE = (10, 18, 20)
+
+
+def state_to_tensor(state, player=1):
+    board = np.zeros(OBS_SHAPE, dtype=np.float32)
+
+    mine, theirs = (1, 2) if player == 1 else (2, 1)
+    my_trail = state[f'agent{mine}_trail']
+    opp_trail = state[f'agent{theirs}_trail']
     my_head = my_trail[-1]
     opp_head = opp_trail[-1]
 
-    for x, y in my_trail:
-        board[0, y, x] = 1.0
-    for x, y in opp_trail:
-        board[1, y, x] = 1.0
+    if len(my_trail):
+        xs, ys = zip(*my_trail)
+        board[0, ys, xs] = 1.0
+    if len(opp_trail):
+        xs, ys = zip(*opp_trail)
+        board[1, ys, xs] = 1.0
     board[2, my_head[1], my_head[0]] = 1.0
     board[3, opp_head[1], opp_head[0]] = 1.0
 
-    board[8, :, :] = state['agent1_boosts'] / 3.0
+    board[8, :, :] = state[f'agent{mine}_boosts'] / 3.0
     board[9, :, :] = min(state['turn_count'] / 200.0, 1.0)
-    
-    return torch.from_numpy(board)
\ No newline at end of file
+
+    return torch.from_numpy(board)
+
+
+class ObservationEncoder:
+    """Keeps one observation up to date from a live ``Game``.
+
+    Produces the same planes as ``state_to_tensor`` but only writes the trail
+    cells appended since the previous call, moves the two head markers, and
+    refills the constant boost/turn planes when their value changes. A new
+    game (fresh trail objects) or an undo (see ``update``) triggers a full
+    re-encode. Pass ``out`` to encode into a caller-owned ``(10, 18, 20)``
+    float32 array, e.g. one row of a batch.
+    """
+
+    def __init__(self, player=1, out=None):
+        self.player = player
+        self.obs = out if out is not None else np.zeros(OBS_SHAPE, dtype=np.float32)
+        self._trails = [None, None]
+        self._written = [0, 0]
+        self._heads = [None, None]
+        self._last = [None, None]
+        self._boosts = None
+        self._turn = None
+
+    def reset(self):
+        self.obs.fill(0.0)
+        self._trails = [None, None]
+        self._written = [0, 0]
+        self._heads = [None, None]
+        self._last = [None, None]
+        self._boosts = None
+        self._turn = None
+
+    def update(self, game):
+        """Encode ``game`` into ``self.obs`` and return it (not a copy).
+
+        A trail that shrank or whose last encoded cell changed (``Game.pop``
+        followed by different moves) is re-encoded from scratch; callers that
+        rewind and replay several turns should ``reset`` explicitly.
+        """
+        agents = (game.agent1, game.agent2) if self.player == 1 else (game.agent2, game.agent1)
+        obs = self.obs
+
+        for plane, agent in enumerate(agents):
+            trail = agent.trail
+            written = self._written[plane]
+            if (trail is not self._trails[plane] or len(trail) < written
+                    or (written and trail[written - 1] != self._last[plane])):
+                self.reset()
+                self._trails = [agents[0].trail, agents[1].trail]
+                break
+
+        for plane, agent in enumerate(agents):
+            trail = agent.trail
+            n = len(trail)
+            for i in range(self._written[plane] - n, 0):
+                x, y = trail[i]
+                obs[plane, y, x] = 1.0
+            self._written[plane] = n
+
+            head = trail[-1]
+            self._last[plane] = head
+            previous = self._heads[plane]
+            if head != previous:
+                if previous is not None:
+                    obs[plane + 2, previous[1], previous[0]] = 0.0
+                obs[plane + 2, head[1], head[0]] = 1.0
+                self._heads[plane] = head
+
+        boosts = agents[0].boosts_remaining
+        if boosts != self._boosts:
+            obs[8].fill(boosts / 3.0)
+            self._boosts = boosts
+        turn = game.turns
+        if turn != self._turn:
+            obs[9].fill(min(turn / 200.0, 1.0))
+            self._turn = turn
+        return obs
+
+
+class BatchObservationEncoder:
+    """One persistent ``ObservationEncoder`` per row of an ``(N, 10, 18, 20)`` array.
+
+    ``encode`` updates every row in place and returns a zero-copy
+    ``torch.from_numpy`` view, so env stepping, training and MCTS leaf
+    evaluation can share a single encoding path and buffer.
+    """
+
+    def __init__(self, n, players=1, out=None):
+        self.buffer = out if out is not None else np.zeros((n, *OBS_SHAPE), dtype=np.float32)
+        if isinstance(players, int):
+            players = [players] * n
+        self.encoders = [ObservationEncoder(p, out=self.buffer[i]) for i, p in enumerate(players)]
+        self.tensor = torch.from_numpy(self.buffer)
+
+    def encode(self, games, rows=None):
+        """Encode ``games`` into their rows (``rows`` defaults to 0..len(games)-1)."""
+        rows = range(len(games)) if rows is None else rows
+        for row, game in zip(rows, games):
+            self.encoders[row].update(game)
+        return self.tensor
+
+    def reset(self, rows=None):
+        for row in (range(len(self.encoders)) if rows is None else rows):
+            self.encoders[row].reset()
@@ -0,0 +1,183 @@
+# training/vec_env.py
+"""Multi-process VecEnv whose workers write observations into shared memory.
+
+Each worker owns one env and a slot of a preallocated ``(K, *obs_shape)``
+float32 buffer, so only rewards, dones and infos travel through the pipes.
+Finished episodes are reset inside the worker (auto-reset), with the final
+observation attached as ``info["terminal_observation"]`` like SB3 expects.
+Seeds and reset options go through the public ``seed`` / ``set_options``
+and are kept here, not in ``VecEnv`` private attributes.
+
+    python -m training.vec_env    # steps/sec for 1, 2, 4, ... workers
+"""
+import multiprocessing as mp
+import os
+import time
+from copy import deepcopy
+from multiprocessing import shared_memory
+
+import numpy as np
+from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+
+def _shm_worker(remote, parent_remote, env_fn_wrapper, shm_name, shape, index):
+    from stable_baselines3.common.env_util import is_wrapped
+
+    parent_remote.close()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    obs_buffer = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    env = env_fn_wrapper.var()
+    try:
+        while True:
+            try:
+                cmd, data = remote.recv()
+            except EOFError:
+                break
+            if cmd == "step":
+                obs, reward, terminated, truncated, info = env.step(data)
+                done = terminated or truncated
+                info["TimeLimit.truncated"] = truncated and not terminated
+                reset_info = {}
+                if done:
+                    info["terminal_observation"] = np.array(obs, dtype=np.float32)
+                    obs, reset_info = env.reset()
+                obs_buffer[index] = obs
+                remote.send((reward, done, info, reset_info))
+            elif cmd == "reset":
+                seed, options = data
+                maybe_options = {"options": options} if options else {}
+                obs, reset_info = env.reset(seed=seed, **maybe_options)
+                obs_buffer[index] = obs
+                remote.send(reset_info)
+            elif cmd == "close":
+                env.close()
+                remote.close()
+                break
+            elif cmd == "get_spaces":
+                remote.send((env.observation_space, env.action_space))
+            elif cmd == "env_method":
+                remote.send(getattr(env, data[0])(*data[1], **data[2]))
+            elif cmd == "get_attr":
+                remote.send(getattr(env, data))
+            elif cmd == "has_attr":
+                remote.send(hasattr(env, data))
+            elif cmd == "set_attr":
+                remote.send(setattr(env, data[0], data[1]))
+            elif cmd == "is_wrapped":
+                remote.send(is_wrapped(env, data))
+            elif cmd == "render":
+                remote.send(env.render())
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del obs_buffer
+        shm.close()
+
+
+class SharedMemoryVecEnv(SubprocVecEnv):
+    """Drop-in ``SubprocVecEnv`` that returns observations through shared memory."""
+
+    def __init__(self, env_fns, start_method=None):
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+
+        if start_method is None:
+            start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+
+        # Spaces come from a throwaway instance so the buffer can be sized up front.
+        probe = env_fns[0]()
+        observation_space, action_space = probe.observation_space, probe.action_space
+        probe.close()
+
+        self._shape = (n_envs, *observation_space.shape)
+        nbytes = int(np.prod(self._shape)) * np.dtype(np.float32).itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._obs = np.ndarray(self._shape, dtype=np.float32, buffer=self._shm.buf)
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_envs)])
+        self.processes = []
+        for index, (work_remote, remote, env_fn) in enumerate(zip(self.work_remotes, self.remotes, env_fns)):
+            args = (work_remote, remote, CloudpickleWrapper(env_fn), self._shm.name, self._shape, index)
+            process = ctx.Process(target=_shm_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        # Bypass SubprocVecEnv.__init__ (it would spawn its own workers).
+        super(SubprocVecEnv, self).__init__(n_envs, observation_space, action_space)
+        self._next_seeds = [None] * n_envs
+        self._next_options = [{} for _ in range(n_envs)]
+
+    def seed(self, seed=None):
+        """Seed env ``i`` with ``seed + i`` at the next ``reset``, like ``VecEnv.seed``."""
+        if seed is None:
+            seed = int(np.random.randint(0, np.iinfo(np.uint32).max, dtype=np.uint32))
+        self._next_seeds = [seed + i for i in range(self.num_envs)]
+        return list(self._next_seeds)
+
+    def set_options(self, options=None):
+        """Options for the next ``reset``: one dict for every env, or a list with one per env."""
+        if options is None:
+            options = {}
+        if isinstance(options, dict):
+            options = [options] * self.num_envs
+        self._next_options = deepcopy(list(options))
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        rewards, dones, infos, self.reset_infos = zip(*results)
+        return self._obs.copy(), np.array(rewards, dtype=np.float32), np.array(dones, dtype=bool), list(infos)
+
+    def reset(self):
+        for env_idx, remote in enumerate(self.remotes):
+            remote.send(("reset", (self._next_seeds[env_idx], self._next_options[env_idx])))
+        self.reset_infos = [remote.recv() for remote in self.remotes]
+        # Seeds and options only apply to the one reset, as in SB3.
+        self._next_seeds = [None] * self.num_envs
+        self._next_options = [{} for _ in range(self.num_envs)]
+        return self._obs.copy()
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        self._obs = None
+        self._shm.close()
+        self._shm.unlink()
+
+
+def make_tron_env(debug=False, opponent=None):
+    from training.env import TronEnv
+
+    return TronEnv(debug=debug, opponent=opponent)
+
+
+def make_vec_env(n_envs=None, debug=False, start_method=None, opponent=None):
+    """``n_envs`` TronEnv workers (default: one per CPU core); ``opponent`` is a training.opponents spec."""
+    n_envs = n_envs or os.cpu_count() or 1
+    return SharedMemoryVecEnv([lambda: make_tron_env(debug, opponent) for _ in range(n_envs)], start_method=start_method)
+
+
+if __name__ == "__main__":
+    # Throughput check: steps/sec for 1, 2, 4, ... workers up to the core count.
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    for n in counts:
+        env = make_vec_env(n)
+        env.reset()
+        actions = np.zeros(n, dtype=np.int64)
+        steps = 2000 // n + 1
+        t0 = time.perf_counter()
+        for _ in range(steps):
+            actions[:] = np.random.randint(0, 8, n)
+            env.step(actions)
+        rate = steps * n / (time.perf_counter() - t0)
+        env.close()
+        print(f"{n:>3} workers: {rate:>9.0f} steps/s")